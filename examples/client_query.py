@@ -6,26 +6,33 @@ EasyTier 客户端查询脚本示例
 
 使用方法:
     python3 client_query.py --api-url https://your-domain.workers.dev --region domestic --priority traffic
+    python3 client_query.py --api-url https://your-domain.workers.dev fleet-stats --token <管理员JWT>
 
 依赖:
     pip install requests
+    fleet-stats 命令使用 monitor/NodeStats.py，安装 numpy 时使用向量化计算（见 monitor/requirements.txt）
 """
 
 import argparse
 import json
+import os
 import sys
 import requests
 
+MONITOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'monitor')
+
 
 class EasyTierClient:
-    def __init__(self, api_url: str):
+    def __init__(self, api_url: str, token: str = None):
         """
         初始化客户端
         
         Args:
             api_url: API 基础 URL
+            token: 管理员 JWT，获取全部节点时需要
         """
         self.api_url = api_url.rstrip('/')
+        self.token = token
     
     def query_nodes(self, region: str = 'all', priority: str = 'traffic', relay_only: bool = False) -> list:
         """
@@ -99,6 +106,76 @@ class EasyTierClient:
             print(f"获取统计信息失败: {e}", file=sys.stderr)
             raise
     
+    def get_all_nodes(self) -> list:
+        """
+        获取所有节点（需要管理员 JWT）
+        
+        不使用 view=sync：该视图的 ETag 只随节点配置变化，缓存的响应中状态和流量可能已过期
+        
+        Returns:
+            节点列表
+        """
+        try:
+            response = requests.get(
+                f'{self.api_url}/api/nodes/all',
+                headers={'Authorization': f'Bearer {self.token}'},
+                timeout=30
+            )
+            response.raise_for_status()
+            result = response.json()
+            
+            return result.get('nodes', [])
+        except requests.exceptions.RequestException as e:
+            print(f"获取所有节点失败: {e}", file=sys.stderr)
+            raise
+    
+    def get_fleet_stats(self, top_k: int = 10) -> dict:
+        """
+        根据最新的节点列表计算集群统计：按地域分组的合计值、利用率分位数和负载最高的节点
+        
+        Args:
+            top_k: 返回负载最高的节点数
+        
+        Returns:
+            NodeStats.aggregate_fleet 的结果
+        """
+        sys.path.insert(0, MONITOR_DIR)
+        from NodeStats import aggregate_fleet
+        
+        return aggregate_fleet(self.get_all_nodes(), top_k=top_k)
+    
+    def print_fleet_stats(self, stats: dict):
+        """
+        打印集群统计
+        
+        Args:
+            stats: get_fleet_stats 的结果
+        """
+        def percent(value) -> str:
+            return '-' if value is None else f"{value * 100:.1f}%"
+        
+        def print_group(label: str, group: dict):
+            traffic = group['traffic_utilization']
+            bandwidth = group['bandwidth_utilization']
+            print(f"{label:<12} 节点 {group['online_nodes']}/{group['total_nodes']} 在线  "
+                  f"连接 {group['total_connections']:.0f}  带宽 {group['total_bandwidth']:.2f}/{group['total_tier_bandwidth']:.2f} Mbps  "
+                  f"流量 {group['used_traffic']:.2f}/{group['max_traffic']:.2f} GB")
+            print(f"{'':<12} 流量利用率 " + ' '.join(f"{name}={percent(value)}" for name, value in traffic.items()) +
+                  "  带宽利用率 " + ' '.join(f"{name}={percent(value)}" for name, value in bandwidth.items()))
+        
+        print(f"\n{'='*60}")
+        print_group('全部节点', stats['fleet'])
+        for field_name, title in (('region_type', '按地域类型'), ('region_detail', '按地区')):
+            print(f"\n{title}:")
+            for label, group in stats[field_name].items():
+                print_group(label or '-', group)
+        
+        print("\n负载最高的节点:")
+        for node in stats['top_saturated']:
+            print(f"  {node['node_name']} (ID: {node['id']}, {node['region_detail'] or node['region_type']})  "
+                  f"流量 {percent(node['traffic_utilization'])}  带宽 {percent(node['bandwidth_utilization'])}")
+        print(f"{'='*60}")
+    
     def print_node(self, node: dict):
         """
         打印节点信息
@@ -161,13 +238,19 @@ def main():
     # 获取统计信息命令
     subparsers.add_parser('stats', help='获取统计信息')
     
+    # 集群统计命令
+    fleet_parser = subparsers.add_parser('fleet-stats', help='按地域统计节点负载（需要管理员 JWT）')
+    fleet_parser.add_argument('--token', type=str, required=True, help='管理员 JWT')
+    fleet_parser.add_argument('--top-k', type=int, default=10, help='显示负载最高的节点数')
+    fleet_parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+    
     args = parser.parse_args()
     
     if not args.command:
         parser.print_help()
         sys.exit(1)
     
-    client = EasyTierClient(args.api_url)
+    client = EasyTierClient(args.api_url, getattr(args, 'token', None))
     
     try:
         if args.command == 'query':
@@ -207,6 +290,14 @@ def main():
             print(f"海外节点数: {stats['overseas_nodes']}")
             print(f"总带宽: {stats['total_bandwidth']:.2f} Mbps")
             print(f"{'='*60}")
+        
+        elif args.command == 'fleet-stats':
+            stats = client.get_fleet_stats(top_k=args.top_k)
+            
+            if args.json:
+                print(json.dumps(stats, indent=2, ensure_ascii=False))
+            else:
+                client.print_fleet_stats(stats)
     
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+监控脚本性能基准测试
+
+用法: python NodeBenchmark.py <基准名称> [参数]
+"""
+
+import argparse
+import json
+import threading
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from NodeChecker import HealthCheckResult, JsonFrameReader
+from NodeHttp import HttpClient, RetryPolicy
+from NodeStats import FleetColumns, aggregate_fleet, np as stats_numpy
+from NodeSync import plan_sync
+
+
+def _make_route_table(peer_count: int) -> bytes:
+    """构造类似get_route_table的大响应（字符串中包含括号）"""
+    routes = [
+        {
+            "peer_id": i,
+            "ipv4_addr": f"10.144.{i // 256}.{i % 256}",
+            "hostname": f"node-{i}{{edge}}",
+            "proxy_cidrs": [f"192.168.{i % 256}.0/24"],
+            "feature_flag": {"is_public_server": i % 7 == 0, "avoid_relay_data": False},
+            "path_latency": i % 300,
+            "inst_id": f"{i:032x}"
+        }
+        for i in range(peer_count)
+    ]
+    return json.dumps({"jsonrpc": "2.0", "id": "get_route_table", "result": routes}).encode() + b"\n"
+
+
+def _legacy_brace_count(chunks) -> dict:
+    """原有实现：每个数据块后解码整个缓冲区并统计括号数量"""
+    response_data = b""
+    for chunk in chunks:
+        response_data += chunk
+        response_text = response_data.decode('utf-8', errors='ignore').strip()
+        if response_text.count('{') == response_text.count('}'):
+            break
+    return json.loads(response_data.decode('utf-8', errors='ignore').strip())
+
+
+def _frame_reader(chunks, newline: bool = True) -> dict:
+    reader = JsonFrameReader(max_frame_bytes=1 << 30)
+    for chunk in chunks:
+        frames = reader.feed(chunk if newline else chunk.replace(b"\n", b" "))
+        if frames:
+            return frames[0]
+    raise RuntimeError("incomplete response")
+
+
+def bench_frame_reader(args):
+    """比较响应分帧实现的每MB CPU时间"""
+    payload = _make_route_table(args.peers)
+    chunks = [payload[i:i + args.chunk_size] for i in range(0, len(payload), args.chunk_size)]
+    size_mb = len(payload) / (1024 * 1024)
+    print(f"响应大小: {size_mb:.2f} MB, 数据块: {len(chunks)} x {args.chunk_size} B")
+
+    candidates = [
+        ("frame reader (newline)", lambda: _frame_reader(chunks)),
+        ("frame reader (scan)", lambda: _frame_reader(chunks, newline=False)),
+        ("legacy brace count", lambda: _legacy_brace_count(chunks)),
+    ]
+    for name, func in candidates:
+        start = time.process_time()
+        for _ in range(args.repeat):
+            func()
+        elapsed = (time.process_time() - start) / args.repeat
+        print(f"{name:<24} {elapsed * 1000:9.2f} ms/次  {elapsed * 1000 / size_mb:9.2f} ms CPU/MB")
+
+
+class _CountingHandler(BaseHTTPRequestHandler):
+    """模拟本地服务：支持keep-alive并统计TCP连接数"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _CountingHandler.lock:
+            _CountingHandler.connections += 1
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        body = b'{"success": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _urllib_post(url: str):
+    request = urllib.request.Request(url, data=b'{}', method='POST')
+    request.add_header('Content-Type', 'application/json')
+    with urllib.request.urlopen(request, timeout=5) as response:
+        json.loads(response.read().decode('utf-8'))
+
+
+def bench_http_client(args):
+    """比较每周期上报请求使用urllib和共享HttpClient时的连接数与耗时"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _CountingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/report"
+    client = HttpClient(max_connections_per_host=args.workers, retry=RetryPolicy(max_retries=0))
+
+    candidates = [
+        ("urllib (original)", lambda: _urllib_post(url)),
+        ("HttpClient", lambda: client.post(url, json_data={}).raise_for_status()),
+    ]
+    try:
+        for name, func in candidates:
+            _CountingHandler.connections = 0
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                list(executor.map(lambda _: func(), range(args.requests)))
+            elapsed = time.perf_counter() - start
+            print(f"{name:<18} {args.requests} 个请求, {_CountingHandler.connections:5d} 个连接, "
+                  f"{elapsed * 1000:8.1f} ms")
+        print(f"HttpClient统计: {client.metrics.summary()}")
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def _make_sync_nodes(count: int, offset: int = 0) -> list:
+    """构造节点记录，ID从offset + 1开始连续编号"""
+    return [
+        {
+            "id": i,
+            "node_name": f"node-{i}",
+            "ip_address": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+            "port": 11010,
+            "is_public": i % 2 == 0,
+            "status": "online"
+        }
+        for i in range(offset + 1, offset + count + 1)
+    ]
+
+
+def _legacy_sync_diff(api_nodes, local_nodes):
+    """原有实现：对每个节点用any()线性扫描另一侧列表"""
+    added = [node for node in api_nodes if not any(n["id"] == node["id"] for n in local_nodes)]
+    removed = [node for node in local_nodes if not any(n["id"] == node["id"] for n in api_nodes)]
+    return added, removed
+
+
+def bench_sync_diff(args):
+    """比较节点同步差异计算的耗时，两侧各有5%的节点只存在于一侧"""
+    for count in args.nodes:
+        churn = max(1, count // 20)
+        api_nodes = _make_sync_nodes(count, churn)
+        local_nodes = _make_sync_nodes(count)
+
+        start = time.perf_counter()
+        plan = plan_sync(api_nodes, local_nodes, compare=False)
+        indexed = time.perf_counter() - start
+        start = time.perf_counter()
+        plan_sync(api_nodes, local_nodes)
+        indexed_compare = time.perf_counter() - start
+        line = (f"{count:>8} 个节点  索引集合差 {indexed * 1000:9.2f} ms  含字段比较 {indexed_compare * 1000:9.2f} ms  "
+                f"(创建 {len(plan.creates)}, 删除 {len(plan.deletes)})")
+
+        if count <= args.legacy_max:
+            start = time.perf_counter()
+            _legacy_sync_diff(api_nodes, local_nodes)
+            line += f"  原有any()扫描 {(time.perf_counter() - start) * 1000:10.2f} ms"
+        print(line)
+
+
+def _make_fleet_nodes(count: int) -> list:
+    """构造带流量、带宽和地域字段的节点记录，约1%的节点没有设置流量上限"""
+    regions = ["北京", "上海", "广州", "香港", "东京", "新加坡", "洛杉矶", "法兰克福"]
+    return [
+        {
+            "id": i,
+            "node_name": f"node-{i}",
+            "region_type": "domestic" if i % 8 < 3 else "overseas",
+            "region_detail": regions[i % 8],
+            "status": "online" if i % 5 else "offline",
+            "connection_count": i % 50,
+            "current_bandwidth": (i * 7) % 100,
+            "tier_bandwidth": 100,
+            "used_traffic": (i * 13) % 1000,
+            "max_traffic": 0 if i % 100 == 0 else 1000
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def _legacy_fleet_sums(nodes) -> dict:
+    """原有统计：逐行扫描计算在线数、连接数、带宽和阶梯带宽"""
+    return {
+        "online_nodes": sum(1 for node in nodes if node["status"] == "online"),
+        "total_connections": sum(node["connection_count"] for node in nodes),
+        "total_bandwidth": sum(node["current_bandwidth"] for node in nodes),
+        "total_tier_bandwidth": sum(node["tier_bandwidth"] for node in nodes)
+    }
+
+
+def bench_fleet_stats(args):
+    """集群统计耗时：列转换只在节点列表更新时进行一次，统计可以反复执行"""
+    if stats_numpy is not None:
+        print(f"统计实现: NumPy {stats_numpy.__version__}")
+    else:
+        print("统计实现: 纯Python（未安装NumPy，pip install -r requirements.txt 后测量向量化实现）")
+    for count in args.nodes:
+        nodes = _make_fleet_nodes(count)
+
+        start = time.perf_counter()
+        columns = FleetColumns.from_nodes(nodes)
+        convert = time.perf_counter() - start
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            stats = aggregate_fleet(columns, top_k=args.top_k)
+            timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        _legacy_fleet_sums(nodes)
+        legacy = time.perf_counter() - start
+
+        print(f"{count:>8} 个节点  列转换 {convert * 1000:8.2f} ms  统计 {min(timings) * 1000:8.2f} ms  "
+              f"(分组 {len(stats['region_type'])}+{len(stats['region_detail'])})  "
+              f"原有四项合计 {legacy * 1000:8.2f} ms")
+
+
+@dataclass
+class _LegacyHealthCheckResult:
+    """原有的健康检查结果定义（普通dataclass，每个实例带__dict__）"""
+    node_id: int
+    is_online: bool
+    connection_count: int
+    version: str
+    response_time_ms: int
+    error_message: Optional[str] = None
+    queue_wait_ms: int = 0
+
+
+def _make_results(record_type, count: int) -> list:
+    """构造健康检查结果，约10%离线并带错误信息"""
+    versions = ["2.4.5", "2.4.4", "2.3.2"]
+    return [
+        record_type(
+            node_id=i,
+            is_online=i % 10 != 0,
+            connection_count=i % 50,
+            version=versions[i % 3],
+            response_time_ms=i % 800,
+            error_message=None if i % 10 else "Connection refused"
+        )
+        for i in range(count)
+    ]
+
+
+def _measure(build, *build_args):
+    """返回build(*build_args)新增的内存（字节）和构造的对象，参数在计量开始前已构造"""
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    value = build(*build_args)
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return used, value
+
+
+def bench_result_memory(args):
+    """比较保存大量健康检查结果的内存占用，并换算为每100万条"""
+    count = args.results
+    scale = 1_000_000 / count
+
+    for label, record_type in (("原有dataclass", _LegacyHealthCheckResult), ("__slots__ dataclass", HealthCheckResult)):
+        used, _ = _measure(_make_results, record_type, count)
+        print(f"{label:<22} {used / count:8.1f} 字节/条  {used * scale / 2 ** 20:8.1f} MB/百万条")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='监控脚本性能基准测试')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    frame_parser = subparsers.add_parser('frame-reader', help='JSON响应分帧')
+    frame_parser.add_argument('--peers', type=int, default=5000, help='路由表条目数')
+    frame_parser.add_argument('--chunk-size', type=int, default=4096, help='每次读取的字节数')
+    frame_parser.add_argument('--repeat', type=int, default=3, help='重复次数')
+    frame_parser.set_defaults(func=bench_frame_reader)
+
+    http_parser = subparsers.add_parser('http-client', help='HTTP连接复用')
+    http_parser.add_argument('--requests', type=int, default=500, help='每周期请求数')
+    http_parser.add_argument('--workers', type=int, default=1, help='并发线程数')
+    http_parser.set_defaults(func=bench_http_client)
+
+    sync_parser = subparsers.add_parser('sync-diff', help='节点同步差异计算')
+    sync_parser.add_argument('--nodes', type=int, nargs='+', default=[1000, 10000, 100000], help='节点数量')
+    sync_parser.add_argument('--legacy-max', type=int, default=10000,
+                             help='原有实现只在节点数不超过此值时运行（复杂度为平方级）')
+    sync_parser.set_defaults(func=bench_sync_diff)
+
+    stats_parser = subparsers.add_parser('fleet-stats', help='集群统计聚合')
+    stats_parser.add_argument('--nodes', type=int, nargs='+', default=[1000, 10000, 100000], help='节点数量')
+    stats_parser.add_argument('--repeat', type=int, default=5, help='重复次数（取最短耗时）')
+    stats_parser.add_argument('--top-k', type=int, default=10, help='返回负载最高的节点数')
+    stats_parser.set_defaults(func=bench_fleet_stats)
+
+    memory_parser = subparsers.add_parser('result-memory', help='健康检查结果内存占用')
+    memory_parser.add_argument('--results', type=int, default=1000000, help='结果数量')
+    memory_parser.set_defaults(func=bench_result_memory)
+
+    args = parser.parse_args()
+    args.func(args)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -4,17 +4,24 @@ EasyTier节点健康检查器
 简化版本，用于调试连接问题
 """
 
+import abc
 import asyncio
+import dataclasses
+import hashlib
+import ipaddress
 import json
+import re
 import socket
+import sys
 import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
 from enum import Enum
 import logging
 
-# 设置日志
-logging.basicConfig(level=logging.INFO)
+# 设置日志（作为模块导入时沿用调用方的日志配置）
 logger = logging.getLogger(__name__)
 
 
@@ -25,7 +32,22 @@ class HealthStatus(Enum):
     UNKNOWN = "unknown"
 
 
-@dataclass
+def stable_node_id(host: str, port: int) -> int:
+    """
+    根据地址生成确定的节点ID，用于没有服务端ID的节点
+
+    与hash()不同，结果不随进程变化，可以跨进程缓存、关联历史和去重；
+    取53位以便在JSON和JavaScript中精确表示
+    """
+    digest = hashlib.blake2b(f"{host.strip().lower()}:{int(port)}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') & ((1 << 53) - 1)
+
+
+# 记录类型使用__slots__（Python 3.10+），大量结果常驻内存时不为每个实例分配__dict__
+_RECORD_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(frozen=True, **_RECORD_OPTIONS)
 class NodeInfo:
     """节点信息"""
     node_id: int
@@ -37,15 +59,16 @@ class NodeInfo:
     network_secret: str
 
 
-@dataclass
+@dataclass(frozen=True, **_RECORD_OPTIONS)
 class HealthCheckResult:
-    """健康检查结果"""
+    """健康检查结果（不可变，需要修改时使用dataclasses.replace）"""
     node_id: int
     is_online: bool
     connection_count: int
     version: str
     response_time_ms: int
     error_message: Optional[str] = None
+    queue_wait_ms: int = 0  # 在调度队列中等待的时间，不计入response_time_ms
 
 
 class EasyTierProtocolError(Exception):
@@ -53,30 +76,436 @@ class EasyTierProtocolError(Exception):
     pass
 
 
+class EasyTierFrameError(EasyTierProtocolError):
+    """响应分帧错误（非JSON数据、JSON格式错误或超出大小限制）"""
+    pass
+
+
+class PipelineUnsupportedError(EasyTierProtocolError):
+    """节点的响应表明不支持流水线请求（响应id缺失或不匹配、分帧错误）"""
+    pass
+
+
+class JsonFrameReader:
+    """
+    增量JSON响应分帧器
+
+    优先按换行分帧，每行直接交给json.loads解析；
+    不以换行结尾或跨行的响应使用可续扫的结构扫描器定位对象边界
+    （正确处理字符串中的括号和转义）。扫描从上次位置继续，
+    缓冲区使用bytearray并按偏移量消费，避免反复解码和拷贝整个缓冲区
+    """
+
+    # 完整字符串作为一个记号跳过；单独的引号表示字符串尚未接收完整
+    _TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]"]', re.DOTALL)
+    _WHITESPACE = b" \t\r\n"
+
+    def __init__(self, max_frame_bytes: int = 65536):
+        """
+        Args:
+            max_frame_bytes: 单个未完成帧允许缓冲的最大字节数
+        """
+        self.max_frame_bytes = max_frame_bytes
+        self._buffer = bytearray()
+        self._start = 0  # 当前帧起始偏移
+        self._reset_frame()
+
+    def _reset_frame(self):
+        """重置当前帧的扫描状态"""
+        self._frame_open = False
+        self._scan_pos = self._start
+        self._line_pos = self._start  # 换行查找进度
+        self._line_tried = False
+        self._depth = 0
+
+    def pending(self) -> bytes:
+        """返回尚未构成完整帧的数据"""
+        return bytes(self._buffer[self._start:])
+
+    def feed(self, data: bytes) -> List[Any]:
+        """
+        追加数据并返回其中所有完整的JSON对象
+
+        Raises:
+            EasyTierFrameError: 数据不是JSON、JSON格式错误或未完成帧超过大小限制
+        """
+        self._buffer += data
+        frames = []
+        while True:
+            found, frame = self._next_frame()
+            if not found:
+                break
+            frames.append(frame)
+
+        # 压缩已消费的数据
+        if self._start:
+            offset = self._start
+            del self._buffer[:offset]
+            self._start = 0
+            self._scan_pos -= offset
+            self._line_pos -= offset
+
+        if len(self._buffer) > self.max_frame_bytes:
+            raise EasyTierFrameError(f"Response exceeds {self.max_frame_bytes} bytes")
+        return frames
+
+    def _consume(self, end: int):
+        self._start = end
+        self._reset_frame()
+
+    def _next_frame(self) -> Tuple[bool, Any]:
+        buf = self._buffer
+        size = len(buf)
+
+        if not self._frame_open:
+            # 新帧：跳过前导空白并检查起始字符
+            i = self._start
+            while i < size and buf[i] in self._WHITESPACE:
+                i += 1
+            self._start = i
+            self._reset_frame()
+            if i >= size:
+                return False, None
+            if buf[i] not in b"{[":
+                raise EasyTierFrameError(f"Unexpected data: {bytes(buf[i:i + 50])!r}")
+            self._frame_open = True
+
+        # 换行分帧：每帧最多尝试一次整行解析
+        if not self._line_tried:
+            newline = buf.find(b"\n", self._line_pos)
+            if newline == -1:
+                self._line_pos = size
+            else:
+                self._line_tried = True
+                try:
+                    frame = json.loads(buf[self._start:newline])
+                except ValueError:
+                    pass
+                else:
+                    self._consume(newline + 1)
+                    return True, frame
+
+        # 完整帧之后可能紧跟下一帧的一部分，因此不能只看缓冲区末尾；扫描从上次位置继续
+        end = self._scan()
+        if end is None:
+            return False, None
+        data = buf[self._start:end]
+        self._consume(end)
+        try:
+            return True, json.loads(data)
+        except ValueError as e:
+            raise EasyTierFrameError(f"Invalid JSON frame: {e}")
+
+    def _scan(self) -> Optional[int]:
+        """从上次位置继续扫描，返回当前帧结束偏移，未结束返回None"""
+        buf = self._buffer
+        depth = self._depth
+        for match in self._TOKEN.finditer(buf, self._scan_pos):
+            token = buf[match.start()]
+            if token == 0x22:  # 引号
+                if match.end() - match.start() == 1:
+                    # 字符串尚未接收完整，下次从引号处继续
+                    self._scan_pos, self._depth = match.start(), depth
+                    return None
+            elif token in b"{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth <= 0:
+                    return match.end()
+
+        self._scan_pos, self._depth = len(buf), depth
+        return None
+
+
+@dataclass
+class PooledConnection:
+    """连接池中的RPC连接"""
+    host: str
+    port: int
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    created_at: float
+    last_used: float
+
+
+class RpcConnectionPool:
+    """
+    EasyTier RPC长连接池
+
+    按(host, port)保存空闲连接，复用前检查连接是否仍然可用，
+    超过空闲时间或最长存活时间的连接会被关闭。空闲连接总数不超过max_idle_total，
+    超出时关闭最久未使用的连接；事件循环运行时由定时器定期清理过期连接
+    """
+
+    def __init__(self, max_idle_seconds: float = 90.0, max_age_seconds: float = 600.0,
+                 max_idle_total: int = 256):
+        """
+        Args:
+            max_idle_seconds: 空闲连接保留时间（秒）
+            max_age_seconds: 连接最长存活时间（秒）
+            max_idle_total: 所有主机合计的最大空闲连接数
+        """
+        self.max_idle_seconds = max_idle_seconds
+        self.max_age_seconds = max_age_seconds
+        self.max_idle_total = max_idle_total
+        # 按最近使用顺序排列，最久未使用的在前
+        self._idle: "OrderedDict[Tuple[str, int], PooledConnection]" = OrderedDict()
+        self._last_eviction = time.monotonic()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+    def _is_usable(self, conn: PooledConnection, now: float) -> bool:
+        """检查空闲连接是否可以复用"""
+        if now - conn.created_at > self.max_age_seconds:
+            return False
+        if now - conn.last_used > self.max_idle_seconds:
+            return False
+        # 对端已关闭或连接出错
+        if conn.writer.is_closing() or conn.reader.at_eof() or conn.reader.exception() is not None:
+            return False
+        return True
+
+    def _evict_expired(self, now: float):
+        """关闭过期的空闲连接，最多每半个空闲周期执行一次"""
+        if now - self._last_eviction < self.max_idle_seconds / 2:
+            return
+        self.expire(now)
+
+    def expire(self, now: Optional[float] = None):
+        """立即关闭所有过期或已失效的空闲连接"""
+        now = time.monotonic() if now is None else now
+        self._last_eviction = now
+        for key, conn in list(self._idle.items()):
+            if not self._is_usable(conn, now):
+                del self._idle[key]
+                conn.writer.close()
+                self.evicted += 1
+
+    def _schedule_expiry(self):
+        """在当前事件循环中安排定期清理，连接池为空时停止"""
+        if self._timer is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._timer = loop.call_later(self.max_idle_seconds / 2, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self.expire()
+        if self._idle:
+            self._schedule_expiry()
+
+    def acquire(self, host: str, port: int) -> Optional[PooledConnection]:
+        """
+        取出一个可复用的空闲连接
+
+        Returns:
+            可用连接，没有时返回None
+        """
+        now = time.monotonic()
+        self._evict_expired(now)
+        conn = self._idle.pop((host, port), None)
+        if conn is not None and not self._is_usable(conn, now):
+            conn.writer.close()
+            conn = None
+        if conn is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return conn
+
+    def wrap(self, host: str, port: int, reader: asyncio.StreamReader,
+             writer: asyncio.StreamWriter) -> PooledConnection:
+        """包装新建立的连接，便于之后放回连接池"""
+        now = time.monotonic()
+        return PooledConnection(host, port, reader, writer, created_at=now, last_used=now)
+
+    def release(self, conn: PooledConnection):
+        """将连接放回连接池"""
+        conn.last_used = time.monotonic()
+        key = (conn.host, conn.port)
+        previous = self._idle.pop(key, None)
+        if previous is not None and previous is not conn:
+            previous.writer.close()
+        self._idle[key] = conn
+        while len(self._idle) > self.max_idle_total:
+            _, oldest = self._idle.popitem(last=False)
+            oldest.writer.close()
+            self.evicted += 1
+        self._schedule_expiry()
+
+    async def close(self):
+        """关闭所有空闲连接"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        idle = list(self._idle.values())
+        self._idle.clear()
+        for conn in idle:
+            await _close_writer(conn.writer)
+
+
+async def _close_writer(writer: asyncio.StreamWriter):
+    """关闭连接，忽略关闭过程中的错误"""
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+
+
+class HealthResultSink(abc.ABC):
+    """
+    健康检查结果接收器接口
+
+    批量检查时每完成一个节点就调用一次on_result，
+    调用方可以在慢节点仍在探测时开始处理（例如上报）已完成的结果；
+    子类必须实现on_result
+    """
+
+    @abc.abstractmethod
+    async def on_result(self, node: NodeInfo, result: HealthCheckResult):
+        """处理单个节点的检查结果"""
+
+    async def close(self):
+        """所有结果交付完成后调用，用于等待未完成的处理"""
+        pass
+
+
+class ProbeScheduler:
+    """
+    探测调度器
+
+    限制同时进行的探测数量，并可按主机或/24网段限制探测速率，
+    避免大批量检查时耗尽文件描述符或压垮本地SYN队列
+    """
+
+    def __init__(self, max_concurrency: int = 64, rate_limit: Optional[float] = None, rate_scope: str = "host"):
+        """
+        Args:
+            max_concurrency: 最大并发探测数
+            rate_limit: 每个主机/网段每秒最多启动的探测数，None表示不限制
+            rate_scope: 速率限制范围，"host"按主机，"subnet"按IPv4 /24（IPv6 /64）网段
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if rate_scope not in ("host", "subnet"):
+            raise ValueError(f"Unknown rate_scope: {rate_scope}")
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self.rate_scope = rate_scope
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # 每个限速键下一次允许启动探测的时间
+        self._next_start: Dict[str, float] = {}
+
+    def _rate_key(self, host: str) -> str:
+        """计算速率限制使用的键"""
+        if self.rate_scope == "host":
+            return host
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            # 域名无法归入网段，按主机限速
+            return host
+        prefix = 24 if address.version == 4 else 64
+        return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+    async def _wait_rate(self, host: str):
+        """按速率限制预约启动时间并等待"""
+        if not self.rate_limit:
+            return
+        key = self._rate_key(host)
+        now = time.monotonic()
+        start_at = max(now, self._next_start.get(key, now))
+        self._next_start[key] = start_at + 1.0 / self.rate_limit
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        """
+        获取一个探测槽位
+
+        Yields:
+            排队等待的毫秒数
+        """
+        queued_at = time.monotonic()
+        await self._wait_rate(host)
+        async with self._semaphore:
+            yield int((time.monotonic() - queued_at) * 1000)
+
+
 class EasyTierHealthChecker:
     """EasyTier节点健康检查器"""
-    
-    def __init__(self, timeout: int = 10):
+
+    # 详细信息探测使用的RPC方法
+    RPC_METHODS = [
+        "get_info",
+        "get_peer_info",
+        "get_route_table",
+        "get_network_summary"
+    ]
+
+    # 每次从连接读取的字节数
+    READ_SIZE = 65536
+
+    def __init__(self, timeout: int = 10, pipeline: bool = True, max_concurrency: int = 64,
+                 rate_limit: Optional[float] = None, rate_scope: str = "host",
+                 max_response_bytes: int = 65536, keep_alive: bool = False,
+                 pipeline_retry_probes: int = 50):
+        """
+        Args:
+            timeout: 连接与读取超时时间（秒）
+            pipeline: 是否在单个连接上流水线发送全部RPC请求
+            max_concurrency: 批量检查时的最大并发探测数
+            rate_limit: 每个主机/网段每秒最多启动的探测数，None表示不限制
+            rate_scope: 速率限制范围，"host"或"subnet"
+            max_response_bytes: 单个RPC响应允许的最大字节数
+            keep_alive: 是否在多次检查之间复用流水线探测的连接（适用于常驻进程）
+            pipeline_retry_probes: 确认不支持流水线的节点在逐方法探测多少次后重新尝试流水线
+        """
         self.timeout = timeout
+        self.pipeline = pipeline
+        self.max_response_bytes = max_response_bytes
+        self.scheduler = ProbeScheduler(max_concurrency, rate_limit, rate_scope)
+        self.pool = RpcConnectionPool() if keep_alive else None
+        self.pipeline_retry_probes = pipeline_retry_probes
+        # 不支持流水线请求的节点 -> 剩余的逐方法探测次数，归零后重新尝试流水线
+        self._pipeline_rejected: Dict[Tuple[str, int], int] = {}
+        self._pipeline_payload = b"".join(
+            json.dumps({
+                "jsonrpc": "2.0",
+                "method": method,
+                "params": {},
+                "id": method
+            }).encode() + b'\n'
+            for method in self.RPC_METHODS
+        )
         
     async def __aenter__(self):
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        pass
+        await self.close()
+
+    async def close(self):
+        """关闭连接池中的连接"""
+        if self.pool is not None:
+            await self.pool.close()
         
     async def _test_rpc_methods(self, host: str, port: int) -> Dict[str, Any]:
         """测试多种RPC方法获取详细信息"""
-        methods_to_try = [
-            "get_info",
-            "get_peer_info", 
-            "get_route_table",
-            "get_network_summary"
-        ]
-        
         all_info = {}
         
-        for method in methods_to_try:
+        for method in self.RPC_METHODS:
             try:
                 reader, writer = await asyncio.wait_for(
                     asyncio.open_connection(host, port),
@@ -95,39 +524,11 @@ class EasyTierHealthChecker:
                     await writer.drain()
                     
                     # 读取完整响应
-                    response_data = b""
-                    while True:
-                        chunk = await asyncio.wait_for(
-                            reader.read(4096),
-                            timeout=self.timeout
-                        )
-                        if not chunk:
-                            break
-                        response_data += chunk
-                        
-                        # 检查是否收到完整JSON对象
-                        try:
-                            response_text = response_data.decode('utf-8', errors='ignore').strip()
-                            if response_text.count('{') == response_text.count('}'):
-                                break
-                        except:
-                            pass
-                        
-                        # 防止响应过大导致内存溢出
-                        if len(response_data) > 65536:  # 64KB限制
-                            break
+                    response_json = await self._read_response(reader, JsonFrameReader(self.max_response_bytes))
                     
-                    logger.debug(f"Raw response for {method}: {response_data[:200]}")
-                    
-                    if response_data:
-                        response_text = response_data.decode('utf-8', errors='ignore').strip()
-                        try:
-                            response_json = json.loads(response_text)
-                            if "result" in response_json:
-                                all_info[method] = response_json["result"]
-                                logger.debug(f"Got response for {method}: {str(response_json['result'])[:100]}")
-                        except json.JSONDecodeError:
-                            logger.debug(f"Failed to parse JSON for {method}")
+                    if isinstance(response_json, dict) and "result" in response_json:
+                        all_info[method] = response_json["result"]
+                        logger.debug(f"Got response for {method}: {str(response_json['result'])[:100]}")
                     
                 finally:
                     writer.close()
@@ -161,58 +562,25 @@ class EasyTierHealthChecker:
                 await writer.drain()
                 
                 # 读取完整响应
-                response_data = b""
-                while True:
-                    chunk = await asyncio.wait_for(
-                        reader.read(4096),
-                        timeout=self.timeout
-                    )
-                    if not chunk:
-                        break
-                    response_data += chunk
-                    
-                    # 检查是否收到完整JSON对象
-                    try:
-                        response_text = response_data.decode('utf-8', errors='ignore').strip()
-                        if response_text.count('{') == response_text.count('}'):
-                            break
-                    except:
-                        pass
-                
-                logger.debug(f"Raw response from {host}:{port}: {response_data[:200]}")
+                frames = JsonFrameReader(self.max_response_bytes)
+                try:
+                    response_json = await self._read_response(reader, frames)
+                except EasyTierFrameError as e:
+                    logger.debug(f"JSON解析失败: {e}")
+                    return {"raw_response": str(frames.pending()[:200]), "status": "invalid_format"}
                 
-                if response_data:
+                if response_json is not None:
+                    response_text = json.dumps(response_json)
+                    logger.debug(f"Raw response from {host}:{port}: {response_text[:200]}")
                     try:
-                        response_text = response_data.decode('utf-8', errors='ignore').strip()
-                        response_json = json.loads(response_text)
-                        
-                        # 严格验证响应格式
-                        if "jsonrpc" not in response_json or response_json["jsonrpc"] != "2.0":
-                            raise EasyTierProtocolError("Invalid JSON-RPC version")
-                            
-                        if "error" in response_json:
-                            error = response_json["error"]
-                            logger.warning(f"RPC error from {host}:{port}: {error.get('message', 'Unknown error')}")
-                            return {
-                                "status": "rpc_error",
-                                "raw_response": response_text,
-                                "error": error
-                            }
-                        
-                        if "result" not in response_json:
-                            raise EasyTierProtocolError("Missing 'result' in response")
-                            
-                        return {
-                            "status": "connected",
-                            "raw_response": response_text,
-                            "parsed_response": response_json["result"]
-                        }
-                    except json.JSONDecodeError as e:
-                        logger.debug(f"JSON解析失败: {e}")
-                        return {"raw_response": str(response_data[:200]), "status": "invalid_format"}
+                        return self._parse_basic_response(response_json, response_text, host, port)
                     except Exception as e:
                         logger.debug(f"响应处理失败: {e}")
-                        return {"raw_response": str(response_data[:200]), "status": "invalid_format"}
+                        return {"raw_response": response_text[:200], "status": "invalid_format"}
+                
+                if frames.pending():
+                    # 连接关闭时响应仍不完整
+                    return {"raw_response": str(frames.pending()[:200]), "status": "invalid_format"}
                 
                 return {"status": "no_response"}
                 
@@ -227,17 +595,227 @@ class EasyTierHealthChecker:
         except Exception as e:
             raise EasyTierProtocolError(f"Unexpected error: {e}")
     
-    async def check_node_health(self, protocol: str, host: str, port: int) -> HealthCheckResult:
-        """检查节点健康状态"""
+    def _parse_basic_response(self, response_json: Any, response_text: str, host: str, port: int) -> Dict[str, Any]:
+        """校验get_info响应并转换为基本连接结果"""
+        if not isinstance(response_json, dict):
+            raise EasyTierProtocolError("Invalid JSON-RPC response")
+
+        # 严格验证响应格式
+        if "jsonrpc" not in response_json or response_json["jsonrpc"] != "2.0":
+            raise EasyTierProtocolError("Invalid JSON-RPC version")
+
+        if "error" in response_json:
+            error = response_json["error"]
+            logger.warning(f"RPC error from {host}:{port}: {error.get('message', 'Unknown error')}")
+            return {
+                "status": "rpc_error",
+                "raw_response": response_text,
+                "error": error
+            }
+
+        if "result" not in response_json:
+            raise EasyTierProtocolError("Missing 'result' in response")
+
+        return {
+            "status": "connected",
+            "raw_response": response_text,
+            "parsed_response": response_json["result"]
+        }
+
+    async def _read_response(self, reader: asyncio.StreamReader, frames: JsonFrameReader) -> Any:
+        """
+        读取单个JSON响应
+
+        Returns:
+            解析后的JSON对象，连接在收到完整响应前关闭时返回None
+        """
+        while True:
+            chunk = await asyncio.wait_for(reader.read(self.READ_SIZE), timeout=self.timeout)
+            if not chunk:
+                return None
+            responses = frames.feed(chunk)
+            if responses:
+                return responses[0]
+
+    async def _read_rpc_responses(self, reader: asyncio.StreamReader, expected_ids: List[str],
+                                  frames: Optional[JsonFrameReader] = None) -> Tuple[Dict[str, Any], bool, int]:
+        """
+        从同一连接读取多个JSON-RPC响应，按id匹配
+
+        Returns:
+            (id到响应对象的映射, 是否因响应过大或格式错误而提前停止, id缺失或不匹配的响应数)，
+            连接提前关闭或超时时映射可能不完整
+        """
+        if frames is None:
+            frames = JsonFrameReader(self.max_response_bytes)
+        pending = set(expected_ids)
+        responses = {}
+        unmatched = 0
+
+        while pending:
+            try:
+                chunk = await asyncio.wait_for(reader.read(self.READ_SIZE), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                if responses or unmatched:
+                    # 已收到部分（或无法匹配的）响应，其余请求视为被丢弃
+                    break
+                raise
+            if not chunk:
+                break
+            try:
+                objects = frames.feed(chunk)
+            except EasyTierFrameError as e:
+                logger.debug(f"Stopped reading pipelined responses: {e}")
+                return responses, True, unmatched
+
+            for obj in objects:
+                if isinstance(obj, dict) and obj.get("id") in pending:
+                    responses[obj["id"]] = obj
+                    pending.discard(obj["id"])
+                else:
+                    unmatched += 1
+                    logger.debug(f"Unmatched RPC response: {str(obj)[:100]}")
+
+        return responses, False, unmatched
+
+    async def _pipelined_exchange(self, reader: asyncio.StreamReader,
+                                  writer: asyncio.StreamWriter) -> Tuple[Dict[str, Any], bool, int, bool]:
+        """
+        发送全部RPC请求并读取响应
+
+        Returns:
+            (id到响应对象的映射, 是否被截断, id缺失或不匹配的响应数, 连接是否可以复用)
+        """
+        writer.write(self._pipeline_payload)
+        await writer.drain()
+        frames = JsonFrameReader(self.max_response_bytes)
+        responses, truncated, unmatched = await self._read_rpc_responses(reader, self.RPC_METHODS, frames)
+        reusable = (len(responses) == len(self.RPC_METHODS) and not truncated and not unmatched
+                    and not frames.pending())
+        return responses, truncated, unmatched, reusable
+
+    async def _test_pipelined(self, host: str, port: int) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        在单个连接上流水线发送全部RPC方法，启用连接池时优先复用已有连接
+
+        Returns:
+            (基本连接结果, 详细信息)，响应不完整但无法确定原因（连接被重置、部分超时）时返回None
+
+        Raises:
+            PipelineUnsupportedError: 响应证明节点不支持流水线请求
+        """
+        responses = None
+        truncated = False
+        unmatched = 0
+
+        conn = self.pool.acquire(host, port) if self.pool is not None else None
+        if conn is not None:
+            reusable = False
+            try:
+                responses, truncated, unmatched, reusable = await self._pipelined_exchange(conn.reader, conn.writer)
+            except asyncio.TimeoutError:
+                # 空闲连接可能已被NAT或中间设备丢弃（半开连接），与连接错误一样用新连接重试
+                logger.debug(f"Pooled connection to {host}:{port} timed out")
+            except socket.error as e:
+                logger.debug(f"Pooled connection to {host}:{port} failed: {e}")
+            if reusable:
+                self.pool.release(conn)
+            else:
+                await _close_writer(conn.writer)
+                # 复用的连接已失效，使用新连接重试
+                if not (truncated and "get_info" in responses):
+                    responses = None
+
+        if responses is None:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(host, port),
+                    timeout=self.timeout
+                )
+            except asyncio.TimeoutError:
+                raise EasyTierProtocolError(f"Connection timeout to {host}:{port}")
+            except socket.error as e:
+                raise EasyTierProtocolError(f"Socket error: {e}")
+
+            reusable = False
+            try:
+                responses, truncated, unmatched, reusable = await self._pipelined_exchange(reader, writer)
+            except asyncio.TimeoutError:
+                raise EasyTierProtocolError(f"Connection timeout to {host}:{port}")
+            except socket.error as e:
+                raise EasyTierProtocolError(f"Socket error: {e}")
+            finally:
+                if reusable and self.pool is not None:
+                    self.pool.release(self.pool.wrap(host, port, reader, writer))
+                else:
+                    await _close_writer(writer)
+
+        # 响应过大导致的截断不代表节点拒绝流水线请求
+        if len(responses) < len(self.RPC_METHODS) and not (truncated and "get_info" in responses):
+            logger.debug(f"{host}:{port} answered {list(responses.keys())} of pipelined requests")
+            if unmatched or truncated:
+                raise PipelineUnsupportedError(
+                    f"{host}:{port} returned {unmatched} unmatched responses"
+                    f"{' and malformed framing' if truncated else ''}"
+                )
+            return None
+
+        detailed_info = {
+            method: response["result"]
+            for method, response in responses.items()
+            if isinstance(response, dict) and "result" in response
+        }
+        get_info = responses["get_info"]
+        response_text = json.dumps(get_info)
+        try:
+            basic_result = self._parse_basic_response(get_info, response_text, host, port)
+        except Exception as e:
+            logger.debug(f"响应处理失败: {e}")
+            basic_result = {"raw_response": response_text[:200], "status": "invalid_format"}
+        return basic_result, detailed_info
+
+    async def _probe_node(self, host: str, port: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """获取基本连接结果和详细信息，优先使用流水线模式"""
+        key = (host, port)
+        skip = self._pipeline_rejected.get(key, 0)
+        if skip:
+            # 确认不支持的节点在一定次数后重新尝试，节点升级后可以恢复流水线
+            if skip > 1:
+                self._pipeline_rejected[key] = skip - 1
+            else:
+                del self._pipeline_rejected[key]
+        elif self.pipeline:
+            try:
+                pipelined = await self._test_pipelined(host, port)
+            except PipelineUnsupportedError as e:
+                logger.info(f"{host}:{port} does not support pipelined RPC, falling back: {e}")
+                self._pipeline_rejected[key] = self.pipeline_retry_probes
+                pipelined = None
+            if pipelined is not None:
+                return pipelined
+            # 其余情况（连接重置、部分超时）只在本次回退，下次仍尝试流水线
+
+        # 基本连接测试
+        basic_result = await self._test_connection(host, port)
+
+        # 尝试获取更详细的信息
+        detailed_info = await self._test_rpc_methods(host, port)
+        return basic_result, detailed_info
+
+    async def check_node_health(self, protocol: str, host: str, port: int,
+                                node_id: Optional[int] = None) -> HealthCheckResult:
+        """
+        检查节点健康状态
+
+        Args:
+            node_id: 节点ID，未知时使用stable_node_id根据地址生成
+        """
         start_time = time.time()
-        node_id = hash(f"{host}:{port}") & 0x7fffffff
+        if node_id is None:
+            node_id = stable_node_id(host, port)
         
         try:
-            # 基本连接测试
-            basic_result = await self._test_connection(host, port)
-            
-            # 尝试获取更详细的信息
-            detailed_info = await self._test_rpc_methods(host, port)
+            basic_result, detailed_info = await self._probe_node(host, port)
             
             response_time_ms = int((time.time() - start_time) * 1000)
             
@@ -313,33 +891,77 @@ class EasyTierHealthChecker:
                 error_message=str(e)
             )
     
+    async def _check_scheduled(self, node: NodeInfo) -> HealthCheckResult:
+        """在调度器分配的槽位内检查单个节点"""
+        queue_wait_ms = 0
+        try:
+            async with self.scheduler.slot(node.host) as queue_wait_ms:
+                # 响应时间从获得槽位后开始计时，排队时间单独记录
+                result = await self.check_node_health(node.protocol, node.host, node.port, node.node_id)
+        except Exception as e:
+            result = HealthCheckResult(
+                node_id=node.node_id,
+                is_online=False,
+                connection_count=0,
+                version="unknown",
+                response_time_ms=0,
+                error_message=str(e)
+            )
+        if queue_wait_ms:
+            result = dataclasses.replace(result, queue_wait_ms=queue_wait_ms)
+        return result
+
+    async def _iter_indexed(self, nodes: List[NodeInfo]) -> AsyncIterator[Tuple[int, HealthCheckResult]]:
+        """按完成顺序产出(输入下标, 结果)"""
+        async def run(index: int, node: NodeInfo) -> Tuple[int, HealthCheckResult]:
+            return index, await self._check_scheduled(node)
+
+        tasks = [asyncio.ensure_future(run(i, node)) for i, node in enumerate(nodes)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 调用方提前停止迭代时取消仍在进行的探测
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def iter_node_health(self, nodes: List[NodeInfo]) -> AsyncIterator[Tuple[NodeInfo, HealthCheckResult]]:
+        """
+        批量检查节点，按完成顺序逐个产出结果
+
+        Yields:
+            (节点, 健康检查结果)
+        """
+        async for index, result in self._iter_indexed(nodes):
+            yield nodes[index], result
+
+    async def check_nodes_to_sink(self, nodes: List[NodeInfo], sink: HealthResultSink) -> List[HealthCheckResult]:
+        """
+        批量检查节点，并在每个节点完成时交给sink处理
+
+        Returns:
+            与输入顺序一致的健康检查结果
+        """
+        results: List[Optional[HealthCheckResult]] = [None] * len(nodes)
+        try:
+            async for index, result in self._iter_indexed(nodes):
+                results[index] = result
+                node = nodes[index]
+                try:
+                    await sink.on_result(node, result)
+                except Exception as e:
+                    logger.error(f"Result sink failed for {node.host}:{node.port}: {e}")
+        finally:
+            await sink.close()
+        return [result for result in results if result is not None]
+
     async def check_multiple_nodes(self, nodes: List[NodeInfo]) -> List[HealthCheckResult]:
-        """批量检查多个节点的健康状态"""
-        tasks = []
-        for node in nodes:
-            task = self.check_node_health(node.protocol, node.host, node.port)
-            tasks.append(task)
-        
-        # 并行执行所有检查
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # 处理异常结果
-        health_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                node = nodes[i]
-                health_results.append(HealthCheckResult(
-                    node_id=node.node_id,
-                    is_online=False,
-                    connection_count=0,
-                    version="unknown",
-                    response_time_ms=0,
-                    error_message=str(result)
-                ))
-            else:
-                health_results.append(result)
-        
-        return health_results
+        """批量检查多个节点的健康状态，结果顺序与输入一致"""
+        tasks = [self._check_scheduled(node) for node in nodes]
+
+        # 由调度器限制并发，gather保持输入顺序
+        return list(await asyncio.gather(*tasks))
 
     def print_health_result(self, result: HealthCheckResult):
         """打印健康检查结果"""
@@ -349,6 +971,8 @@ class EasyTierHealthChecker:
         print(f"连接数: {result.connection_count}")
         print(f"版本: {result.version}")
         print(f"响应时间: {result.response_time_ms}ms")
+        if result.queue_wait_ms:
+            print(f"排队时间: {result.queue_wait_ms}ms")
         
         if result.is_online:
             if result.connection_count > 0:
@@ -410,5 +1034,6 @@ async def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     # 运行示例
     asyncio.run(main())
\ No newline at end of file
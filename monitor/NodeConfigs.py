@@ -1,20 +1,47 @@
+import atexit
 import json
 import os
-from typing import Dict, Optional
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Set
 
 
 class NodeMonitorConfig:
-    """节点监控配置管理器"""
+    """
+    节点监控配置管理器
 
-    def __init__(self, config_file: str = "node_monitor_config.json"):
+    修改（如上报token）先缓存在内存中，在save_delay秒内合并为一次写入，
+    写入时先写临时文件再替换，关闭或进程退出时立即写入未保存的修改；
+    reload_if_changed在配置文件被外部修改后重新加载
+    """
+
+    def __init__(self, config_file: str = "node_monitor_config.json", save_delay: float = 2.0):
         """
         初始化配置管理器
 
         Args:
             config_file: 配置文件路径
+            save_delay: 修改后延迟写入的时间（秒）
         """
         self.config_file = config_file
+        self.save_delay = save_delay
+        self._lock = threading.RLock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self._pending_tokens: Dict[str, str] = {}
+        self._overrides: Dict[str, Any] = {}
+        self._file_state = self._stat()
         self.config = self.load_config()
+        # 单次运行模式可能在延迟写入之前退出
+        atexit.register(self.flush)
+
+    def _stat(self) -> Optional[tuple]:
+        """配置文件的(mtime, size)，文件不存在时为None"""
+        try:
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
 
     def load_config(self) -> Dict:
         """
@@ -45,16 +72,107 @@ class NodeMonitorConfig:
             "connection_timeout": 5,
             "node_delay": 1,
             "max_retries": 3,
-            "log_level": "INFO"
+            "log_level": "INFO",
+            "probe_interval": 30,
+            "probe_max_interval": 3600,
+            "probe_budget_per_minute": 0,
+            "readiness_timeout": 60,
+            "report_batch_size": 100,
+            "report_gzip": True,
+            "report_workers": 8,
+            "report_endpoint_concurrency": 4,
+            "report_deadline": 120,
+            "node_cache_file": "node_list_cache.json",
+            "sync_workers": 8,
+            "uptime_db_path": "",
+            "report_keyframe_interval": 300,
+            "report_latency_tolerance": 20,
+            "uptime_log_file": "",
+            "history_dir": "",
+            "history_capacity": 2880
         }
 
     def save_config(self):
-        """保存配置到文件"""
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"保存配置文件失败: {e}")
+        """立即保存配置到文件（写入临时文件后原子替换）"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            directory = os.path.dirname(os.path.abspath(self.config_file))
+            try:
+                fd, temp_path = tempfile.mkstemp(prefix='.config-', suffix='.json', dir=directory)
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        json.dump(self.config, f, indent=2, ensure_ascii=False)
+                    os.replace(temp_path, self.config_file)
+                except BaseException:
+                    os.unlink(temp_path)
+                    raise
+                self._dirty = False
+                self._pending_tokens.clear()
+                self._file_state = self._stat()
+            except Exception as e:
+                print(f"保存配置文件失败: {e}")
+
+    def _schedule_save(self):
+        """标记有未保存的修改，save_delay秒后统一写入"""
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self):
+        """写入未保存的修改"""
+        with self._lock:
+            self._save_timer = None
+            if self._dirty:
+                self.save_config()
+
+    def close(self):
+        """停止延迟写入并保存未保存的修改"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self.flush()
+        atexit.unregister(self.flush)
+
+    def set_override(self, key: str, value: Any):
+        """设置命令行覆盖的配置项，不写入文件，重新加载后仍然生效"""
+        with self._lock:
+            self._overrides[key] = value
+            self.config[key] = value
+
+    def reload_if_changed(self) -> Set[str]:
+        """
+        配置文件的修改时间或大小变化时重新加载
+
+        内存中尚未写入的上报token和命令行覆盖的配置项保留
+
+        Returns:
+            值发生变化的配置项
+        """
+        with self._lock:
+            state = self._stat()
+            if state is None or state == self._file_state:
+                return set()
+            self._file_state = state
+            try:
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    loaded = json.load(f)
+            except Exception as e:
+                print(f"重新加载配置文件失败: {e}")
+                return set()
+
+            loaded.setdefault("report_tokens", {}).update(self._pending_tokens)
+            loaded.update(self._overrides)
+            changed = {
+                key for key in set(loaded) | set(self.config)
+                if loaded.get(key) != self.config.get(key)
+            }
+            self.config = loaded
+            return changed
 
     def get_report_token(self, node_name: str) -> Optional[str]:
         """
@@ -76,8 +194,10 @@ class NodeMonitorConfig:
             node_name: 节点名称
             token: 上报token
         """
-        self.config["report_tokens"][node_name] = token
-        self.save_config()
+        with self._lock:
+            self.config.setdefault("report_tokens", {})[node_name] = token
+            self._pending_tokens[node_name] = token
+            self._schedule_save()
 
     def get_connection_timeout(self) -> int:
         """获取连接超时时间"""
@@ -91,6 +211,74 @@ class NodeMonitorConfig:
         """获取最大重试次数"""
         return self.config.get("max_retries", 3)
 
+    def get_probe_interval(self) -> int:
+        """获取在线节点的探测间隔"""
+        return self.config.get("probe_interval", 30)
+
+    def get_probe_max_interval(self) -> int:
+        """获取离线节点退避的最大探测间隔"""
+        return self.config.get("probe_max_interval", 3600)
+
+    def get_probe_budget(self) -> Optional[int]:
+        """获取每分钟探测预算，0或未设置表示不限制"""
+        return self.config.get("probe_budget_per_minute", 0) or None
+
+    def get_readiness_timeout(self) -> int:
+        """获取同步后等待健康检查结果的最长时间"""
+        return self.config.get("readiness_timeout", 60)
+
+    def get_report_batch_size(self) -> int:
+        """获取批量上报每批的节点数，0表示逐个上报"""
+        return self.config.get("report_batch_size", 100)
+
+    def get_report_gzip(self) -> bool:
+        """获取批量上报是否使用gzip压缩"""
+        return self.config.get("report_gzip", True)
+
+    def get_report_workers(self) -> int:
+        """获取并发上报的工作线程数"""
+        return self.config.get("report_workers", 8)
+
+    def get_report_endpoint_concurrency(self) -> int:
+        """获取每个上报端点的最大并发请求数"""
+        return self.config.get("report_endpoint_concurrency", 4)
+
+    def get_report_deadline(self) -> int:
+        """获取每个周期上报的截止时间（秒），超时未完成的上报推迟到下个周期"""
+        return self.config.get("report_deadline", 120)
+
+    def get_node_cache_file(self) -> Optional[str]:
+        """获取节点列表缓存文件路径，空字符串表示只在内存中缓存"""
+        return self.config.get("node_cache_file", "node_list_cache.json") or None
+
+    def get_sync_workers(self) -> int:
+        """获取并发同步本地节点的线程数"""
+        return self.config.get("sync_workers", 8)
+
+    def get_report_keyframe_interval(self) -> int:
+        """获取节点无变化时的最长上报间隔（秒），0表示每周期上报所有节点"""
+        return self.config.get("report_keyframe_interval", 300)
+
+    def get_report_latency_tolerance(self) -> int:
+        """获取增量上报时视为无变化的延迟波动（毫秒）"""
+        return self.config.get("report_latency_tolerance", 20)
+
+    def get_uptime_log_file(self) -> Optional[str]:
+        """获取easytier-uptime输出的滚动日志文件，空字符串表示写入监控脚本的日志"""
+        return self.config.get("uptime_log_file", "") or None
+
+    def get_history_dir(self) -> Optional[str]:
+        """获取节点健康历史的映射文件目录，空字符串表示不记录历史"""
+        return self.config.get("history_dir", "") or None
+
+    def get_history_capacity(self) -> int:
+        """获取每个节点保存的健康历史条数"""
+        return self.config.get("history_capacity", 2880)
+
+    def get_uptime_db_path(self) -> Optional[str]:
+        """获取easytier-uptime数据库路径，设置后直接读取数据库代替本地API，空字符串表示不使用"""
+        return self.config.get("uptime_db_path", "") or None
+
     def get_log_level(self) -> str:
         """获取日志级别"""
         return self.config.get("log_level", "INFO")
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+easytier-uptime数据库只读访问
+
+直接以只读方式打开easytier-uptime的SQLite数据库（WAL模式，读取不阻塞服务写入），
+代替通过本地HTTP API获取节点列表。节点状态按水位增量读取：
+health_records按rowid，shared_nodes按updated_at，每次只读取上次之后变化的行
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_NODE_COLUMNS = (
+    "id, name, host, port, protocol, version, allow_relay, network_name, network_secret, "
+    "description, max_connections, current_connections, is_active, is_approved, updated_at"
+)
+_HEALTH_COLUMNS = "id, node_id, status, response_time, error_message, checked_at"
+
+
+class UptimeDatabase:
+    """
+    easytier-uptime数据库的增量只读视图
+
+    poll返回的节点字典与本地API /api/nodes返回的节点保持相同的主要字段
+    （id、node_name、status、last_check、latency、health_stats）
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        """
+        Args:
+            path: uptime.db路径
+            timeout: 数据库忙时的等待时间（秒）
+        """
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._nodes: Dict[int, Dict[str, Any]] = {}
+        self._health_watermark = 0
+        self._node_watermark = ""
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            uri = f"file:{self.path}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA query_only = ON")
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if mode != "wal":
+                logger.warning(f"uptime数据库不是WAL模式 ({mode})，读取可能与服务写入互相阻塞")
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _node_record(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "node_name": row["name"],
+            "host": row["host"],
+            "port": row["port"],
+            "protocol": row["protocol"],
+            "version": row["version"],
+            "allow_relay": bool(row["allow_relay"]),
+            "network_name": row["network_name"],
+            "network_secret": row["network_secret"],
+            "description": row["description"],
+            "max_connections": row["max_connections"],
+            "current_connections": row["current_connections"],
+            "is_active": bool(row["is_active"]),
+            "is_approved": bool(row["is_approved"]),
+            "updated_at": row["updated_at"],
+            "status": "unknown",
+            "last_check": None,
+            "latency": 0,
+            "health_stats": {},
+        }
+
+    @staticmethod
+    def _apply_health(node: Dict[str, Any], row: sqlite3.Row):
+        node["status"] = row["status"]
+        node["last_check"] = row["checked_at"]
+        node["latency"] = row["response_time"]
+        node["health_stats"] = {
+            "error_message": row["error_message"],
+            "connection_count": node.get("current_connections", 0),
+            "version": node.get("version", ""),
+        }
+
+    @staticmethod
+    def _chunks(values: List[int], size: int = 500):
+        for start in range(0, len(values), size):
+            yield values[start:start + size]
+
+    def _latest_health(self, conn: sqlite3.Connection, node_ids: Optional[List[int]] = None) -> List[sqlite3.Row]:
+        """每个节点最新的一条健康记录（利用node_id索引取最大rowid），不扫描全部历史"""
+        query = f"SELECT {_HEALTH_COLUMNS} FROM health_records WHERE id IN (SELECT MAX(id) FROM health_records {{}} GROUP BY node_id)"
+        if node_ids is None:
+            return conn.execute(query.format("")).fetchall()
+        rows = []
+        for chunk in self._chunks(node_ids):
+            rows.extend(conn.execute(
+                query.format(f"WHERE node_id IN ({','.join('?' * len(chunk))})"), chunk
+            ).fetchall())
+        return rows
+
+    def poll(self) -> Tuple[List[Dict[str, Any]], Set[int]]:
+        """
+        读取上次调用后变化的行并更新节点视图
+
+        Returns:
+            (全部节点, 本次状态或配置发生变化的节点ID)
+
+        Raises:
+            sqlite3.Error: 数据库无法读取
+        """
+        with self._lock:
+            conn = self._connect()
+            changed: Set[int] = set()
+            # 在同一个读事务内读取，节点和健康记录来自同一时刻的快照
+            conn.execute("BEGIN")
+            try:
+                node_ids = {row[0] for row in conn.execute("SELECT id FROM shared_nodes")}
+                for node_id in set(self._nodes) - node_ids:
+                    del self._nodes[node_id]
+                    changed.add(node_id)
+
+                # 同一时间戳内可能有本次读取之后才提交的行，因此包含水位本身，再按内容去重
+                rows = conn.execute(
+                    f"SELECT {_NODE_COLUMNS} FROM shared_nodes WHERE updated_at >= ?", (self._node_watermark,)
+                ).fetchall()
+                seen = {row["id"] for row in rows}
+                missing = [node_id for node_id in node_ids if node_id not in self._nodes and node_id not in seen]
+                for chunk in self._chunks(missing):
+                    rows.extend(conn.execute(
+                        f"SELECT {_NODE_COLUMNS} FROM shared_nodes WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall())
+
+                new_ids = []
+                for row in rows:
+                    previous = self._nodes.get(row["id"])
+                    node = self._node_record(row)
+                    if previous is None:
+                        new_ids.append(row["id"])
+                    else:
+                        for name in ("status", "last_check", "latency", "health_stats"):
+                            node[name] = previous[name]
+                    if node != previous:
+                        self._nodes[row["id"]] = node
+                        changed.add(row["id"])
+                    self._node_watermark = max(self._node_watermark, row["updated_at"])
+
+                max_row = conn.execute("SELECT MAX(id) FROM health_records").fetchone()[0] or 0
+                if self._health_watermark == 0:
+                    health_rows = self._latest_health(conn)
+                else:
+                    # 新节点先取最新记录，再按rowid顺序应用水位之后的记录
+                    health_rows = self._latest_health(conn, new_ids) if new_ids else []
+                    health_rows += conn.execute(
+                        f"SELECT {_HEALTH_COLUMNS} FROM health_records WHERE id > ? AND id <= ? ORDER BY id",
+                        (self._health_watermark, max_row)
+                    ).fetchall()
+                for row in health_rows:
+                    node = self._nodes.get(row["node_id"])
+                    if node is not None:
+                        self._apply_health(node, row)
+                        changed.add(row["node_id"])
+                self._health_watermark = max(self._health_watermark, max_row)
+            finally:
+                conn.execute("COMMIT")
+
+            return [dict(node) for node in self._nodes.values()], changed
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+节点健康检查历史
+
+每个节点一个固定容量的环形缓冲区，按列保存检查时间、响应时间、连接数和在线状态；
+指定目录时每个节点对应一个内存映射文件，进程重启后历史仍然保留；
+已有文件按文件头中的容量打开，容量配置变化时在下次写入前把记录迁移到新容量的文件。
+统计任意时间窗口的在线率和延迟分位数时只读取窗口内的数据，安装了NumPy时使用向量化计算
+"""
+
+import bisect
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from NodeChecker import HealthCheckResult
+
+try:
+    import numpy as np
+except ImportError:  # NumPy是可选依赖
+    np = None
+
+_MAGIC = b'EHR1'
+# 文件头：标识、容量、下一个写入位置、已写入条数
+_HEADER = struct.Struct('<4sIII')
+# 各列的类型和每条记录的字节数，按对齐要求从大到小排列
+_COLUMNS = (('timestamp', 'd', 8), ('response_time_ms', 'i', 4), ('connection_count', 'i', 4), ('is_online', 'B', 1))
+_RECORD_SIZE = sum(size for _, _, size in _COLUMNS)
+
+
+class HealthRing:
+    """
+    单个节点的环形缓冲区
+
+    缓冲区可以是bytearray（仅内存）或mmap（映射到文件），各列通过memoryview直接访问
+    """
+
+    def __init__(self, buffer, capacity: int):
+        self.buffer = buffer
+        self.capacity = capacity
+        self.columns: Dict[str, memoryview] = {}
+        offset = _HEADER.size
+        view = memoryview(buffer)
+        for name, code, size in _COLUMNS:
+            self.columns[name] = view[offset:offset + size * capacity].cast(code)
+            offset += size * capacity
+        magic, stored_capacity, self.head, self.count = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            self.head = self.count = 0
+            self._write_header()
+        elif stored_capacity != capacity:
+            raise ValueError(f"ring capacity {stored_capacity} does not match {capacity}")
+
+    @staticmethod
+    def buffer_size(capacity: int) -> int:
+        return _HEADER.size + _RECORD_SIZE * capacity
+
+    def _write_header(self):
+        _HEADER.pack_into(self.buffer, 0, _MAGIC, self.capacity, self.head, self.count)
+
+    def append(self, timestamp: float, response_time_ms: int, connection_count: int, is_online: bool):
+        i = self.head
+        self.columns['timestamp'][i] = timestamp
+        self.columns['response_time_ms'][i] = response_time_ms
+        self.columns['connection_count'][i] = connection_count
+        self.columns['is_online'][i] = 1 if is_online else 0
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self._write_header()
+
+    def segments(self, since: Optional[float] = None, until: Optional[float] = None) -> List[Tuple[int, int]]:
+        """
+        时间窗口[since, until)在缓冲区中的下标区间
+
+        缓冲区按写入顺序最多分为两段（回绕前的旧数据和回绕后的新数据），
+        每段内时间递增，用二分查找确定边界
+        """
+        if self.count < self.capacity:
+            parts = [(0, self.count)]
+        else:
+            parts = [(self.head, self.capacity), (0, self.head)]
+        timestamps = self.columns['timestamp']
+        result = []
+        for start, end in parts:
+            if start >= end:
+                continue
+            segment = timestamps[start:end]
+            lo = 0 if since is None else bisect.bisect_left(segment, since)
+            hi = len(segment) if until is None else bisect.bisect_left(segment, until)
+            if lo < hi:
+                result.append((start + lo, start + hi))
+        return result
+
+    def records(self) -> Iterator[Tuple[float, int, int, bool]]:
+        """按写入顺序返回全部记录"""
+        columns = [self.columns[name] for name, _, _ in _COLUMNS]
+        for start, end in self.segments():
+            for i in range(start, end):
+                timestamp, response_time_ms, connection_count, is_online = (column[i] for column in columns)
+                yield timestamp, response_time_ms, connection_count, bool(is_online)
+
+    def release(self):
+        """释放各列对缓冲区的引用，之后才能关闭映射"""
+        for view in self.columns.values():
+            view.release()
+
+    def column(self, name: str, segments: Sequence[Tuple[int, int]]):
+        """按区间取出一列数据，NumPy可用时返回数组（不复制映射内存中的数据）"""
+        view = self.columns[name]
+        if np is not None:
+            array = np.frombuffer(view, dtype=view.format)
+            if len(segments) == 1:
+                return array[segments[0][0]:segments[0][1]]
+            return np.concatenate([array[start:end] for start, end in segments])
+        values = []
+        for start, end in segments:
+            values.extend(view[start:end])
+        return values
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """线性插值分位数，与numpy.percentile的默认方法一致"""
+    if len(sorted_values) == 1:
+        return float(sorted_values[0])
+    position = (len(sorted_values) - 1) * percentile / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class HealthHistoryStore:
+    """
+    节点健康检查历史存储
+
+    directory为None时只保存在内存中；否则每个节点对应directory下的一个.ring文件
+    """
+
+    def __init__(self, directory: Optional[str] = None, capacity: int = 2880):
+        """
+        Args:
+            directory: 映射文件所在目录
+            capacity: 每个节点保存的最大检查次数
+        """
+        self.directory = directory
+        self.capacity = capacity
+        self._rings: Dict[Any, HealthRing] = {}
+        self._mmaps: List[mmap.mmap] = []
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, node_id: Any) -> str:
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', str(node_id))
+        return os.path.join(self.directory, f"{name}.ring")
+
+    def _open_file(self, path: str) -> Optional[HealthRing]:
+        """按文件头中的容量映射已有的.ring文件，不修改文件；文件无效时返回None"""
+        with open(path, 'r+b') as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return None
+            magic, capacity, _, _ = _HEADER.unpack(header)
+            size = HealthRing.buffer_size(capacity)
+            if magic != _MAGIC or not capacity or os.fstat(f.fileno()).st_size != size:
+                return None
+            buffer = mmap.mmap(f.fileno(), size)
+        self._mmaps.append(buffer)
+        return HealthRing(buffer, capacity)
+
+    def _create_file(self, path: str, records: Iterable[Tuple[float, int, int, bool]] = ()) -> HealthRing:
+        """以当前容量写入新的.ring文件（写入临时文件后原子替换），records按写入顺序排列"""
+        ring = HealthRing(bytearray(HealthRing.buffer_size(self.capacity)), self.capacity)
+        for record in records:
+            ring.append(*record)
+        ring.release()
+        fd, temp_path = tempfile.mkstemp(prefix='.ring-', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(ring.buffer)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return self._open_file(path)
+
+    def _close_ring(self, ring: HealthRing):
+        ring.release()
+        if isinstance(ring.buffer, mmap.mmap):
+            self._mmaps.remove(ring.buffer)
+            ring.buffer.close()
+
+    def _ring(self, node_id: Any, create: bool = True) -> Optional[HealthRing]:
+        """
+        节点的环形缓冲区
+
+        Args:
+            create: 写入路径为True，缓冲区不存在时创建，容量与配置不同时迁移记录；
+                    读取路径为False，只按已有文件的容量打开，从不修改文件
+        """
+        ring = self._rings.get(node_id)
+        if ring is not None and (not create or ring.capacity == self.capacity):
+            return ring
+        if not self.directory:
+            if not create:
+                return None
+            ring = HealthRing(bytearray(HealthRing.buffer_size(self.capacity)), self.capacity)
+            self._rings[node_id] = ring
+            return ring
+
+        path = self._path(node_id)
+        if ring is None:
+            ring = self._open_file(path) if os.path.exists(path) else None
+        else:
+            del self._rings[node_id]
+        if ring is None:
+            if not create:
+                return None
+            ring = self._create_file(path)
+        elif create and ring.capacity != self.capacity:
+            # 保留最新的记录
+            records = list(ring.records())[-self.capacity:]
+            self._close_ring(ring)
+            ring = self._create_file(path, records)
+        self._rings[node_id] = ring
+        return ring
+
+    def append(self, node_id: Any, result: HealthCheckResult, timestamp: Optional[float] = None):
+        """记录一次健康检查结果"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            self._ring(node_id).append(
+                timestamp, result.response_time_ms, result.connection_count, result.is_online
+            )
+
+    def extend(self, items: Iterable[Tuple[Any, HealthCheckResult]], timestamp: Optional[float] = None):
+        timestamp = time.time() if timestamp is None else timestamp
+        for node_id, result in items:
+            self.append(node_id, result, timestamp)
+
+    def uptime(self, node_id: Any, since: Optional[float] = None, until: Optional[float] = None) -> Optional[float]:
+        """
+        时间窗口内的在线率（百分比）
+
+        Returns:
+            在线率，窗口内没有记录时返回None
+        """
+        with self._lock:
+            ring = self._ring(node_id, create=False)
+            if ring is None:
+                return None
+            segments = ring.segments(since, until)
+            total = sum(end - start for start, end in segments)
+            if not total:
+                return None
+            online = ring.column('is_online', segments)
+            online_count = int(online.sum()) if np is not None else sum(online)
+        return online_count * 100.0 / total
+
+    def latency_percentiles(self, node_id: Any, percentiles: Sequence[float] = (50, 95, 99),
+                            since: Optional[float] = None, until: Optional[float] = None) -> Dict[float, float]:
+        """
+        时间窗口内在线检查的响应时间分位数（毫秒）
+
+        Returns:
+            分位数到响应时间的映射，窗口内没有在线记录时返回空字典
+        """
+        with self._lock:
+            ring = self._ring(node_id, create=False)
+            if ring is None:
+                return {}
+            segments = ring.segments(since, until)
+            latencies = ring.column('response_time_ms', segments)
+            online = ring.column('is_online', segments)
+            if np is not None:
+                values = latencies[online.astype(bool)]
+                if not len(values):
+                    return {}
+                return dict(zip(percentiles, (float(v) for v in np.percentile(values, percentiles))))
+            values = sorted(latency for latency, up in zip(latencies, online) if up)
+        if not values:
+            return {}
+        return {p: _percentile(values, p) for p in percentiles}
+
+    def node_ids(self) -> List[Any]:
+        """已记录历史的节点（包括目录中已有的映射文件）"""
+        with self._lock:
+            ids = set(self._rings)
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.ring'):
+                    stem = name[:-len('.ring')]
+                    ids.add(int(stem) if stem.isdigit() else stem)
+        return sorted(ids, key=str)
+
+    def flush(self):
+        """把映射内存写回文件"""
+        with self._lock:
+            for buffer in self._mmaps:
+                buffer.flush()
+
+    def close(self):
+        with self._lock:
+            for ring in self._rings.values():
+                ring.release()
+            self._rings.clear()
+            for buffer in self._mmaps:
+                buffer.flush()
+                buffer.close()
+            self._mmaps.clear()
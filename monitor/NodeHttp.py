@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+监控脚本共享的HTTP客户端
+
+基于http.client实现，按(协议, 主机, 端口)维护keep-alive连接池，
+限制每个主机的并发连接数，统一重试策略，并记录每个请求的延迟。
+与requests一样使用环境变量中的代理设置（HTTP_PROXY/HTTPS_PROXY/NO_PROXY）并跟随重定向
+"""
+
+import base64
+import http.client
+import json
+import logging
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import SplitResult, unquote, urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass_environment
+
+logger = logging.getLogger(__name__)
+
+# 复用的连接被对端关闭时出现的错误，可以立即换新连接重发
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    ConnectionResetError,
+    BrokenPipeError,
+    http.client.CannotSendRequest,
+)
+
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class HttpRequestError(Exception):
+    """请求在所有重试后仍未得到响应"""
+    pass
+
+
+class HttpError(Exception):
+    """服务器返回错误状态码"""
+
+    def __init__(self, response: 'HttpResponse'):
+        super().__init__(f"HTTP {response.status}: {response.method} {response.url}")
+        self.response = response
+        self.status = response.status
+
+
+@dataclass
+class HttpResponse:
+    """HTTP响应"""
+    method: str
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    latency_ms: float = 0.0
+    from_cache: bool = False
+    parsed: Any = field(default=None, repr=False, compare=False)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    def json(self) -> Any:
+        """解析JSON响应体，结果会被缓存，来自条件请求缓存的响应不会重复解析"""
+        if self.parsed is None:
+            self.parsed = json.loads(self.body.decode('utf-8'))
+        return self.parsed
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HttpError(self)
+
+
+@dataclass
+class RetryPolicy:
+    """
+    统一重试策略
+
+    网络错误和retry_statuses中的状态码会重试，第n次重试前等待
+    backoff_base * 2 ** n秒，并加上最多jitter比例的随机抖动
+    """
+    max_retries: int = 3
+    backoff_base: float = 1.0
+    max_backoff: float = 30.0
+    jitter: float = 0.1
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    def delay(self, retry_count: int) -> float:
+        """第retry_count次重试前的等待时间（秒）"""
+        wait = min(self.max_backoff, self.backoff_base * 2 ** retry_count)
+        return wait * (1 + random.uniform(0, self.jitter))
+
+
+@dataclass
+class HttpMetrics:
+    """HTTP请求统计"""
+    requests: int = 0
+    failures: int = 0
+    retries: int = 0
+    connections_opened: int = 0
+    connections_reused: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    latencies_ms: deque = field(default_factory=lambda: deque(maxlen=1000))
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, latency_ms: float, failed: bool = False):
+        with self._lock:
+            self.requests += 1
+            if failed:
+                self.failures += 1
+            else:
+                self.latencies_ms.append(latency_ms)
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def summary(self) -> Dict[str, Any]:
+        """返回统计摘要，延迟为最近1000个成功请求的分位数"""
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+            summary = {
+                "requests": self.requests,
+                "failures": self.failures,
+                "retries": self.retries,
+                "connections_opened": self.connections_opened,
+                "connections_reused": self.connections_reused,
+            }
+            cache_lookups = self.cache_hits + self.cache_misses
+            if cache_lookups:
+                summary["cache_hit_rate"] = round(self.cache_hits / cache_lookups, 3)
+        if latencies:
+            summary["latency_p50_ms"] = round(latencies[len(latencies) // 2], 1)
+            summary["latency_p95_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1)
+        return summary
+
+
+class ResponseCache:
+    """
+    条件请求缓存
+
+    按URL保存GET响应和校验器（ETag/Last-Modified），再次请求时发送
+    If-None-Match/If-Modified-Since，服务器返回304时直接使用缓存的响应。
+    指定path时缓存同时保存到磁盘，进程重启后仍可使用
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 64):
+        """
+        Args:
+            path: 磁盘缓存文件路径，None表示只在内存中缓存
+            max_entries: 最多缓存的URL数量，超出时丢弃最久未使用的
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, HttpResponse]' = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取响应缓存失败: {self.path} - {str(e)}")
+            return
+        for url, entry in stored.items():
+            self._entries[url] = HttpResponse(
+                'GET', url, 200, entry.get('headers', {}), entry.get('body', '').encode('utf-8')
+            )
+
+    def _save(self):
+        """写入临时文件后替换，避免中断时留下不完整的缓存文件"""
+        stored = {}
+        for url, response in self._entries.items():
+            try:
+                body = response.body.decode('utf-8')
+            except UnicodeDecodeError:
+                continue
+            headers = {k: v for k, v in response.headers.items() if k in ('etag', 'last-modified', 'content-type')}
+            stored[url] = {"headers": headers, "body": body}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, temp_path = tempfile.mkstemp(prefix='.cache-', dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(stored, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"保存响应缓存失败: {self.path} - {str(e)}")
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """返回条件请求头，没有缓存时返回空字典"""
+        with self._lock:
+            response = self._entries.get(url)
+        if response is None:
+            return {}
+        headers = {}
+        if 'etag' in response.headers:
+            headers['If-None-Match'] = response.headers['etag']
+        if 'last-modified' in response.headers:
+            headers['If-Modified-Since'] = response.headers['last-modified']
+        return headers
+
+    def lookup(self, url: str) -> Optional[HttpResponse]:
+        with self._lock:
+            response = self._entries.get(url)
+            if response is not None:
+                self._entries.move_to_end(url)
+            return response
+
+    def store(self, url: str, response: HttpResponse):
+        """保存带校验器的成功响应"""
+        if response.status != 200 or not ('etag' in response.headers or 'last-modified' in response.headers):
+            return
+        with self._lock:
+            self._entries[url] = response
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.path:
+                self._save()
+
+
+class _HostPool:
+    """
+    单个主机的keep-alive连接池
+
+    经过代理时，HTTP请求发送完整URL给代理，HTTPS请求通过CONNECT隧道
+    """
+
+    def __init__(self, scheme: str, host: str, port: Optional[int], max_connections: int,
+                 proxy: Optional[SplitResult] = None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.proxy = proxy
+        self.proxy_headers: Dict[str, str] = {}
+        if proxy is not None and proxy.username:
+            credentials = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+            self.proxy_headers['Proxy-Authorization'] = f"Basic {base64.b64encode(credentials.encode()).decode()}"
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def target(self, path: str) -> Tuple[str, Dict[str, str]]:
+        """请求行中的目标和额外的请求头（经过HTTP代理时为完整URL和代理认证头）"""
+        if self.proxy is not None and self.scheme == 'http':
+            netloc = self.host if self.port is None else f"{self.host}:{self.port}"
+            return f"http://{netloc}{path}", self.proxy_headers
+        return path, {}
+
+    def new_connection(self, timeout: float) -> http.client.HTTPConnection:
+        """建立新连接并关闭Nagle算法，避免keep-alive连接上的小请求被延迟确认拖慢"""
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        if self.proxy is not None:
+            proxy_port = self.proxy.port or (443 if self.proxy.scheme == 'https' else 80)
+            conn = connection_class(self.proxy.hostname, proxy_port, timeout=timeout)
+            if self.scheme == 'https':
+                conn.set_tunnel(self.host, self.port, headers=self.proxy_headers)
+        else:
+            conn = connection_class(self.host, self.port, timeout=timeout)
+        conn.connect()
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn
+
+    def acquire(self) -> Optional[http.client.HTTPConnection]:
+        """占用一个连接槽位并取出空闲连接，没有空闲连接时返回None"""
+        self._slots.acquire()
+        with self._lock:
+            return self._idle.pop() if self._idle else None
+
+    def release(self, conn: Optional[http.client.HTTPConnection], reusable: bool):
+        """归还连接槽位，可复用的连接放回空闲列表"""
+        try:
+            if conn is not None:
+                if reusable:
+                    with self._lock:
+                        self._idle.append(conn)
+                else:
+                    conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class HttpClient:
+    """
+    线程安全的HTTP客户端
+
+    同一主机的请求复用keep-alive连接，并发连接数不超过max_connections_per_host，
+    超出的请求在线程中等待空闲连接
+    """
+
+    def __init__(self, timeout: float = 10, max_connections_per_host: int = 4,
+                 retry: Optional[RetryPolicy] = None, headers: Optional[Dict[str, str]] = None,
+                 proxies: Optional[Dict[str, str]] = None, max_redirects: int = 5):
+        """
+        Args:
+            timeout: 默认请求超时时间（秒）
+            max_connections_per_host: 每个主机的最大并发连接数
+            retry: 默认重试策略
+            headers: 每个请求都携带的请求头
+            proxies: 协议到代理URL的映射（可包含"no"排除列表），None表示读取环境变量
+            max_redirects: 最多跟随的重定向次数
+        """
+        self.timeout = timeout
+        self.max_connections_per_host = max_connections_per_host
+        self.retry = retry or RetryPolicy()
+        self.headers = dict(headers or {})
+        self.proxies = getproxies() if proxies is None else dict(proxies)
+        self.max_redirects = max_redirects
+        self.metrics = HttpMetrics()
+        self._pools: Dict[Tuple[str, str, Optional[int], Optional[str]], _HostPool] = {}
+        self._lock = threading.Lock()
+
+    def _proxy_for(self, scheme: str, host: str) -> Optional[str]:
+        """目标主机使用的代理，NO_PROXY中的主机直接连接"""
+        proxy = self.proxies.get(scheme)
+        if not proxy or proxy_bypass_environment(host, self.proxies):
+            return None
+        return proxy if '://' in proxy else f"http://{proxy}"
+
+    def _pool(self, scheme: str, host: str, port: Optional[int]) -> _HostPool:
+        proxy = self._proxy_for(scheme, host)
+        key = (scheme, host, port, proxy)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = _HostPool(scheme, host, port, self.max_connections_per_host,
+                                 urlsplit(proxy) if proxy else None)
+                self._pools[key] = pool
+            return pool
+
+    def _send(self, pool: _HostPool, method: str, path: str, body: Optional[bytes],
+              headers: Dict[str, str], timeout: float) -> Tuple[int, Dict[str, str], bytes]:
+        """在连接池的连接上发送一次请求，复用的连接失效时换新连接重发一次"""
+        target, extra_headers = pool.target(path)
+        if extra_headers:
+            headers = {**headers, **extra_headers}
+        conn = pool.acquire()
+        reusable = False
+        try:
+            while True:
+                reused = conn is not None
+                if conn is None:
+                    conn = pool.new_connection(timeout)
+                    self.metrics.count("connections_opened")
+                else:
+                    self.metrics.count("connections_reused")
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                try:
+                    conn.request(method, target, body=body, headers=headers)
+                    response = conn.getresponse()
+                    data = response.read()
+                except _STALE_CONNECTION_ERRORS:
+                    conn.close()
+                    conn = None
+                    if reused:
+                        continue
+                    raise
+                reusable = not response.will_close
+                return response.status, {k.lower(): v for k, v in response.getheaders()}, data
+        except Exception:
+            reusable = False
+            raise
+        finally:
+            pool.release(conn, reusable)
+
+    def request(self, method: str, url: str, json_data: Any = None, data: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+                retry: Optional[RetryPolicy] = None, cache: Optional[ResponseCache] = None) -> HttpResponse:
+        """
+        发起请求，按重试策略重试网络错误和可重试的状态码
+
+        指定cache的GET请求会发送条件请求头，服务器返回304时
+        返回缓存的响应（from_cache为True）。重定向最多跟随max_redirects次：
+        303以及POST的301/302改为不带请求体的GET，307/308保持原方法和请求体，
+        跳转到其他主机时不再发送Authorization头
+
+        Returns:
+            最后一次得到的响应（状态码可能表示错误）
+
+        Raises:
+            HttpRequestError: 所有尝试都没有得到响应
+        """
+        body = data
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        if json_data is not None:
+            body = json.dumps(json_data).encode('utf-8')
+            request_headers.setdefault('Content-Type', 'application/json')
+
+        for _ in range(self.max_redirects + 1):
+            response = self._request_once(method, url, body, request_headers, timeout, retry, cache)
+            location = response.headers.get('location')
+            if response.status not in _REDIRECT_STATUSES or not location:
+                return response
+            target = urljoin(url, location)
+            logger.info(f"{method} {url} 重定向到 {target} (HTTP {response.status})")
+            if response.status == 303 or (response.status in (301, 302) and method == 'POST'):
+                method, body = 'GET', None
+                request_headers = {k: v for k, v in request_headers.items()
+                                   if k.lower() not in ('content-type', 'content-encoding')}
+            if urlsplit(target).netloc != urlsplit(url).netloc:
+                request_headers = {k: v for k, v in request_headers.items() if k.lower() != 'authorization'}
+            url = target
+        logger.warning(f"{method} {url} 重定向次数超过 {self.max_redirects} 次")
+        return response
+
+    def _request_once(self, method: str, url: str, body: Optional[bytes], headers: Dict[str, str],
+                      timeout: Optional[float], retry: Optional[RetryPolicy],
+                      cache: Optional[ResponseCache]) -> HttpResponse:
+        """向单个URL发起请求（不跟随重定向），按重试策略重试"""
+        retry = retry or self.retry
+        timeout = self.timeout if timeout is None else timeout
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        pool = self._pool(parts.scheme, parts.hostname, parts.port)
+
+        request_headers = dict(headers)
+        if method != 'GET':
+            cache = None
+        if cache is not None:
+            request_headers.update(cache.validators(url))
+
+        retry_count = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                status, response_headers, response_body = self._send(
+                    pool, method, path, body, request_headers, timeout
+                )
+            except (OSError, http.client.HTTPException) as e:
+                self.metrics.record((time.perf_counter() - start) * 1000, failed=True)
+                if retry_count >= retry.max_retries:
+                    raise HttpRequestError(f"{method} {url} failed: {e}") from e
+                error = str(e) or e.__class__.__name__
+            else:
+                latency_ms = (time.perf_counter() - start) * 1000
+                self.metrics.record(latency_ms, failed=status >= 400)
+                response = HttpResponse(method, url, status, response_headers, response_body, latency_ms)
+                if status not in retry.retry_statuses or retry_count >= retry.max_retries:
+                    if cache is not None:
+                        response = self._apply_cache(cache, url, response)
+                    return response
+                error = f"HTTP {status}"
+
+            wait_time = retry.delay(retry_count)
+            retry_count += 1
+            self.metrics.count("retries")
+            logger.info(f"{method} {url} {error}，{wait_time:.1f}秒后重试 ({retry_count}/{retry.max_retries})...")
+            time.sleep(wait_time)
+
+    def _apply_cache(self, cache: ResponseCache, url: str, response: HttpResponse) -> HttpResponse:
+        """304时换成缓存的响应，200时更新缓存"""
+        if response.status == 304:
+            cached = cache.lookup(url)
+            if cached is not None:
+                self.metrics.count("cache_hits")
+                return replace(cached, latency_ms=response.latency_ms, from_cache=True)
+        elif response.status == 200:
+            self.metrics.count("cache_misses")
+            cache.store(url, response)
+        return response
+
+    def get(self, url: str, **kwargs) -> HttpResponse:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> HttpResponse:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> HttpResponse:
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> HttpResponse:
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
@@ -5,22 +5,31 @@
 
 import argparse
 import asyncio
+import gzip
 import json
 import logging
 import os
 import platform
-import socket
-import subprocess
+import sqlite3
 import sys
 import threading
 import time
 import traceback
+import re
 import urllib.parse
-import urllib.request
 from typing import Dict, List, Optional, Tuple
 
 # 导入配置和健康检查模块
+from NodeChecker import EasyTierHealthChecker, HealthCheckResult, HealthResultSink, NodeInfo
 from NodeConfigs import NodeMonitorConfig
+from NodeDatabase import UptimeDatabase
+from NodeHistory import HealthHistoryStore
+from NodeHttp import HttpClient, HttpRequestError, HttpResponse, ResponseCache, RetryPolicy
+from NodeReadiness import snapshot_last_checks, wait_for_service, wait_until_fresh
+from NodeReporter import DeltaReportFilter, DispatchResult, ReportDispatcher
+from NodeScheduler import AdaptiveProbeScheduler
+from NodeSync import RemoteNodeMirror, execute_plan, plan_sync
+from NodeUptime import SupervisedProcess
 
 # 配置日志
 logging.basicConfig(
@@ -29,6 +38,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# easytier-uptime输出中表示HTTP服务开始监听的日志
+_LISTENING_PATTERN = re.compile(r'listen', re.IGNORECASE)
+
+
+class ReportSink(HealthResultSink):
+    """
+    上报接收器 - 每个节点检查完成后立即上报，不等待整批探测结束
+
+    上报请求交给监控器的上报调度器并发发送，close时等待本周期的上报完成
+    """
+
+    def __init__(self, monitor: 'NodeMonitor', endpoint: str = '/api/report'):
+        self.monitor = monitor
+        self.endpoint = endpoint
+        self._reported_ids = set()
+
+    async def on_result(self, node: NodeInfo, result: HealthCheckResult):
+        report_data = self.monitor.build_check_report(node, result)
+        self._reported_ids.add(node.node_id)
+        if self.monitor.history is not None:
+            self.monitor.history.append(node.node_id, result)
+        self.monitor.reporter.submit(self.endpoint, report_data)
+
+    async def close(self):
+        # 上周期推迟且本周期未重新探测的上报一并发送
+        for endpoint, report_data in self.monitor.take_deferred_reports(self._reported_ids):
+            self.monitor.reporter.submit(endpoint, report_data)
+        await asyncio.to_thread(self.monitor.finish_reports)
+
 
 class NodeMonitor:
     """
@@ -50,104 +88,302 @@ class NodeMonitor:
             'Content-Type': 'application/json'
         }
         self.config = NodeMonitorConfig(config_file or "node_monitor_config.json")
+        self.local_api_base_url = "http://localhost:8080"
+        # 远程API和本地服务共用的keep-alive连接池
+        self.http = HttpClient(max_connections_per_host=8)
+        # 节点列表的条件请求缓存，列表未变化时服务器返回304
+        self.node_cache = ResponseCache(self.config.get_node_cache_file())
 
         # 设置日志级别
         log_level = getattr(logging, self.config.get_log_level().upper(), logging.INFO)
         logger.setLevel(log_level)
 
-    def make_report_request(self, endpoint: str, data: Dict, retry_count: int = 0) -> Optional[Dict]:
-        url = f"{self.api_base_url}{endpoint}"
-        max_retries = self.config.get_max_retries()
+        # 直接探测模式下按节点调整探测间隔
+        self.probe_scheduler = AdaptiveProbeScheduler(
+            base_interval=self.config.get_probe_interval(),
+            max_interval=self.config.get_probe_max_interval(),
+            probes_per_minute=self.config.get_probe_budget()
+        )
+
+        # 常驻模式状态
+        self.uptime_process: Optional[SupervisedProcess] = None
+        self._uptime_restarts = 0
+        self.last_startup_seconds: Optional[float] = None
+        self._stop_event = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._checker: Optional[EasyTierHealthChecker] = None
+        # 逐个上报的请求由调度器并发发送，重试在延迟队列中等待
+        self.reporter = ReportDispatcher(
+            self._report_once,
+            workers=self.config.get_report_workers(),
+            per_endpoint_limit=self.config.get_report_endpoint_concurrency(),
+            retry=self._retry_policy()
+        )
+        # 超过周期截止时间而推迟的上报：节点ID -> (端点, 数据)
+        self._deferred_reports: Dict = {}
+        # 只上报状态有变化的节点，并定期完整上报
+        self.delta_filter = DeltaReportFilter(
+            keyframe_interval=self.config.get_report_keyframe_interval(),
+            latency_tolerance_ms=self.config.get_report_latency_tolerance()
+        )
+        # 服务器不支持批量上报时回退为逐个上报
+        self._batch_report_supported = True
+        # 可选：直接只读访问easytier-uptime数据库，代替本地API读取节点列表
+        db_path = self.config.get_uptime_db_path()
+        self.uptime_db = UptimeDatabase(db_path) if db_path else None
+        # 可选：每个节点的健康检查历史，用于统计任意时间窗口的在线率和延迟分位数
+        history_dir = self.config.get_history_dir()
+        self.history = HealthHistoryStore(history_dir, self.config.get_history_capacity()) if history_dir else None
+        # 远程节点镜像，节点摘要未变化时跳过同步
+        self.remote_mirror = RemoteNodeMirror()
+        self._digest_supported = True
+        # 常驻模式下新添加、尚未完成首次健康检查的节点
+        self._awaiting_checks: Dict = {}
+        self.last_readiness_seconds: Optional[float] = None
+
+    def _retry_policy(self) -> RetryPolicy:
+        """按配置生成远程API的重试策略"""
+        return RetryPolicy(max_retries=self.config.get_max_retries())
 
+    def _log_error_response(self, response: HttpResponse, prefix: str, label: str):
+        """记录错误响应的详情"""
+        logger.error(f"{prefix}HTTP错误 {response.status}: {label}")
         try:
-            data_bytes = json.dumps(data).encode('utf-8')
-            request = urllib.request.Request(url, data=data_bytes, method='POST')
-            request.add_header('Content-Type', 'application/json')
-
-            timeout = self.config.get_connection_timeout()
-            with urllib.request.urlopen(request, timeout=timeout) as response:
-                result = json.loads(response.read().decode('utf-8'))
-                logger.info(f"上报API请求成功: {endpoint}")
-                return result
-
-        except urllib.error.HTTPError as e:
-            logger.error(f"上报API HTTP错误 {e.code}: {endpoint}")
-            try:
-                error_data = json.loads(e.read().decode('utf-8'))
-                logger.error(f"错误详情: {error_data}")
-                # 如果是token验证失败，尝试重新生成token
-                if e.code == 403 and 'Token验证失败' in str(error_data):
-                    logger.warning("Token验证失败，可能需要重新生成节点上报token")
-            except:
-                logger.error(f"无法解析错误响应")
-        except socket.timeout:
-            logger.error(f"上报请求超时: {endpoint}")
-        except Exception as e:
+            error_data = response.json()
+            logger.error(f"错误详情: {error_data}")
+        except Exception:
+            logger.error("无法解析错误响应")
+            return None
+        return error_data
+
+    def _report_once(self, endpoint: str, data: Dict) -> Tuple[bool, bool, Optional[Dict]]:
+        """
+        发送一次上报请求，不在当前线程中等待重试
+
+        Returns:
+            (是否成功, 是否可重试, 响应数据)
+        """
+        url = f"{self.api_base_url}{endpoint}"
+        retry = self._retry_policy()
+        try:
+            response = self.http.post(
+                url,
+                json_data=data,
+                timeout=self.config.get_connection_timeout(),
+                retry=RetryPolicy(max_retries=0)
+            )
+        except HttpRequestError as e:
             logger.error(f"上报API请求失败: {endpoint} - {str(e)}")
+            return False, True, None
 
-        # 重试逻辑
-        if retry_count < max_retries:
-            wait_time = 2 ** retry_count  # 指数退避
-            logger.info(f"{wait_time}秒后重试上报 ({retry_count + 1}/{max_retries})...")
-            time.sleep(wait_time)
-            return self.make_report_request(endpoint, data, retry_count + 1)
+        if not response.ok:
+            error_data = self._log_error_response(response, "上报API ", endpoint)
+            # 如果是token验证失败，尝试重新生成token
+            if response.status == 403 and 'Token验证失败' in str(error_data):
+                logger.warning("Token验证失败，可能需要重新生成节点上报token")
+            return False, response.status in retry.retry_statuses, None
 
-        return None
+        try:
+            result = response.json()
+        except ValueError:
+            logger.error(f"上报API响应不是有效的JSON: {endpoint}")
+            return False, False, None
+        logger.info(f"上报API请求成功: {endpoint}")
+        return True, False, result
 
-    def make_api_request(self, endpoint: str, method: str = 'GET', data: Optional[Dict] = None, retry_count: int = 0) -> \
-            Optional[Dict]:
+    def make_report_request(self, endpoint: str, data: Dict) -> Optional[Dict]:
         """
-        发起API请求（带重试机制）
+        发起上报请求并等待结果（带重试机制）
         
         Args:
             endpoint: API端点
-            method: 请求方法
-            data: 请求数据
-            retry_count: 当前重试次数
+            data: 上报数据
             
         Returns:
             响应数据或None
         """
+        task = self.reporter.submit(endpoint, data)
+        task.wait()
+        return task.response if task.success else None
+
+    def finish_reports(self) -> DispatchResult:
+        """
+        等待已提交的上报完成，超过周期截止时间的上报推迟到下个周期
+
+        Returns:
+            本周期的上报结果
+        """
+        result = self.reporter.drain(self.config.get_report_deadline())
+        for task in result.deferred:
+            node_id = task.payload.get('node_id')
+            self._deferred_reports[node_id] = (task.endpoint, task.payload)
+        if result.failed or result.deferred:
+            logger.warning(f"上报完成: 成功 {result.succeeded} 个, 失败 {len(result.failed)} 个, "
+                           f"推迟到下个周期 {len(result.deferred)} 个")
+        else:
+            logger.info(f"上报完成: 成功 {result.succeeded} 个")
+        return result
+
+    def take_deferred_reports(self, exclude_ids=()) -> List[Tuple[str, Dict]]:
+        """
+        取出上个周期推迟的上报，本周期已有新数据的节点直接丢弃旧上报
+
+        Args:
+            exclude_ids: 本周期已上报的节点ID
+        """
+        deferred, self._deferred_reports = self._deferred_reports, {}
+        return [item for node_id, item in deferred.items() if node_id not in exclude_ids]
+
+    def _send_report_batch(self, endpoint: str, reports: List[Dict]) -> Optional[Tuple[List[Dict], List[Dict]]]:
+        """
+        发送一批上报数据
+
+        Returns:
+            (服务器接受的上报, 需要逐个重发的上报)，整批失败时返回None；
+            服务器以不可重试的状态（如验证失败）拒绝的上报两者都不包含
+        """
         url = f"{self.api_base_url}{endpoint}"
-        max_retries = self.config.get_max_retries()
+        body = json.dumps({"reports": reports}).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.config.get_report_gzip():
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
 
         try:
-            if data:
-                data_bytes = json.dumps(data).encode('utf-8')
-                request = urllib.request.Request(url, data=data_bytes, method=method)
-            else:
-                request = urllib.request.Request(url, method=method)
+            response = self.http.post(
+                url,
+                data=body,
+                headers=headers,
+                timeout=self.config.get_connection_timeout(),
+                retry=self._retry_policy()
+            )
+        except HttpRequestError as e:
+            logger.error(f"批量上报请求失败: {endpoint} - {str(e)}")
+            return None
 
-            # 添加认证头
-            for key, value in self.headers.items():
-                request.add_header(key, value)
+        if response.status in (404, 405, 501):
+            logger.warning(f"服务器不支持批量上报 (HTTP {response.status})，改为逐个上报")
+            self._batch_report_supported = False
+            return None
+        if not response.ok:
+            self._log_error_response(response, "批量上报API ", endpoint)
+            return None
 
-            timeout = self.config.get_connection_timeout()
-            with urllib.request.urlopen(request, timeout=timeout) as response:
-                result = json.loads(response.read().decode('utf-8'))
-                logger.info(f"API请求成功: {method} {endpoint}")
-                return result
+        # 服务器可以在results中逐项返回结果，未返回时视为全部成功
+        try:
+            results = response.json().get('results')
+        except (ValueError, AttributeError):
+            results = None
+        if not isinstance(results, list):
+            return list(reports), []
 
-        except urllib.error.HTTPError as e:
-            logger.error(f"HTTP错误 {e.code}: {method} {endpoint}")
-            try:
-                error_data = json.loads(e.read().decode('utf-8'))
-                logger.error(f"错误详情: {error_data}")
-            except:
-                logger.error(f"无法解析错误响应")
-        except socket.timeout:
-            logger.error(f"请求超时: {method} {endpoint}")
-        except Exception as e:
+        retry_statuses = self._retry_policy().retry_statuses
+        failed = {}
+        for item in results:
+            if isinstance(item, dict) and not item.get('success', True):
+                status = item.get('status')
+                failed[item.get('node_id')] = status is None or status in retry_statuses
+                if status is not None and status not in retry_statuses:
+                    logger.error(f"服务器拒绝节点 {item.get('node_id')} 的上报 (HTTP {status}): {item.get('error')}")
+        accepted = [report for report in reports if report.get('node_id') not in failed]
+        retry = [report for report in reports if failed.get(report.get('node_id'))]
+        return accepted, retry
+
+    def report_batch(self, reports: List[Dict], endpoint: str = '/api/report') -> int:
+        """
+        批量上报节点状态，按report_batch_size分批发送，
+        批次失败或服务器暂时无法处理的节点回退为逐个上报
+
+        Args:
+            reports: 上报数据列表
+            endpoint: 单节点上报端点，批量端点为其下的/batch
+
+        Returns:
+            本次调用的上报中成功的数量
+        """
+        return len(self._deliver_reports(reports, endpoint))
+
+    def _deliver_reports(self, reports: List[Dict], endpoint: str = '/api/report') -> List[Dict]:
+        """
+        发送上报（批量优先），只统计本次调用的上报结果
+
+        Returns:
+            上报成功的数据（包括一并发送的上周期推迟的上报）
+        """
+        batch_size = self.config.get_report_batch_size()
+        delivered: List[Dict] = []
+        fallback: List[Dict] = []
+
+        # 上周期推迟的上报，本周期没有新数据的节点一并发送
+        reported_ids = {report.get('node_id') for report in reports}
+        reports = list(reports) + [
+            report_data for _, report_data in self.take_deferred_reports(reported_ids)
+        ]
+
+        if batch_size > 0 and self._batch_report_supported:
+            for i in range(0, len(reports), batch_size):
+                chunk = reports[i:i + batch_size]
+                if not self._batch_report_supported:
+                    fallback.extend(chunk)
+                    continue
+                outcome = self._send_report_batch(f"{endpoint}/batch", chunk)
+                if outcome is None:
+                    fallback.extend(chunk)
+                else:
+                    accepted, retry = outcome
+                    delivered.extend(accepted)
+                    fallback.extend(retry)
+            if reports:
+                logger.info(f"批量上报 {len(delivered)}/{len(reports)} 个节点成功")
+        else:
+            fallback = list(reports)
+
+        if fallback:
+            tasks = [(report_data, self.reporter.submit(endpoint, report_data)) for report_data in fallback]
+            self.finish_reports()
+            delivered.extend(report_data for report_data, task in tasks if task.success)
+        return delivered
+
+    def make_api_request(self, endpoint: str, method: str = 'GET', data: Optional[Dict] = None,
+                         cache: Optional[ResponseCache] = None) -> Optional[Dict]:
+        """
+        发起API请求（带重试机制）
+        
+        Args:
+            endpoint: API端点
+            method: 请求方法
+            data: 请求数据
+            cache: GET请求使用的条件请求缓存
+            
+        Returns:
+            响应数据或None
+        """
+        url = f"{self.api_base_url}{endpoint}"
+        try:
+            response = self.http.request(
+                method,
+                url,
+                json_data=data,
+                headers=self.headers,
+                timeout=self.config.get_connection_timeout(),
+                retry=self._retry_policy(),
+                cache=cache
+            )
+        except HttpRequestError as e:
             logger.error(f"API请求失败: {method} {endpoint} - {str(e)}")
+            return None
 
-        # 重试逻辑
-        if retry_count < max_retries:
-            wait_time = 2 ** retry_count  # 指数退避
-            logger.info(f"{wait_time}秒后重试 ({retry_count + 1}/{max_retries})...")
-            time.sleep(wait_time)
-            return self.make_api_request(endpoint, method, data, retry_count + 1)
+        if not response.ok:
+            self._log_error_response(response, "", f"{method} {endpoint}")
+            return None
 
-        return None
+        try:
+            result = response.json()
+        except ValueError:
+            logger.error(f"API响应不是有效的JSON: {method} {endpoint}")
+            return None
+        logger.info(f"API请求成功: {method} {endpoint}{'（未变化，使用缓存）' if response.from_cache else ''}")
+        return result
 
     def make_local_api_request(self, endpoint: str, method: str = 'GET', data: Optional[Dict] = None) -> Optional[Dict]:
         """
@@ -161,18 +397,11 @@ class NodeMonitor:
         Returns:
             响应数据或None
         """
-        url = f"http://localhost:8080{endpoint}"
+        url = f"{self.local_api_base_url}{endpoint}"
         try:
-            if data:
-                data_bytes = json.dumps(data).encode('utf-8')
-                request = urllib.request.Request(url, data=data_bytes, method=method)
-            else:
-                request = urllib.request.Request(url, method=method)
-            
-            request.add_header('Content-Type', 'application/json')
-            
-            with urllib.request.urlopen(request, timeout=5) as response:
-                return json.loads(response.read().decode('utf-8'))
+            response = self.http.request(method, url, json_data=data, timeout=5, retry=RetryPolicy(max_retries=0))
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
             logger.error(f"本地API请求失败: {method} {endpoint} - {str(e)}")
             return None
@@ -185,15 +414,55 @@ class NodeMonitor:
             节点列表
         """
         logger.info("开始获取用户节点列表...")
-        result = self.make_api_request('/api/nodes/all')
-
-        if result and 'nodes' in result:
-            nodes = result['nodes']
-            logger.info(f"成功获取 {len(nodes)} 个节点")
-            return nodes
-        else:
+        nodes = self._fetch_remote_nodes()
+        if nodes is None:
             logger.error("获取节点列表失败")
             return []
+        return nodes
+
+    def _fetch_remote_nodes(self, buckets: Optional[List[int]] = None, bucket_count: int = 64) -> Optional[List[Dict]]:
+        """
+        获取节点列表，可以只获取指定分桶的节点
+
+        Returns:
+            节点列表，失败时返回None
+        """
+        # 同步视图的ETag只随节点配置变化，节点状态变化时仍可使用缓存
+        endpoint = '/api/nodes/all?view=sync'
+        if buckets is not None:
+            endpoint += f"&buckets={','.join(map(str, buckets))}&bucket_count={bucket_count}"
+        result = self.make_api_request(endpoint, cache=self.node_cache)
+        if not result or 'nodes' not in result:
+            return None
+        nodes = result['nodes']
+        logger.info(f"成功获取 {len(nodes)} 个节点")
+        return nodes
+
+    def get_nodes_digest(self, bucket_count: int = 64) -> Optional[Dict]:
+        """获取节点列表的内容摘要，服务器不支持或请求失败时返回None"""
+        if not self._digest_supported:
+            return None
+        try:
+            response = self.http.get(
+                f"{self.api_base_url}/api/nodes/digest?bucket_count={bucket_count}",
+                headers=self.headers,
+                timeout=self.config.get_connection_timeout(),
+                retry=self._retry_policy()
+            )
+        except HttpRequestError as e:
+            logger.warning(f"获取节点摘要失败: {str(e)}")
+            return None
+        if response.status in (404, 405, 501):
+            logger.info(f"服务器不支持节点摘要 (HTTP {response.status})，改为每次获取完整节点列表")
+            self._digest_supported = False
+            return None
+        if not response.ok:
+            self._log_error_response(response, "节点摘要", "/api/nodes/digest")
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
 
     def _start_uptime_service(self) -> bool:
         """
@@ -212,15 +481,17 @@ class NodeMonitor:
                 return False
             
             logger.info(f"Starting easytier-uptime service: {bin_path}")
-            # 启动服务，不等待
-            process = subprocess.Popen(
+            # 启动服务，不等待；输出由后台线程持续读取，进程退出后自动重启
+            process = SupervisedProcess(
                 [bin_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=bin_dir
+                cwd=bin_dir,
+                log_file=self.config.get_uptime_log_file()
             )
+            if not process.start():
+                return False
             # 存储进程，以便后续停止
             self.uptime_process = process
+            self._uptime_restarts = 0
             return True
         except Exception as e:
             logger.error(f"Failed to start easytier-uptime service: {str(e)}")
@@ -229,80 +500,346 @@ class NodeMonitor:
             
     def _wait_for_service_start(self, timeout=30):
         """
-        等待服务启动，直到/health端点返回200
+        等待服务启动，直到端口可连接且/health端点返回200
+        
+        从10毫秒开始按指数间隔检测，子进程输出监听日志时立即检测
         
         Args:
             timeout: 超时时间（秒）
         """
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                # 调用/health端点
-                health_url = "http://localhost:8080/health"
-                request = urllib.request.Request(health_url)
-                with urllib.request.urlopen(request, timeout=5) as response:
-                    if response.status == 200:
-                        logger.info("easytier-uptime service started successfully")
-                        return True
-            except Exception as e:
-                logger.debug(f"Waiting for service to start: {str(e)}")
-                time.sleep(1)
-        logger.error("easytier-uptime service failed to start within timeout")
-        return False
-
-    def _sync_nodes(self):
-        """同步节点信息"""
-        # 获取API节点列表（源A）
+        parts = urllib.parse.urlsplit(self.local_api_base_url)
+        health_url = f"{self.local_api_base_url}/health"
+        
+        def health_check() -> bool:
+            response = self.http.get(health_url, timeout=1, retry=RetryPolicy(max_retries=0))
+            return response.status == 200
+        
+        listening = threading.Event()
+        
+        def on_line(line: str):
+            if _LISTENING_PATTERN.search(line):
+                listening.set()
+        
+        process = self.uptime_process
+        if process is not None:
+            process.add_line_listener(on_line)
         try:
-            api_nodes = self._get_api_nodes()
-            self.logger.info(f"从API获取{len(api_nodes)}个节点")
-        except Exception as e:
-            self.logger.error(f"获取API节点失败: {str(e)}")
-            return
+            ready, waited = wait_for_service(
+                parts.hostname, parts.port or 80, health_check,
+                timeout=timeout, wake_event=listening, stop_event=self._stop_event
+            )
+        finally:
+            if process is not None:
+                process.remove_line_listener(on_line)
         
-        # 获取本地数据库节点（源B）
+        if not ready:
+            logger.error("easytier-uptime service failed to start within timeout")
+            return False
+        startup = waited
+        if process is not None and process.started_at is not None:
+            startup = time.monotonic() - process.started_at
+        self.last_startup_seconds = startup
+        logger.info(f"easytier-uptime service started successfully, startup latency {startup * 1000:.0f} ms "
+                    f"(ready check waited {waited * 1000:.0f} ms)")
+        return True
+
+    def build_check_report(self, node: NodeInfo, result: HealthCheckResult) -> Dict:
+        """
+        将直接健康检查结果转换为上报数据
+
+        Args:
+            node: 节点信息
+            result: 健康检查结果
+
+        Returns:
+            上报数据
+        """
+        return {
+            "node_id": node.node_id,
+            "node_name": node.name,
+            "status": "online" if result.is_online else "offline",
+            "last_check": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "latency": result.response_time_ms,
+            "health_stats": {
+                "connection_count": result.connection_count,
+                "version": result.version,
+                "error_message": result.error_message
+            }
+        }
+
+    def _to_node_info(self, node: Dict) -> Optional[NodeInfo]:
+        """将API节点记录转换为探测用的NodeInfo，缺少地址时返回None"""
+        if not node.get('ip_address') or not node.get('port'):
+            return None
+        return NodeInfo(
+            node_id=node['id'],
+            name=node['node_name'],
+            protocol=node.get('protocol', 'tcp'),
+            host=node['ip_address'],
+            port=int(node['port']),
+            network_name=node.get('network_name', ''),
+            network_secret=node.get('network_token', '')
+        )
+
+    def check_and_report(self, node_infos: List[NodeInfo]) -> List[HealthCheckResult]:
+        """
+        直接探测节点并流式上报，已完成的节点无需等待慢节点即可上报
+
+        Args:
+            node_infos: 待探测节点
+
+        Returns:
+            与输入顺序一致的健康检查结果
+        """
+        timeout = self.config.get_connection_timeout()
+
+        async def run() -> List[HealthCheckResult]:
+            async with EasyTierHealthChecker(timeout=timeout) as checker:
+                return await checker.check_nodes_to_sink(node_infos, ReportSink(self))
+
+        logger.info(f"直接探测并上报 {len(node_infos)} 个节点...")
+        if self._loop is None:
+            return asyncio.run(run())
+
+        # 常驻模式复用事件循环和检查器，保持探测连接
+        if self._checker is None:
+            self._checker = EasyTierHealthChecker(timeout=timeout, keep_alive=True)
+        return self._loop.run_until_complete(
+            self._checker.check_nodes_to_sink(node_infos, ReportSink(self))
+        )
+
+    def check_and_report_nodes(self, nodes: List[Dict]) -> List[HealthCheckResult]:
+        """
+        直接探测API返回的全部节点并流式上报
+
+        Args:
+            nodes: API返回的节点列表
+
+        Returns:
+            健康检查结果列表
+        """
+        node_infos = [info for info in map(self._to_node_info, nodes) if info is not None]
+        return self.check_and_report(node_infos)
+
+    def check_due_nodes(self, nodes: List[Dict]) -> List[HealthCheckResult]:
+        """
+        只探测调度器中已到期的节点，并根据结果安排下次探测
+
+        Args:
+            nodes: API返回的节点列表
+
+        Returns:
+            本次探测的结果列表
+        """
+        node_infos = {}
+        for node in nodes:
+            info = self._to_node_info(node)
+            if info is not None:
+                node_infos[info.node_id] = info
+        self.probe_scheduler.sync(node_infos.keys())
+
+        due_ids = self.probe_scheduler.pop_due()
+        if not due_ids:
+            return []
+        due_infos = [node_infos[node_id] for node_id in due_ids]
+        results = self.check_and_report(due_infos)
+        for info, result in zip(due_infos, results):
+            self.probe_scheduler.record(info.node_id, result.is_online)
+
+        logger.info(f"探测 {len(due_infos)}/{len(node_infos)} 个到期节点，"
+                    f"当前估算探测需求 {self.probe_scheduler.required_probes_per_minute():.0f} 次/分钟")
+        return results
+
+    def monitor_nodes_direct(self):
+        """
+        不经过easytier-uptime服务，直接探测节点并流式上报状态
+        """
+        logger.info("Starting node monitor in direct check mode...")
         try:
-            local_nodes = self._get_local_nodes()
-            self.logger.info(f"从本地数据库获取{len(local_nodes)}个节点")
+            nodes = self.get_my_nodes()
+            results = self.check_due_nodes(nodes)
+            online = sum(1 for result in results if result.is_online)
+            logger.info(f"节点监控完成: {online}/{len(results)} 个节点在线")
         except Exception as e:
-            self.logger.error(f"获取本地节点失败: {str(e)}")
-            return
+            logger.error(f"监控过程中发生错误: {str(e)}")
+            traceback.print_exc()
+
+    def _ensure_uptime_service(self) -> bool:
+        """
+        确保easytier-uptime服务正在运行，进程退出时重新启动
+
+        Returns:
+            服务是否可用
+        """
+        process = self.uptime_process
+        if process is None:
+            if not self._start_uptime_service():
+                return False
+            return self._wait_for_service_start()
+        if process.restart_count != self._uptime_restarts:
+            # 进程已被自动重启，重新完整比较一次本地节点
+            logger.warning(f"easytier-uptime service restarted ({process.restart_count} restarts)")
+            self._uptime_restarts = process.restart_count
+            self.remote_mirror.reset()
+            return process.running and self._wait_for_service_start()
+        return process.running
+
+    def _cleanup_all_processes(self):
+        """停止easytier-uptime服务并释放常驻模式的资源"""
+        if self._checker is not None and self._loop is not None:
+            try:
+                self._loop.run_until_complete(self._checker.close())
+            except Exception as e:
+                logger.debug(f"关闭健康检查器失败: {str(e)}")
+        self._checker = None
+        self.reporter.close()
+        if self.uptime_db is not None:
+            self.uptime_db.close()
+        if self.history is not None:
+            self.history.close()
+        if self._loop is not None:
+            self._loop.close()
+            self._loop = None
+        self.http.close()
+        self.config.close()
+
+        process = self.uptime_process
+        self.uptime_process = None
+        if process is not None:
+            process.stop()
+
+    def sync_local_nodes(self) -> Dict:
+        """
+        以API节点列表（源A）为准同步本地服务节点（源B）
+
+        Returns:
+            本次同步添加的节点ID到同步前last_check的映射，用于等待这些节点的新一轮健康检查
+        """
+        # 2. 从传入地址获取节点列表 (源A)，节点摘要未变化时不下载节点列表
+        logger.info("从传入地址获取节点列表 (源A)...")
+        update = self.remote_mirror.refresh(self.get_nodes_digest, self._fetch_remote_nodes)
+        if update is None:
+            logger.error("获取节点列表失败，跳过本次同步")
+            return {}
+        if update.unchanged:
+            logger.info(f"节点摘要未变化 ({update.digest[:12]})，跳过同步")
+            return {}
         
-        # 添加缺失节点
-        added_count = 0
-        for node in api_nodes:
-            # 构建完整节点数据
-            node_data = {
-                "id": node["id"],
-                "node_name": node["node_name"],
-                "ip_address": node.get("ip_address", ""),
-                "port": node.get("port", 0),
-                "is_public": node.get("is_public", False),
-                "location": node.get("location", ""),
-                "description": node.get("description", "")
+        # 3. 从本地服务获取节点列表 (源B)
+        logger.info("从本地服务获取节点列表 (源B)...")
+        fetched_local_nodes = self._fetch_local_nodes()
+        source_b_nodes = fetched_local_nodes or []
+        
+        # 只比较摘要发生变化的分桶
+        if update.changed_buckets is not None:
+            logger.info(f"{len(update.changed_buckets)} 个分桶的节点有变化")
+        source_a_nodes, source_b_nodes = update.scope(source_b_nodes)
+        
+        # 4. 同步节点 (以源A为准)：添加源A中存在但源B中不存在的节点，删除源B中存在但源A中不存在的节点
+        logger.info("同步节点 (以源A为准)...")
+        plan = plan_sync(source_a_nodes, source_b_nodes, compare=False)
+        result = execute_plan(
+            plan,
+            create=self._create_local_node,
+            delete=self._delete_local_node,
+            workers=self.config.get_sync_workers()
+        )
+        failures = len(result.failures)
+        logger.info(f"同步操作统计: {result.summary()}")
+
+        if fetched_local_nodes is not None and failures == 0:
+            self.remote_mirror.mark_applied(update)
+        # 已有节点由本地服务按原周期检查，不需要等待
+        return snapshot_last_checks(source_b_nodes, result.changed_ids)
+
+    def _create_local_node(self, node: Dict, extra_fields: Tuple[str, ...] = ()) -> bool:
+        """在本地服务中添加节点，extra_fields中的字段缺失时填空字符串"""
+        # 构建符合API要求的节点数据
+        api_node = {
+            "id": node['id'],
+            "node_name": node['node_name'],
+            "ip_address": node.get('ip_address', ''),
+            "port": node.get('port', 0),
+            "is_public": node.get('is_public', False)
+        }
+        for field_name in extra_fields:
+            api_node[field_name] = node.get(field_name, "")
+        logger.info(f"添加节点: {node['node_name']} (ID: {node['id']})")
+        return self.make_local_api_request('/api/nodes', method='POST', data=api_node) is not None
+
+    def _delete_local_node(self, node: Dict) -> bool:
+        """从本地服务中删除节点"""
+        logger.info(f"删除节点: {node['node_name']} (ID: {node['id']})")
+        return self.make_local_api_request(f"/api/nodes/{node['id']}", method='DELETE') is not None
+
+    def _fetch_local_nodes(self) -> Optional[List[Dict]]:
+        """从本地服务获取节点列表，失败时返回None；配置了uptime数据库时直接增量读取数据库"""
+        if self.uptime_db is not None:
+            try:
+                nodes, changed = self.uptime_db.poll()
+                logger.debug(f"从uptime数据库读取 {len(nodes)} 个节点，{len(changed)} 个有变化")
+                return nodes
+            except sqlite3.Error as e:
+                logger.warning(f"读取uptime数据库失败，改用本地API: {str(e)}")
+        response = self.make_local_api_request('/api/nodes')
+        if response is None:
+            return None
+        return response.get('nodes', [])
+
+    def report_local_status(self, baseline: Optional[Dict] = None):
+        """
+        从本地服务获取节点数据（源C）并上报节点状态
+
+        Args:
+            baseline: 需要等待新健康检查结果的节点及其同步前的last_check
+        """
+        # 5-6. 等待健康检查完成并从本地服务获取节点数据 (源C)
+        if baseline:
+            timeout = self.config.get_readiness_timeout()
+            logger.info(f"等待 {len(baseline)} 个节点完成健康检查 (最长 {timeout} 秒)...")
+            source_c_nodes, ready, elapsed = wait_until_fresh(
+                self._fetch_local_nodes, baseline, timeout=timeout, stop_event=self._stop_event
+            )
+            self.last_readiness_seconds = elapsed
+            if ready:
+                logger.info(f"健康检查结果就绪，耗时 {elapsed:.2f} 秒")
+            else:
+                logger.warning(f"等待 {elapsed:.2f} 秒后仍有节点未完成健康检查，上报当前数据")
+        else:
+            logger.info("获取健康检查后的节点数据 (源C)...")
+            source_c_nodes = self._fetch_local_nodes() or []
+        
+        # 7. 上报节点状态
+        logger.info("上报节点状态到服务器...")
+        reports = [
+            {
+                "node_id": node['id'],
+                "node_name": node['node_name'],
+                "status": node.get('status', 'unknown'),
+                "last_check": node.get('last_check', ''),
+                "latency": node.get('latency', 0),
+                "health_stats": node.get('health_stats', {})
             }
-            
-            # 检查节点是否已存在
-            if not any(n["id"] == node["id"] for n in local_nodes):
-                try:
-                    self._add_node(node_data)
-                    added_count += 1
-                    self.logger.info(f"添加节点 {node['id']}: {node['node_name']}")
-                except Exception as e:
-                    self.logger.error(f"添加节点失败: {str(e)}")
+            for node in source_c_nodes
+        ]
         
-        # 删除多余节点
-        removed_count = 0
-        for node in local_nodes:
-            if not any(n["id"] == node["id"] for n in api_nodes):
-                try:
-                    self._delete_node(node["id"])
-                    removed_count += 1
-                    self.logger.info(f"删除节点 {node['id']}: {node['node_name']}")
-                except Exception as e:
-                    self.logger.error(f"删除节点失败: {str(e)}")
+        # 只上报有变化或到达完整上报间隔的节点
+        changed_reports = self.delta_filter.select(reports)
+        logger.info(f"{len(changed_reports)}/{len(reports)} 个节点需要上报")
+        
+        # 上报到服务器
+        delivered_ids = {report.get('node_id') for report in self._deliver_reports(changed_reports)}
+        # 只有上报成功的节点更新比较基准，失败的节点下周期继续与服务器已知的状态比较
+        self.delta_filter.commit(delivered_ids)
+        failed = len(changed_reports) - sum(1 for report in changed_reports if report['node_id'] in delivered_ids)
+        if failed:
+            logger.warning(f"{failed} 个节点上报失败，下周期重新上报")
+        logger.info(f"增量上报统计: {self.delta_filter.summary()}")
+        if self.uptime_process is not None:
+            logger.info(f"easytier-uptime 已运行 {self.uptime_process.uptime:.0f} 秒，"
+                        f"重启 {self.uptime_process.restart_count} 次")
         
-        self.logger.info(f"节点同步完成: 添加{added_count}个, 删除{removed_count}个")
+        logger.info(f"HTTP请求统计: {self.http.metrics.summary()}")
 
     def monitor_nodes(self):
         """
@@ -313,7 +850,7 @@ class NodeMonitor:
         2. 从传入地址获取节点列表 (源A)
         3. 从本地服务获取节点列表 (源B)
         4. 同步节点 (以源A为准)
-        5. 等待健康检查执行
+        5. 等待健康检查结果就绪（每个节点的last_check更新或超时）
         6. 从本地服务获取节点数据 (源C)
         7. 上报节点状态
         """
@@ -330,66 +867,11 @@ class NodeMonitor:
             return
             
         try:
-            # 2. 从传入地址获取节点列表 (源A)
-            logger.info("从传入地址获取节点列表 (源A)...")
-            source_a_nodes = self.get_my_nodes()
-            source_a_node_ids = {node['id'] for node in source_a_nodes}
+            # 2-4. 同步节点
+            baseline = self.sync_local_nodes()
             
-            # 3. 从本地服务获取节点列表 (源B)
-            logger.info("从本地服务获取节点列表 (源B)...")
-            source_b_response = self.make_local_api_request('/api/nodes')
-            source_b_nodes = source_b_response.get('nodes', []) if source_b_response else []
-            source_b_node_ids = {node['id'] for node in source_b_nodes}
-            
-            # 4. 同步节点 (以源A为准)
-            logger.info("同步节点 (以源A为准)...")
-            
-            # 添加源A中存在但源B中不存在的节点
-            for node in source_a_nodes:
-                if node['id'] not in source_b_node_ids:
-                    # 构建符合API要求的节点数据
-                    api_node = {
-                        "id": node['id'],
-                        "node_name": node['node_name'],
-                        "ip_address": node.get('ip_address', ''),
-                        "port": node.get('port', 0),
-                        "is_public": node.get('is_public', False)
-                    }
-                    
-                    logger.info(f"添加节点: {node['node_name']} (ID: {node['id']})")
-                    self.make_local_api_request('/api/nodes', method='POST', data=api_node)
-            
-            # 删除源B中存在但源A中不存在的节点
-            for node in source_b_nodes:
-                if node['id'] not in source_a_node_ids:
-                    logger.info(f"删除节点: {node['node_name']} (ID: {node['id']})")
-                    self.make_local_api_request(f"/api/nodes/{node['id']}", method='DELETE')
-            
-            # 5. 等待健康检查执行
-            health_check_interval = 30  # 默认30秒
-            logger.info(f"等待健康检查执行 (等待 {health_check_interval} 秒)...")
-            time.sleep(health_check_interval)
-            
-            # 6. 从本地服务获取节点数据 (源C)
-            logger.info("获取健康检查后的节点数据 (源C)...")
-            source_c_response = self.make_local_api_request('/api/nodes')
-            source_c_nodes = source_c_response.get('nodes', []) if source_c_response else []
-            
-            # 7. 上报节点状态
-            logger.info("上报节点状态到服务器...")
-            for node in source_c_nodes:
-                # 构建上报数据
-                report_data = {
-                    "node_id": node['id'],
-                    "node_name": node['node_name'],
-                    "status": node.get('status', 'unknown'),
-                    "last_check": node.get('last_check', ''),
-                    "latency": node.get('latency', 0),
-                    "health_stats": node.get('health_stats', {})
-                }
-                
-                # 上报到服务器
-                self.make_report_request('/api/report', report_data)
+            # 5-7. 等待健康检查结果就绪，获取节点数据并上报
+            self.report_local_status(baseline)
             
             logger.info("节点监控完成")
         
@@ -397,6 +879,89 @@ class NodeMonitor:
             logger.error(f"监控过程中发生错误: {str(e)}")
             traceback.print_exc()
 
+    def run_daemon(self, sync_interval: int = 300, report_interval: int = 60, direct: bool = False):
+        """
+        常驻运行：easytier-uptime服务和连接保持不变，同步和上报按各自的周期执行，
+        调用stop()后在当前步骤完成时退出
+        
+        Args:
+            sync_interval: 节点同步周期（秒）
+            report_interval: 状态上报周期（秒），直接探测模式下由探测调度器决定
+            direct: 是否使用直接探测模式
+        """
+        logger.info(f"Starting node monitor daemon (sync every {sync_interval}s, "
+                    f"{'direct checks' if direct else f'report every {report_interval}s'})...")
+        self._stop_event.clear()
+        self._loop = asyncio.new_event_loop()
+        nodes: List[Dict] = []
+        
+        try:
+            if not direct and not self._ensure_uptime_service():
+                logger.error("easytier-uptime service is not available, exiting")
+                return
+            
+            now = time.monotonic()
+            next_sync = now
+            # 首次上报前留出健康检查时间
+            next_report = now + report_interval
+            
+            while not self._stop_event.is_set():
+                try:
+                    self._reload_config()
+                    if not direct and not self._ensure_uptime_service():
+                        logger.error("easytier-uptime service is not available, retrying later")
+                    
+                    if time.monotonic() >= next_sync:
+                        if direct:
+                            update = self.remote_mirror.refresh(self.get_nodes_digest, self._fetch_remote_nodes)
+                            if update is not None:
+                                nodes = update.nodes
+                                self.remote_mirror.mark_applied(update)
+                        else:
+                            # 只等待新添加的节点完成首次检查
+                            self._awaiting_checks.update(self.sync_local_nodes())
+                        next_sync = time.monotonic() + sync_interval
+                    
+                    if direct:
+                        results = self.check_due_nodes(nodes)
+                        due_in = self.probe_scheduler.next_due_in()
+                        if due_in is None:
+                            due_in = sync_interval
+                        elif not results:
+                            # 到期节点受探测预算限制时避免空转
+                            due_in = max(due_in, 1.0)
+                        next_report = time.monotonic() + due_in
+                    elif time.monotonic() >= next_report:
+                        awaiting, self._awaiting_checks = self._awaiting_checks, {}
+                        self.report_local_status(awaiting)
+                        next_report = time.monotonic() + report_interval
+                except Exception as e:
+                    logger.error(f"监控过程中发生错误: {str(e)}")
+                    traceback.print_exc()
+                    next_sync = max(next_sync, time.monotonic() + min(sync_interval, 60))
+                
+                self._stop_event.wait(max(0.0, min(next_sync, next_report) - time.monotonic()))
+        finally:
+            logger.info("Node monitor daemon stopping...")
+            self._cleanup_all_processes()
+
+    def _reload_config(self):
+        """配置文件被修改后重新加载，并更新已创建对象中缓存的配置"""
+        changed = self.config.reload_if_changed()
+        if not changed:
+            return
+        logger.info(f"配置文件已更新: {', '.join(sorted(changed))}")
+        if "max_retries" in changed:
+            self.reporter.retry = self._retry_policy()
+        if "connection_timeout" in changed and self._checker is not None:
+            self._checker.timeout = self.config.get_connection_timeout()
+        if "log_level" in changed:
+            logger.setLevel(getattr(logging, self.config.get_log_level().upper(), logging.INFO))
+
+    def stop(self):
+        """请求常驻模式在当前步骤完成后退出"""
+        self._stop_event.set()
+
 
 def main():
     """
@@ -415,6 +980,11 @@ def main():
     parser.add_argument('--delay', type=int, help='节点间延迟时间（秒），默认使用配置文件设置')
     parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
                         help='日志级别，默认使用配置文件设置')
+    parser.add_argument('--direct', action='store_true',
+                        help='直接探测节点并流式上报，不启动easytier-uptime服务')
+    parser.add_argument('--daemon', action='store_true', help='常驻运行，按周期同步和上报')
+    parser.add_argument('--sync-interval', type=int, default=300, help='常驻模式节点同步周期（秒），默认300')
+    parser.add_argument('--report-interval', type=int, default=60, help='常驻模式状态上报周期（秒），默认60')
 
     args = parser.parse_args()
 
@@ -427,9 +997,11 @@ def main():
     def signal_handler(signum, frame):
         """信号处理函数"""
         logger.info(f"收到信号 {signum}，开始清理...")
-        if monitor:
-            # 清理逻辑
-            pass
+        if monitor and args.daemon:
+            # 常驻模式在当前步骤完成后退出并清理
+            monitor.stop()
+            return
+        # 单次运行模式由main的finally清理
         sys.exit(0)
 
     # 注册信号处理
@@ -442,16 +1014,21 @@ def main():
 
         # 如果命令行参数覆盖了配置文件设置
         if args.timeout:
-            monitor.config.config["connection_timeout"] = args.timeout
+            monitor.config.set_override("connection_timeout", args.timeout)
         if args.delay:
-            monitor.config.config["node_delay"] = args.delay
+            monitor.config.set_override("node_delay", args.delay)
         if args.log_level:
-            monitor.config.config["log_level"] = args.log_level
+            monitor.config.set_override("log_level", args.log_level)
             log_level = getattr(logging, args.log_level.upper(), logging.INFO)
             logger.setLevel(log_level)
 
         # 开始监控
-        monitor.monitor_nodes()
+        if args.daemon:
+            monitor.run_daemon(args.sync_interval, args.report_interval, direct=args.direct)
+        elif args.direct:
+            monitor.monitor_nodes_direct()
+        else:
+            monitor.monitor_nodes()
 
         logger.info("节点监控脚本执行完成")
 
@@ -462,6 +1039,10 @@ def main():
         import traceback
         traceback.print_exc()
         return 1
+    finally:
+        # 常驻模式在run_daemon退出时已清理
+        if monitor and not args.daemon:
+            monitor._cleanup_all_processes()
 
     return 0
 
@@ -33,6 +33,11 @@ def main():
     parser.add_argument('--delay', type=int, help='节点间延迟时间（秒），默认使用配置文件设置')
     parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
                         help='日志级别，默认使用配置文件设置')
+    parser.add_argument('--direct', action='store_true',
+                        help='直接探测节点并流式上报，不启动easytier-uptime服务')
+    parser.add_argument('--daemon', action='store_true', help='常驻运行，按周期同步和上报')
+    parser.add_argument('--sync-interval', type=int, default=300, help='常驻模式节点同步周期（秒），默认300')
+    parser.add_argument('--report-interval', type=int, default=60, help='常驻模式状态上报周期（秒），默认60')
 
     args = parser.parse_args()
 
@@ -45,8 +50,11 @@ def main():
     def signal_handler(signum, frame):
         """信号处理函数"""
         logger.info(f"收到信号 {signum}，开始清理...")
-        if monitor:
-            monitor._cleanup_all_processes()
+        if monitor and args.daemon:
+            # 常驻模式在当前步骤完成后退出并清理
+            monitor.stop()
+            return
+        # 单次运行模式由main的finally清理
         sys.exit(0)
 
     # 注册信号处理
@@ -59,16 +67,21 @@ def main():
 
         # 如果命令行参数覆盖了配置文件设置
         if args.timeout:
-            monitor.config.config["connection_timeout"] = args.timeout
+            monitor.config.set_override("connection_timeout", args.timeout)
         if args.delay:
-            monitor.config.config["node_delay"] = args.delay
+            monitor.config.set_override("node_delay", args.delay)
         if args.log_level:
-            monitor.config.config["log_level"] = args.log_level
+            monitor.config.set_override("log_level", args.log_level)
             log_level = getattr(logging, args.log_level.upper(), logging.INFO)
             logger.setLevel(log_level)
 
         # 开始监控
-        monitor.monitor_nodes()
+        if args.daemon:
+            monitor.run_daemon(args.sync_interval, args.report_interval, direct=args.direct)
+        elif args.direct:
+            monitor.monitor_nodes_direct()
+        else:
+            monitor.monitor_nodes()
 
         logger.info("节点监控脚本执行完成")
         return 0
@@ -82,9 +95,9 @@ def main():
         traceback.print_exc()
         return 1
     finally:
-        # 确保清理资源
-        # 不再需要调用_cleanup_all_processes方法
-        pass
+        # 常驻模式在run_daemon退出时已清理
+        if monitor and not args.daemon:
+            monitor._cleanup_all_processes()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+本地健康检查就绪检测
+
+同步节点后轮询本地easytier-uptime服务，直到每个节点的last_check
+都相对同步前的基线发生变化（即完成了新一轮检查），代替固定时长的等待；
+服务启动时以指数间隔检测端口和健康检查端点，子进程输出监听日志时立即检测
+"""
+
+import logging
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_last_checks(nodes: List[Dict[str, Any]], node_ids) -> Dict[Any, Any]:
+    """
+    记录节点当前的last_check作为就绪基线
+
+    Args:
+        nodes: 本地服务返回的节点列表
+        node_ids: 需要等待新检查结果的节点ID
+
+    Returns:
+        节点ID到last_check的映射，本地不存在的节点为None
+    """
+    current = {node.get('id'): node.get('last_check') for node in nodes}
+    return {node_id: current.get(node_id) for node_id in node_ids}
+
+
+def wait_until_fresh(fetch: Callable[[], Optional[List[Dict[str, Any]]]], baseline: Dict[Any, Any],
+                     timeout: float = 60, initial_interval: float = 0.5, max_interval: float = 5,
+                     stop_event: Optional[threading.Event] = None) -> Tuple[List[Dict[str, Any]], bool, float]:
+    """
+    轮询本地节点列表，直到基线中的每个节点都有新的last_check或超时
+
+    Args:
+        fetch: 获取本地节点列表的函数，失败时返回None
+        baseline: snapshot_last_checks生成的基线
+        timeout: 最长等待时间（秒）
+        initial_interval: 首次轮询间隔（秒），之后逐次翻倍
+        max_interval: 最大轮询间隔（秒）
+        stop_event: 设置后立即停止等待
+
+    Returns:
+        (最后一次获取的节点列表, 是否全部就绪, 等待耗时秒数)
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    interval = initial_interval
+    nodes: List[Dict[str, Any]] = []
+
+    while True:
+        fetched = fetch()
+        if fetched is not None:
+            nodes = fetched
+            current = {node.get('id'): node.get('last_check') for node in nodes}
+            stale = [
+                node_id for node_id, last_check in baseline.items()
+                if not current.get(node_id) or current.get(node_id) == last_check
+            ]
+            if not stale:
+                return nodes, True, time.monotonic() - start
+            logger.debug(f"等待 {len(stale)}/{len(baseline)} 个节点完成健康检查")
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return nodes, False, time.monotonic() - start
+        wait = min(interval, remaining)
+        if stop_event is not None:
+            if stop_event.wait(wait):
+                return nodes, False, time.monotonic() - start
+        else:
+            time.sleep(wait)
+        interval = min(interval * 2, max_interval)
+
+
+def port_accepts(host: str, port: int, timeout: float = 0.2) -> bool:
+    """端口是否接受TCP连接"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def wait_for_service(host: str, port: int, health_check: Callable[[], bool], timeout: float = 30,
+                     initial_interval: float = 0.01, max_interval: float = 0.5,
+                     wake_event: Optional[threading.Event] = None,
+                     stop_event: Optional[threading.Event] = None) -> Tuple[bool, float]:
+    """
+    等待服务就绪：端口接受连接且health_check返回True
+
+    Args:
+        host: 服务地址
+        port: 服务端口
+        health_check: 端口可连接后调用的健康检查
+        timeout: 最长等待时间（秒）
+        initial_interval: 首次检测间隔（秒），之后逐次翻倍
+        max_interval: 最大检测间隔（秒）
+        wake_event: 设置后立即进行下一次检测（例如子进程输出了监听日志）
+        stop_event: 设置后立即停止等待
+
+    Returns:
+        (是否就绪, 等待耗时秒数)
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    interval = initial_interval
+    while True:
+        if port_accepts(host, port):
+            try:
+                if health_check():
+                    return True, time.monotonic() - start
+            except Exception as e:
+                logger.debug(f"健康检查失败: {str(e)}")
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or (stop_event is not None and stop_event.is_set()):
+            return False, time.monotonic() - start
+        wait = min(interval, remaining)
+        if wake_event is not None:
+            if wake_event.wait(wait):
+                wake_event.clear()
+        else:
+            time.sleep(wait)
+        interval = min(interval * 2, max_interval)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+并发上报调度器
+
+上报请求由固定数量的工作线程并发发送，失败的请求进入延迟重试队列，
+等待重试期间不占用工作线程；每个端点的并发数单独限制，
+超过周期截止时间仍未完成的上报被推迟，交由调用方决定丢弃或下周期重发
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from NodeHttp import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+# 发送函数：(端点, 数据) -> (是否成功, 是否可重试, 响应数据)
+SendFunc = Callable[[str, Dict], Tuple[bool, bool, Any]]
+
+
+@dataclass
+class ReportTask:
+    """单个上报任务"""
+    endpoint: str
+    payload: Dict
+    attempts: int = 0
+    success: bool = False
+    response: Any = None
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待任务完成（成功或放弃），返回是否在超时前完成"""
+        return self.done.wait(timeout)
+
+
+@dataclass
+class DispatchResult:
+    """一次排空队列的结果"""
+    succeeded: int = 0
+    failed: List[ReportTask] = field(default_factory=list)
+    deferred: List[ReportTask] = field(default_factory=list)
+
+
+class ReportDispatcher:
+    """
+    上报调度器
+
+    submit可以在任意线程调用；drain等待队列排空或到达截止时间，
+    截止时仍在排队或等待重试的任务作为deferred返回
+    """
+
+    def __init__(self, send: SendFunc, workers: int = 8, per_endpoint_limit: int = 4,
+                 retry: Optional[RetryPolicy] = None):
+        """
+        Args:
+            send: 发送单个上报的函数，只尝试一次
+            workers: 工作线程数
+            per_endpoint_limit: 每个端点的最大并发请求数
+            retry: 重试策略（次数、退避和抖动）
+        """
+        self.send = send
+        self.workers = workers
+        self.per_endpoint_limit = per_endpoint_limit
+        self.retry = retry or RetryPolicy()
+        self._cond = threading.Condition()
+        self._ready: Dict[str, Deque[ReportTask]] = defaultdict(deque)
+        self._delayed: List[Tuple[float, int, ReportTask]] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._endpoint_in_flight: Dict[str, int] = defaultdict(int)
+        self._result = DispatchResult()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._coordinator: Optional[threading.Thread] = None
+        self._closed = False
+
+    def _ensure_started(self):
+        if self._coordinator is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='report')
+            self._coordinator = threading.Thread(target=self._coordinate, name='report-dispatcher', daemon=True)
+            self._coordinator.start()
+
+    def submit(self, endpoint: str, payload: Dict) -> ReportTask:
+        """提交一个上报任务，立即返回"""
+        task = ReportTask(endpoint, payload)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ReportDispatcher is closed")
+            self._ensure_started()
+            self._ready[endpoint].append(task)
+            self._cond.notify_all()
+        return task
+
+    def _pending_count(self) -> int:
+        return sum(len(queue) for queue in self._ready.values()) + len(self._delayed) + self._in_flight
+
+    def _coordinate(self):
+        """调度线程：把到期的重试移入就绪队列，并在并发限制内启动任务"""
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, task = heapq.heappop(self._delayed)
+                    self._ready[task.endpoint].append(task)
+
+                for endpoint, queue in self._ready.items():
+                    while (queue and self._in_flight < self.workers
+                           and self._endpoint_in_flight[endpoint] < self.per_endpoint_limit):
+                        task = queue.popleft()
+                        self._in_flight += 1
+                        self._endpoint_in_flight[endpoint] += 1
+                        self._executor.submit(self._run, task)
+
+                timeout = None
+                if self._delayed:
+                    timeout = max(0.0, self._delayed[0][0] - time.monotonic())
+                self._cond.wait(timeout)
+
+    def _run(self, task: ReportTask):
+        """工作线程：发送一次，失败时放入延迟重试队列后立即释放线程"""
+        task.attempts += 1
+        try:
+            success, retryable, response = self.send(task.endpoint, task.payload)
+        except Exception as e:
+            logger.error(f"上报任务异常: {task.endpoint} - {str(e)}")
+            success, retryable, response = False, True, None
+
+        with self._cond:
+            self._in_flight -= 1
+            self._endpoint_in_flight[task.endpoint] -= 1
+            if success:
+                task.success = True
+                task.response = response
+                self._result.succeeded += 1
+                task.done.set()
+            elif retryable and task.attempts <= self.retry.max_retries:
+                wait_time = self.retry.delay(task.attempts - 1)
+                logger.info(f"{wait_time:.1f}秒后重试上报 ({task.attempts}/{self.retry.max_retries})...")
+                heapq.heappush(self._delayed, (time.monotonic() + wait_time, next(self._seq), task))
+            else:
+                self._result.failed.append(task)
+                task.done.set()
+            self._cond.notify_all()
+
+    def drain(self, timeout: Optional[float] = None) -> DispatchResult:
+        """
+        等待所有任务完成或到达截止时间
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            自上次drain以来的结果，截止时尚未开始的任务在deferred中并已移出队列
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending_count():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            result, self._result = self._result, DispatchResult()
+            for queue in self._ready.values():
+                result.deferred.extend(queue)
+                queue.clear()
+            result.deferred.extend(task for _, _, task in self._delayed)
+            self._delayed.clear()
+            for task in result.deferred:
+                task.done.set()
+            if self._in_flight:
+                logger.warning(f"截止时仍有 {self._in_flight} 个上报请求在发送中")
+        return result
+
+    def close(self):
+        """停止调度线程，等待正在发送的请求结束"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._coordinator is not None:
+            self._coordinator.join()
+            self._executor.shutdown(wait=True)
+
+
+class DeltaReportFilter:
+    """
+    增量上报过滤器
+
+    记录每个节点上次上报的内容，只有状态、健康统计发生变化或延迟变化超过容差的节点才再次上报；
+    距上次上报超过keyframe_interval的节点即使没有变化也完整上报一次，
+    保证服务端的last_report_at不会超时（服务端10分钟未上报即判定离线）。
+    last_check每轮检查都会前进，不作为变化依据。
+    select选出的节点只有在commit（上报成功）后才更新比较基准，
+    未commit的节点（上报失败）在下次select时仍与旧基准比较，因此会被重新上报
+    """
+
+    def __init__(self, keyframe_interval: float = 300, latency_tolerance_ms: float = 20,
+                 fields: Tuple[str, ...] = ("status", "health_stats"), key: str = "node_id"):
+        """
+        Args:
+            keyframe_interval: 节点无变化时的最长上报间隔（秒）
+            latency_tolerance_ms: 延迟变化不超过此值时视为无变化
+            fields: 需要完全相同的字段
+            key: 节点标识字段
+        """
+        self.keyframe_interval = keyframe_interval
+        self.latency_tolerance_ms = latency_tolerance_ms
+        self.fields = fields
+        self.key = key
+        self.sent = 0
+        self.suppressed = 0
+        self._last: Dict[Any, Tuple[float, Dict]] = {}
+        # 已选出但尚未确认上报成功的节点
+        self._pending: Dict[Any, Tuple[float, Dict]] = {}
+
+    def _changed(self, previous: Dict, report: Dict) -> bool:
+        if any(previous.get(name) != report.get(name) for name in self.fields):
+            return True
+        try:
+            return abs(float(report.get("latency") or 0) - float(previous.get("latency") or 0)) > self.latency_tolerance_ms
+        except (TypeError, ValueError):
+            return previous.get("latency") != report.get("latency")
+
+    def select(self, reports: List[Dict], now: Optional[float] = None) -> List[Dict]:
+        """
+        选出需要上报的节点，本周期没有出现的节点不再跟踪；
+        选出的节点在commit确认上报成功后才更新基准，未确认的节点下周期继续上报
+
+        Args:
+            reports: 本周期所有节点的上报数据
+            now: 当前时间（time.monotonic）
+
+        Returns:
+            需要上报的数据
+        """
+        now = time.monotonic() if now is None else now
+        selected = []
+        current = {}
+        pending = {}
+        for report in reports:
+            node_id = report.get(self.key)
+            last = self._last.get(node_id)
+            if last is None or now - last[0] >= self.keyframe_interval or self._changed(last[1], report):
+                selected.append(report)
+                pending[node_id] = (now, report)
+                if last is not None:
+                    current[node_id] = last
+            else:
+                current[node_id] = last
+        self._last = current
+        self._pending = pending
+        self.sent += len(selected)
+        self.suppressed += len(reports) - len(selected)
+        return selected
+
+    def commit(self, node_ids):
+        """记录上报成功的节点，以本次上报的数据作为之后比较的基准"""
+        for node_id in node_ids:
+            entry = self._pending.pop(node_id, None)
+            if entry is not None:
+                self._last[node_id] = entry
+
+    def summary(self) -> Dict[str, Any]:
+        total = self.sent + self.suppressed
+        return {
+            "sent": self.sent,
+            "suppressed": self.suppressed,
+            "suppressed_ratio": round(self.suppressed / total, 3) if total else 0.0,
+        }
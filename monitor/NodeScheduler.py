@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+节点探测间隔调度器
+
+按节点维护下次探测时间（最小堆），持续离线的节点指数退避，
+状态刚发生变化的节点加快探测，并可限制每分钟的探测总数
+"""
+
+import heapq
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Optional
+
+
+@dataclass
+class ProbeState:
+    """单个节点的探测状态"""
+    interval: float
+    is_online: Optional[bool] = None
+    offline_streak: int = 0
+    fast_remaining: int = 0
+    version: int = 0
+
+
+class AdaptiveProbeScheduler:
+    """
+    自适应探测调度器
+
+    规则：
+    1. 在线节点按base_interval探测
+    2. 状态变化（上线/离线）后的fast_probes次探测使用min_interval，尽快确认新状态
+    3. 持续离线的节点每次失败间隔乘以backoff_factor，最长max_interval
+    4. 设置probes_per_minute时，到期节点超出预算的部分顺延到下一次调用
+    """
+
+    def __init__(self, base_interval: float = 30, min_interval: float = 10, max_interval: float = 3600,
+                 backoff_factor: float = 2.0, fast_probes: int = 3, jitter: float = 0.1,
+                 probes_per_minute: Optional[int] = None):
+        """
+        Args:
+            base_interval: 在线节点的探测间隔（秒）
+            min_interval: 状态变化后的快速探测间隔（秒）
+            max_interval: 离线节点退避的最大间隔（秒）
+            backoff_factor: 离线节点每次探测失败后的间隔倍数
+            fast_probes: 状态变化后快速探测的次数
+            jitter: 间隔随机抖动比例，避免节点集中到期
+            probes_per_minute: 每分钟探测预算，None表示不限制
+        """
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.fast_probes = fast_probes
+        self.jitter = jitter
+        self.probes_per_minute = probes_per_minute
+        self._states: Dict[Hashable, ProbeState] = {}
+        # (到期时间, 序号, 节点键, 版本)，版本不一致的条目已失效
+        self._heap: list = []
+        self._seq = 0
+        self._tokens = float(probes_per_minute or 0)
+        self._refilled_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._states
+
+    def _push(self, key: Hashable, state: ProbeState, due: float):
+        state.version += 1
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, key, state.version))
+        # 失效条目过多时重建堆，避免堆无限增长
+        if len(self._heap) > 4 * len(self._states) + 64:
+            self._heap = [entry for entry in self._heap
+                          if entry[2] in self._states and self._states[entry[2]].version == entry[3]]
+            heapq.heapify(self._heap)
+
+    def add(self, key: Hashable, now: Optional[float] = None):
+        """添加节点，新节点立即到期"""
+        if key in self._states:
+            return
+        now = time.monotonic() if now is None else now
+        state = ProbeState(interval=self.base_interval)
+        self._states[key] = state
+        self._push(key, state, now)
+
+    def remove(self, key: Hashable):
+        """移除节点，堆中的条目在弹出时丢弃"""
+        self._states.pop(key, None)
+
+    def sync(self, keys: Iterable[Hashable], now: Optional[float] = None):
+        """与当前节点集合同步：添加新节点，移除已不存在的节点"""
+        keys = set(keys)
+        for key in list(self._states):
+            if key not in keys:
+                self.remove(key)
+        for key in keys:
+            self.add(key, now)
+
+    def _refill(self, now: float):
+        if not self.probes_per_minute:
+            return
+        elapsed = max(0.0, now - self._refilled_at)
+        self._refilled_at = now
+        self._tokens = min(float(self.probes_per_minute),
+                           self._tokens + elapsed * self.probes_per_minute / 60.0)
+
+    def pop_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[Hashable]:
+        """
+        取出所有到期的节点（受探测预算和limit限制），按到期先后排序
+
+        取出的节点在record之前按当前间隔保留一个临时条目：
+        探测异常、被取消或结果未记录时，节点在一个间隔后重新到期，不会从调度中丢失
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.probes_per_minute:
+            budget = int(self._tokens)
+            limit = budget if limit is None else min(limit, budget)
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            if limit is not None and len(due) >= limit:
+                break
+            _, _, key, version = heapq.heappop(self._heap)
+            state = self._states.get(key)
+            if state is None or state.version != version:
+                continue
+            # record会推入新版本的条目，使这个临时条目失效
+            self._push(key, state, now + state.interval)
+            due.append(key)
+
+        if self.probes_per_minute:
+            self._tokens -= len(due)
+        return due
+
+    def _next_interval(self, state: ProbeState, is_online: bool) -> float:
+        changed = state.is_online is not None and state.is_online != is_online
+        if changed:
+            state.fast_remaining = self.fast_probes
+
+        if is_online:
+            state.offline_streak = 0
+        else:
+            state.offline_streak += 1
+
+        if state.fast_remaining > 0:
+            state.fast_remaining -= 1
+            return self.min_interval
+        if is_online:
+            return self.base_interval
+        # 离线：快速确认结束后开始指数退避
+        backoff = self.base_interval * self.backoff_factor ** max(0, state.offline_streak - 1)
+        return min(self.max_interval, backoff)
+
+    def record(self, key: Hashable, is_online: bool, now: Optional[float] = None):
+        """记录探测结果并安排下次探测"""
+        state = self._states.get(key)
+        if state is None:
+            return
+        now = time.monotonic() if now is None else now
+        state.interval = self._next_interval(state, is_online)
+        state.is_online = is_online
+        delay = state.interval * (1 + random.uniform(-self.jitter, self.jitter))
+        self._push(key, state, now + delay)
+
+    def next_due_in(self, now: Optional[float] = None) -> Optional[float]:
+        """距离下一个节点到期的秒数，没有待探测节点时返回None"""
+        now = time.monotonic() if now is None else now
+        while self._heap:
+            due, _, key, version = self._heap[0]
+            state = self._states.get(key)
+            if state is not None and state.version == version:
+                return max(0.0, due - now)
+            heapq.heappop(self._heap)
+        return None
+
+    def required_probes_per_minute(self) -> float:
+        """按当前各节点间隔估算的每分钟探测需求"""
+        return sum(60.0 / state.interval for state in self._states.values())
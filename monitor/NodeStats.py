@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+节点集群统计
+
+把节点列表（/api/nodes/all等接口返回的节点记录）转换为按列存储的数组，
+一次计算全体节点和按region_type、region_detail分组的合计值、利用率分位数以及负载最高的节点。
+安装了NumPy（见requirements.txt）时使用向量化计算，否则使用纯Python实现，两者结果一致
+"""
+
+import heapq
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy是可选依赖
+    np = None
+
+# 参与合计的数值列，与定时任务统计的字段一致
+SUM_FIELDS = ("connection_count", "current_bandwidth", "tier_bandwidth", "used_traffic", "max_traffic")
+GROUP_FIELDS = ("region_type", "region_detail")
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _encode(values: Sequence[Any]) -> Tuple[List[int], List[str]]:
+    """把分组字段编码为连续整数，返回(编码, 标签)"""
+    codes_by_label: Dict[str, int] = {}
+    codes = [codes_by_label.setdefault(str(value or ""), len(codes_by_label)) for value in values]
+    return codes, list(codes_by_label)
+
+
+def _percentiles(sorted_values: Sequence[float], percentiles: Sequence[float]) -> Dict[str, Optional[float]]:
+    """线性插值分位数（与numpy.percentile的默认方法一致），没有数据时为None"""
+    result: Dict[str, Optional[float]] = {}
+    count = len(sorted_values)
+    for p in percentiles:
+        if not count:
+            result[f"p{p:g}"] = None
+            continue
+        position = (count - 1) * p / 100
+        lower = int(position)
+        upper = min(lower + 1, count - 1)
+        low_value = float(sorted_values[lower])
+        result[f"p{p:g}"] = round(low_value + (float(sorted_values[upper]) - low_value) * (position - lower), 6)
+    return result
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    """利用率，分母不为正时为NaN（不参与分位数统计）"""
+    return numerator / denominator if denominator > 0 else math.nan
+
+
+@dataclass
+class FleetColumns:
+    """
+    按列存储的节点数据
+
+    数值列在NumPy可用时为float64数组，否则为列表；分组列保存为整数编码和标签
+    """
+    ids: List[Any]
+    names: List[str]
+    online: Any
+    values: Dict[str, Any]
+    group_codes: Dict[str, Any]
+    group_labels: Dict[str, List[str]]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_nodes(cls, nodes: Sequence[Dict[str, Any]]) -> 'FleetColumns':
+        """从节点记录构造，缺失或无法解析的数值按0处理"""
+        ids = [node.get("id") for node in nodes]
+        names = [node.get("node_name", "") for node in nodes]
+        online = [node.get("status") == "online" for node in nodes]
+        values = {}
+        for name in SUM_FIELDS:
+            column = [node.get(name) or 0 for node in nodes]
+            try:
+                values[name] = np.array(column, dtype=np.float64) if np is not None else list(map(float, column))
+            except (TypeError, ValueError):
+                values[name] = [_number(value) for value in column]
+        group_codes = {}
+        group_labels = {}
+        for name in GROUP_FIELDS:
+            group_codes[name], group_labels[name] = _encode([node.get(name) for node in nodes])
+
+        if np is not None:
+            online = np.array(online, dtype=bool)
+            values = {name: np.asarray(column, dtype=np.float64) for name, column in values.items()}
+            group_codes = {name: np.array(codes, dtype=np.intp) for name, codes in group_codes.items()}
+        return cls(ids, names, online, values, group_codes, group_labels)
+
+
+def _empty_group() -> Dict[str, Any]:
+    return {
+        "total_nodes": 0,
+        "online_nodes": 0,
+        "total_connections": 0.0,
+        "total_bandwidth": 0.0,
+        "total_tier_bandwidth": 0.0,
+        "used_traffic": 0.0,
+        "max_traffic": 0.0,
+    }
+
+
+def _group_totals(stats: Dict[str, Any], nodes: int, online: int, sums: Dict[str, float]):
+    stats["total_nodes"] = int(nodes)
+    stats["online_nodes"] = int(online)
+    stats["total_connections"] = round(float(sums["connection_count"]), 6)
+    stats["total_bandwidth"] = round(float(sums["current_bandwidth"]), 6)
+    stats["total_tier_bandwidth"] = round(float(sums["tier_bandwidth"]), 6)
+    stats["used_traffic"] = round(float(sums["used_traffic"]), 6)
+    stats["max_traffic"] = round(float(sums["max_traffic"]), 6)
+
+
+def _aggregate_numpy(columns: FleetColumns, percentiles: Sequence[float], top_k: int) -> Dict[str, Any]:
+    values = columns.values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        traffic = np.where(values["max_traffic"] > 0, values["used_traffic"] / values["max_traffic"], np.nan)
+        bandwidth = np.where(values["tier_bandwidth"] > 0, values["current_bandwidth"] / values["tier_bandwidth"], np.nan)
+    # 每种利用率只完整排序一次，分组时再按分组编码做稳定排序，组内保持有序
+    utilization = {}
+    for name, ratio in (("traffic_utilization", traffic), ("bandwidth_utilization", bandwidth)):
+        valid = np.flatnonzero(~np.isnan(ratio))
+        order = valid[np.argsort(ratio[valid])]
+        utilization[name] = (order, ratio[order])
+
+    def summarize(codes, group_count) -> List[Dict[str, Any]]:
+        groups = [_empty_group() for _ in range(group_count)]
+        counts = np.bincount(codes, minlength=group_count)
+        online = np.bincount(codes, weights=columns.online, minlength=group_count)
+        sums = {name: np.bincount(codes, weights=column, minlength=group_count) for name, column in values.items()}
+        for g, stats in enumerate(groups):
+            _group_totals(stats, counts[g], online[g], {name: column[g] for name, column in sums.items()})
+        for name, (order, sorted_ratio) in utilization.items():
+            if group_count > 1:
+                sorted_codes = codes[order]
+                regroup = np.argsort(sorted_codes, kind='stable')
+                sorted_ratio = sorted_ratio[regroup]
+                bounds = np.searchsorted(sorted_codes[regroup], np.arange(group_count + 1))
+            else:
+                bounds = (0, len(sorted_ratio))
+            for g, stats in enumerate(groups):
+                stats[name] = _percentiles(sorted_ratio[bounds[g]:bounds[g + 1]], percentiles)
+        return groups
+
+    fleet = summarize(np.zeros(len(columns), dtype=np.intp), 1)[0]
+    result = {"fleet": fleet}
+    for field_name in GROUP_FIELDS:
+        labels = columns.group_labels[field_name]
+        result[field_name] = dict(zip(labels, summarize(columns.group_codes[field_name], len(labels))))
+
+    saturation = np.fmax(traffic, bandwidth)
+    candidates = np.flatnonzero(~np.isnan(saturation))
+    k = min(top_k, len(candidates))
+    if k:
+        # 与第k大相同的节点按原顺序取舍，结果与纯Python实现一致
+        kth = np.partition(saturation[candidates], len(candidates) - k)[len(candidates) - k]
+        top = candidates[saturation[candidates] >= kth]
+        top = top[np.argsort(-saturation[top], kind='stable')][:k]
+    else:
+        top = []
+    result["top_saturated"] = [_saturated_node(columns, int(i), traffic[i], bandwidth[i]) for i in top]
+    return result
+
+
+def _aggregate_python(columns: FleetColumns, percentiles: Sequence[float], top_k: int) -> Dict[str, Any]:
+    values = columns.values
+    traffic = list(map(_ratio, values["used_traffic"], values["max_traffic"]))
+    bandwidth = list(map(_ratio, values["current_bandwidth"], values["tier_bandwidth"]))
+    utilization = {"traffic_utilization": traffic, "bandwidth_utilization": bandwidth}
+
+    def summarize(codes, group_count) -> List[Dict[str, Any]]:
+        groups = [_empty_group() for _ in range(group_count)]
+        counts = [0] * group_count
+        online = [0] * group_count
+        sums = {name: [0.0] * group_count for name in values}
+        for g, is_online in zip(codes, columns.online):
+            counts[g] += 1
+            online[g] += is_online
+        for name, column in values.items():
+            group_sums = sums[name]
+            for g, value in zip(codes, column):
+                group_sums[g] += value
+        for g, stats in enumerate(groups):
+            _group_totals(stats, counts[g], online[g], {name: column[g] for name, column in sums.items()})
+        for name, ratio in utilization.items():
+            grouped: List[List[float]] = [[] for _ in range(group_count)]
+            for g, value in zip(codes, ratio):
+                if value == value:  # 排除NaN
+                    grouped[g].append(value)
+            for g, stats in enumerate(groups):
+                grouped[g].sort()
+                stats[name] = _percentiles(grouped[g], percentiles)
+        return groups
+
+    fleet = summarize([0] * len(columns), 1)[0]
+    result = {"fleet": fleet}
+    for field_name in GROUP_FIELDS:
+        labels = columns.group_labels[field_name]
+        result[field_name] = dict(zip(labels, summarize(columns.group_codes[field_name], len(labels))))
+
+    saturation = [max((r for r in pair if r == r), default=math.nan) for pair in zip(traffic, bandwidth)]
+    candidates = [i for i, value in enumerate(saturation) if value == value]
+    top = heapq.nlargest(top_k, candidates, key=saturation.__getitem__)
+    result["top_saturated"] = [_saturated_node(columns, i, traffic[i], bandwidth[i]) for i in top]
+    return result
+
+
+def _saturated_node(columns: FleetColumns, index: int, traffic: float, bandwidth: float) -> Dict[str, Any]:
+    def clean(value) -> Optional[float]:
+        value = float(value)
+        return None if math.isnan(value) else round(value, 6)
+
+    return {
+        "id": columns.ids[index],
+        "node_name": columns.names[index],
+        "region_type": columns.group_labels["region_type"][int(columns.group_codes["region_type"][index])],
+        "region_detail": columns.group_labels["region_detail"][int(columns.group_codes["region_detail"][index])],
+        "traffic_utilization": clean(traffic),
+        "bandwidth_utilization": clean(bandwidth),
+        "saturation": max(v for v in (clean(traffic), clean(bandwidth)) if v is not None),
+    }
+
+
+def aggregate_fleet(nodes, percentiles: Sequence[float] = DEFAULT_PERCENTILES, top_k: int = 10) -> Dict[str, Any]:
+    """
+    计算集群统计
+
+    Args:
+        nodes: 节点记录列表，或已构造的FleetColumns（多次统计同一批节点时避免重复转换）
+        percentiles: 利用率分位数（0-100）
+        top_k: 返回负载最高的节点数，负载取流量利用率和带宽利用率中较大者
+
+    Returns:
+        {"fleet": 全体统计, "region_type": {地域类型: 统计}, "region_detail": {地区: 统计},
+         "top_saturated": [负载最高的节点]}；利用率为比值（1.0表示用满）
+    """
+    columns = nodes if isinstance(nodes, FleetColumns) else FleetColumns.from_nodes(nodes)
+    if np is not None:
+        return _aggregate_numpy(columns, percentiles, top_k)
+    return _aggregate_python(columns, percentiles, top_k)
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+节点同步规划
+
+以远程节点列表为准，计算本地节点需要的创建、更新和删除操作；
+更新只针对字段确实发生变化的节点。
+
+远程节点按ID分桶并计算两级内容摘要，摘要与上次成功同步时一致时跳过同步，
+否则只重新获取和比较摘要变化的分桶
+"""
+
+import hashlib
+import json
+import logging
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AbstractSet, Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 由健康检查或上报产生、不属于节点配置的字段，比较时忽略
+VOLATILE_FIELDS = frozenset({
+    "status", "last_check", "latency", "health_stats", "created_at", "updated_at",
+    "current_bandwidth", "connection_count", "used_traffic", "recent_status", "last_report_at",
+})
+
+# 参与节点摘要的字段：只包含同步到本地服务的节点配置，与服务端NODE_DIGEST_FIELDS保持一致
+DIGEST_FIELDS = (
+    "id", "node_name", "name", "host", "ip_address", "port", "protocol", "connections",
+    "is_public", "allow_relay", "network_name", "network_token", "max_connections",
+    "region_type", "region_detail", "location", "description",
+)
+
+
+def _normalize(value: Any) -> Any:
+    """统一不同来源的值表示（布尔与0/1、数字与数字字符串、None与空字符串）"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return int(value) if float(value).is_integer() else float(value)
+    if isinstance(value, str):
+        stripped = value.strip()
+        try:
+            number = float(stripped)
+        except ValueError:
+            return stripped
+        return int(number) if number.is_integer() else number
+    return value
+
+
+def diff_fields(remote: Dict[str, Any], local: Dict[str, Any], key: str = "id",
+                ignore: AbstractSet[str] = VOLATILE_FIELDS) -> Dict[str, Tuple[Any, Any]]:
+    """
+    比较远程和本地节点记录
+
+    只比较双方都有的字段，本地服务不保存的字段无法通过更新改变
+
+    Returns:
+        变化的字段到(本地值, 远程值)的映射
+    """
+    changes = {}
+    for name, remote_value in remote.items():
+        if name == key or name in ignore or name not in local:
+            continue
+        local_value = local[name]
+        if remote_value != local_value and _normalize(remote_value) != _normalize(local_value):
+            changes[name] = (local_value, remote_value)
+    return changes
+
+
+@dataclass
+class SyncPlan:
+    """同步计划"""
+    creates: List[Dict[str, Any]] = field(default_factory=list)
+    updates: List[Tuple[Any, Dict[str, Any], Dict[str, Tuple[Any, Any]]]] = field(default_factory=list)
+    deletes: List[Dict[str, Any]] = field(default_factory=list)
+    unchanged: int = 0
+
+    def counts(self) -> Dict[str, int]:
+        """各类操作的数量"""
+        return {
+            "creates": len(self.creates),
+            "updates": len(self.updates),
+            "deletes": len(self.deletes),
+            "unchanged": self.unchanged,
+        }
+
+
+def plan_sync(remote_nodes: List[Dict[str, Any]], local_nodes: List[Dict[str, Any]], key: str = "id",
+              ignore: Optional[Iterable[str]] = None, compare: bool = True) -> SyncPlan:
+    """
+    计算以远程为准的同步计划
+
+    两侧节点先按ID建立索引，创建和删除通过哈希查找确定，总耗时与节点数成线性关系
+
+    Args:
+        remote_nodes: 远程节点列表（源A）
+        local_nodes: 本地节点列表（源B）
+        key: 节点标识字段
+        ignore: 比较时忽略的字段，默认为VOLATILE_FIELDS
+        compare: 是否比较两侧都存在的节点的字段，False时这些节点都计为无变化
+
+    Returns:
+        同步计划，updates中的每项为(节点ID, 远程记录, 变化字段)
+    """
+    ignore = frozenset(VOLATILE_FIELDS if ignore is None else ignore)
+    remote_map = {node.get(key): node for node in remote_nodes if node.get(key)}
+    local_map = {node.get(key): node for node in local_nodes if node.get(key)}
+
+    plan = SyncPlan()
+    for node_id, remote_node in remote_map.items():
+        local_node = local_map.get(node_id)
+        if local_node is None:
+            plan.creates.append(remote_node)
+            continue
+        changes = diff_fields(remote_node, local_node, key, ignore) if compare else None
+        if changes:
+            plan.updates.append((node_id, remote_node, changes))
+        else:
+            plan.unchanged += 1
+
+    plan.deletes = [node for node_id, node in local_map.items() if node_id not in remote_map]
+    return plan
+
+
+@dataclass
+class OperationResult:
+    """单个同步操作的结果"""
+    action: str
+    node_id: Any
+    success: bool
+    latency_ms: float
+    error: Optional[str] = None
+
+
+@dataclass
+class ReconcileResult:
+    """执行同步计划的结果"""
+    operations: List[OperationResult] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    @property
+    def failures(self) -> List[OperationResult]:
+        return [op for op in self.operations if not op.success]
+
+    @property
+    def changed_ids(self) -> List[Any]:
+        """成功创建或更新的节点ID，只有这些节点需要等待新一轮健康检查"""
+        return [op.node_id for op in self.operations if op.action in ("create", "update") and op.success]
+
+    def summary(self) -> Dict[str, Any]:
+        """按操作类型汇总数量、失败数和延迟分位数"""
+        summary: Dict[str, Any] = {"elapsed_ms": round(self.elapsed_ms, 1)}
+        for action in ("delete", "update", "create"):
+            ops = [op for op in self.operations if op.action == action]
+            if not ops:
+                continue
+            latencies = sorted(op.latency_ms for op in ops)
+            summary[action] = {
+                "count": len(ops),
+                "failed": sum(1 for op in ops if not op.success),
+                "latency_p50_ms": round(latencies[len(latencies) // 2], 1),
+                "latency_max_ms": round(latencies[-1], 1),
+            }
+        return summary
+
+
+# 同一节点的操作按此顺序执行：先删除旧记录，再更新，最后创建
+_ACTION_ORDER = {"delete": 0, "update": 1, "create": 2}
+
+
+def execute_plan(plan: SyncPlan,
+                 create: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                 update: Optional[Callable[[Any, Dict[str, Any]], bool]] = None,
+                 delete: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                 workers: int = 8, key: str = "id") -> ReconcileResult:
+    """
+    并发执行同步计划
+
+    不同节点的操作由线程池并发执行；同一ID上的多个操作（例如删除后重新创建）
+    在同一线程中按删除、更新、创建的顺序执行
+
+    Args:
+        plan: 同步计划
+        create: 创建节点，参数为远程记录，返回是否成功
+        update: 更新节点，参数为(节点ID, 远程记录)，返回是否成功
+        delete: 删除节点，参数为本地记录，返回是否成功
+        workers: 并发线程数
+        key: 节点标识字段
+
+    Returns:
+        每个操作的结果和总耗时
+    """
+    chains: Dict[Any, List[Tuple[str, Any, Callable[[], bool]]]] = {}
+
+    def add(action: str, node_id: Any, call: Callable[[], bool]):
+        chains.setdefault(node_id, []).append((action, node_id, call))
+
+    if delete is not None:
+        for node in plan.deletes:
+            add("delete", node.get(key), lambda node=node: delete(node))
+    if update is not None:
+        for node_id, node, _ in plan.updates:
+            add("update", node_id, lambda node_id=node_id, node=node: update(node_id, node))
+    if create is not None:
+        for node in plan.creates:
+            add("create", node.get(key), lambda node=node: create(node))
+
+    def run_chain(chain) -> List[OperationResult]:
+        results = []
+        for action, node_id, call in sorted(chain, key=lambda op: _ACTION_ORDER[op[0]]):
+            start = time.perf_counter()
+            error = None
+            try:
+                success = bool(call())
+            except Exception as e:
+                success, error = False, str(e)
+                logger.error(f"同步操作异常: {action} {node_id} - {error}")
+            results.append(OperationResult(action, node_id, success, (time.perf_counter() - start) * 1000, error))
+        return results
+
+    result = ReconcileResult()
+    start = time.perf_counter()
+    if chains:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chains))), thread_name_prefix='sync') as executor:
+            for results in executor.map(run_chain, chains.values()):
+                result.operations.extend(results)
+    result.elapsed_ms = (time.perf_counter() - start) * 1000
+    return result
+
+
+def node_digest(node: Dict[str, Any], fields: Iterable[str] = DIGEST_FIELDS) -> str:
+    """节点配置的内容哈希（规范化JSON的SHA-256），只包含fields中节点具有的字段"""
+    stable = {name: node[name] for name in fields if name in node}
+    text = json.dumps(stable, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def node_bucket(node_id: Any, bucket_count: int) -> int:
+    """节点所在的分桶，整数ID取模，其他ID使用CRC32"""
+    try:
+        return int(node_id) % bucket_count
+    except (TypeError, ValueError):
+        return zlib.crc32(str(node_id).encode('utf-8')) % bucket_count
+
+
+def node_set_digest(nodes: List[Dict[str, Any]], bucket_count: int, key: str = "id") -> Tuple[str, Dict[str, str]]:
+    """
+    计算节点集合的两级摘要，与服务端/api/nodes/digest的算法相同
+
+    Returns:
+        (整体摘要, 分桶编号到分桶摘要的映射)
+    """
+    grouped: Dict[int, List[Tuple[str, str]]] = {}
+    for node in nodes:
+        node_id = node.get(key)
+        grouped.setdefault(node_bucket(node_id, bucket_count), []).append((node_id, node_digest(node)))
+
+    def sort_key(item):
+        try:
+            return (0, int(item[0]), "")
+        except (TypeError, ValueError):
+            return (1, 0, str(item[0]))
+
+    buckets = {}
+    for bucket in sorted(grouped):
+        hashes = ''.join(digest for _, digest in sorted(grouped[bucket], key=sort_key))
+        buckets[str(bucket)] = hashlib.sha256(hashes.encode('ascii')).hexdigest()
+    root = ','.join(f"{bucket}:{digest}" for bucket, digest in buckets.items())
+    return hashlib.sha256(root.encode('ascii')).hexdigest(), buckets
+
+
+@dataclass
+class MirrorUpdate:
+    """一次刷新远程节点的结果"""
+    digest: str
+    buckets: Dict[str, str]
+    nodes: List[Dict[str, Any]]
+    changed_buckets: Optional[Set[int]] = None
+    bucket_count: int = 64
+    key: str = "id"
+
+    @property
+    def unchanged(self) -> bool:
+        return self.changed_buckets is not None and not self.changed_buckets
+
+    def in_scope(self, node: Dict[str, Any]) -> bool:
+        """节点是否属于本次需要同步的分桶"""
+        return self.changed_buckets is None or node_bucket(node.get(self.key), self.bucket_count) in self.changed_buckets
+
+    def scope(self, local_nodes: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """返回本次需要比较的(远程节点, 本地节点)"""
+        return (
+            [node for node in self.nodes if self.in_scope(node)],
+            [node for node in local_nodes if self.in_scope(node)],
+        )
+
+
+class RemoteNodeMirror:
+    """
+    远程节点列表的本地镜像
+
+    refresh先获取服务端摘要：整体摘要与上次成功同步时相同则不下载节点；
+    否则只下载摘要变化的分桶。服务端不支持摘要时下载完整列表并在本地计算摘要。
+    调用方同步成功后调用mark_applied，失败的分桶会在下次刷新时重新比较
+    """
+
+    def __init__(self, bucket_count: int = 64, key: str = "id"):
+        self.bucket_count = bucket_count
+        self.key = key
+        self.nodes: Dict[Any, Dict[str, Any]] = {}
+        self.applied_digest: Optional[str] = None
+        self.applied_buckets: Dict[str, str] = {}
+
+    def reset(self):
+        """丢弃已同步状态（例如本地服务重启后），下次刷新执行完整同步"""
+        self.nodes.clear()
+        self.applied_digest = None
+        self.applied_buckets = {}
+
+    def refresh(self, fetch_digest: Callable[[int], Optional[Dict[str, Any]]],
+                fetch_nodes: Callable[[Optional[List[int]], int], Optional[List[Dict[str, Any]]]]) -> Optional[MirrorUpdate]:
+        """
+        刷新远程节点
+
+        Args:
+            fetch_digest: 按分桶数获取服务端摘要，不支持或失败时返回None
+            fetch_nodes: 按(分桶列表, 分桶数)获取节点，分桶列表为None表示全部，失败时返回None
+
+        Returns:
+            刷新结果，获取节点失败时返回None
+        """
+        remote = fetch_digest(self.bucket_count)
+        if remote is not None and remote.get('bucket_count') == self.bucket_count:
+            digest, buckets = remote['digest'], remote.get('buckets', {})
+            if digest == self.applied_digest:
+                return MirrorUpdate(digest, buckets, list(self.nodes.values()), set(), self.bucket_count, self.key)
+
+            if self.applied_digest is None:
+                changed = None
+                fetched = fetch_nodes(None, self.bucket_count)
+            else:
+                changed = {
+                    int(bucket) for bucket in set(buckets) | set(self.applied_buckets)
+                    if buckets.get(bucket) != self.applied_buckets.get(bucket)
+                }
+                fetched = fetch_nodes(sorted(changed), self.bucket_count) if changed else []
+            if fetched is None:
+                return None
+
+            if changed is None:
+                self.nodes = {node.get(self.key): node for node in fetched}
+            else:
+                for node_id in [node_id for node_id in self.nodes
+                                if node_bucket(node_id, self.bucket_count) in changed]:
+                    del self.nodes[node_id]
+                self.nodes.update((node.get(self.key), node) for node in fetched)
+            return MirrorUpdate(digest, buckets, list(self.nodes.values()), changed, self.bucket_count, self.key)
+
+        fetched = fetch_nodes(None, self.bucket_count)
+        if fetched is None:
+            return None
+        self.nodes = {node.get(self.key): node for node in fetched}
+        digest, buckets = node_set_digest(fetched, self.bucket_count, self.key)
+        changed = set() if digest == self.applied_digest else None
+        return MirrorUpdate(digest, buckets, fetched, changed, self.bucket_count, self.key)
+
+    def mark_applied(self, update: MirrorUpdate):
+        """记录本地已与该次刷新的结果一致"""
+        self.applied_digest = update.digest
+        self.applied_buckets = dict(update.buckets)
@@ -5,7 +5,7 @@
 2. 从远程API查询节点（源A）
 3. 从本地API获取数据库节点（源B）
 4. 对比A和B，以A为准进行增删改操作
-5. 等待30秒以上
+5. 等待每个节点完成新一轮健康检查（last_check更新或超时）
 6. 获取数据库节点（源C）
 7. 汇总C数据上报到远程API
 8. 休眠5分钟，重复步骤2-7
@@ -16,12 +16,14 @@ import logging
 import sys
 import signal
 import time
-import subprocess
-import requests
-import json
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+from NodeHttp import HttpClient, ResponseCache, RetryPolicy
+from NodeReadiness import snapshot_last_checks, wait_until_fresh
+from NodeSync import ReconcileResult, RemoteNodeMirror, execute_plan, plan_sync
+from NodeUptime import SupervisedProcess
+
 
 # 配置日志
 logging.basicConfig(
@@ -34,63 +36,98 @@ logger = logging.getLogger(__name__)
 class NodeSyncMonitor:
     """节点同步与状态上报监控器"""
     
-    def __init__(self, remote_api_url: str, local_api_url: str = "127.0.0.1:8080"):
+    def __init__(self, remote_api_url: str, local_api_url: str = "127.0.0.1:8080", ready_timeout: int = 60,
+                 cache_file: Optional[str] = "remote_nodes_cache.json", sync_workers: int = 8):
         """
         初始化监控器
         
         Args:
             remote_api_url: 远程API地址（不带协议前缀）
             local_api_url: 本地API地址，默认为127.0.0.1:8080
+            ready_timeout: 同步后等待健康检查结果的最长时间（秒）
+            cache_file: 远程节点列表的磁盘缓存文件，None表示只在内存中缓存
+            sync_workers: 并发执行本地增删改请求的线程数
         """
         self.remote_api_url = remote_api_url.rstrip('/')
         self.local_api_url = local_api_url.rstrip('/')
+        self.ready_timeout = ready_timeout
         self.easytier_process = None
         self.running = True
+        self.last_readiness_seconds = None
+        self.last_sync_counts: Dict[str, int] = {}
+        self.last_sync_failures = 0
+        self.last_sync_result: Optional[ReconcileResult] = None
+        self.sync_workers = sync_workers
+        # 远程节点镜像，摘要未变化时跳过同步
+        self.remote_mirror = RemoteNodeMirror()
+        self.digest_supported = True
+        # 远程和本地API共用的keep-alive连接池，请求失败时由各调用方处理
+        self.http = HttpClient(timeout=30, max_connections_per_host=max(8, sync_workers), retry=RetryPolicy(max_retries=0))
+        # 远程节点列表的条件请求缓存，列表未变化时服务器返回304
+        self.node_cache = ResponseCache(cache_file)
         
     def start_easytier_uptime(self):
-        """启动easytier-uptime.exe进程"""
-        try:
-            logger.info("启动easytier-uptime.exe...")
-            self.easytier_process = subprocess.Popen(
-                ["easytier-uptime.exe"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            logger.info("easytier-uptime.exe启动成功")
-        except Exception as e:
-            logger.error(f"启动easytier-uptime.exe失败: {e}")
-            raise
+        """启动easytier-uptime.exe进程，输出写入日志，异常退出后自动重启"""
+        logger.info("启动easytier-uptime.exe...")
+        self.easytier_process = SupervisedProcess(["easytier-uptime.exe"])
+        if not self.easytier_process.start():
+            raise RuntimeError("启动easytier-uptime.exe失败")
+        logger.info("easytier-uptime.exe启动成功")
     
     def stop_easytier_uptime(self):
         """停止easytier-uptime.exe进程"""
         if self.easytier_process:
             try:
-                self.easytier_process.terminate()
-                self.easytier_process.wait(timeout=10)
+                self.easytier_process.stop(timeout=10)
                 logger.info("easytier-uptime.exe已停止")
-            except subprocess.TimeoutExpired:
-                logger.warning("easytier-uptime.exe未能正常停止，强制终止")
-                self.easytier_process.kill()
             except Exception as e:
                 logger.error(f"停止easytier-uptime.exe时出错: {e}")
     
-    def get_remote_nodes(self) -> List[Dict[str, Any]]:
-        """从远程API获取节点列表（源A）"""
+    def get_remote_nodes(self, buckets: Optional[List[int]] = None, bucket_count: int = 64) -> Optional[List[Dict[str, Any]]]:
+        """
+        从远程API获取节点列表（源A）
+        
+        Args:
+            buckets: 只获取这些分桶的节点，None表示全部
+            bucket_count: 分桶数
+            
+        Returns:
+            节点列表，失败时返回None
+        """
         try:
-            url = f"https://{self.remote_api_url}/api/nodes/all"
+            url = f"https://{self.remote_api_url}/api/nodes/all?view=sync"
+            if buckets is not None:
+                url += f"&buckets={','.join(map(str, buckets))}&bucket_count={bucket_count}"
             logger.info(f"从远程API获取节点列表: {url}")
             
-            response = requests.get(url, timeout=30)
+            response = self.http.get(url, cache=self.node_cache)
             response.raise_for_status()
             
-            nodes = response.json()
-            logger.info(f"远程API返回 {len(nodes)} 个节点")
+            data = response.json()
+            nodes = data.get('nodes', []) if isinstance(data, dict) else data
+            logger.info(f"远程API返回 {len(nodes)} 个节点{'（未变化，使用缓存）' if response.from_cache else ''}")
             return nodes
             
         except Exception as e:
             logger.error(f"获取远程节点失败: {e}")
-            return []
+            return None
+    
+    def get_remote_digest(self, bucket_count: int = 64) -> Optional[Dict[str, Any]]:
+        """获取远程节点的内容摘要，服务端不支持或请求失败时返回None"""
+        if not self.digest_supported:
+            return None
+        try:
+            url = f"https://{self.remote_api_url}/api/nodes/digest?bucket_count={bucket_count}"
+            response = self.http.get(url)
+            if response.status in (404, 405, 501):
+                logger.info("远程API不支持节点摘要，改为每次获取完整节点列表")
+                self.digest_supported = False
+                return None
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.warning(f"获取远程节点摘要失败: {e}")
+            return None
     
     def get_local_nodes(self) -> List[Dict[str, Any]]:
         """从本地API获取节点列表（源B/C）"""
@@ -98,7 +135,7 @@ class NodeSyncMonitor:
             url = f"http://{self.local_api_url}/api/nodes"
             logger.info(f"从本地API获取节点列表: {url}")
             
-            response = requests.get(url, timeout=30)
+            response = self.http.get(url)
             response.raise_for_status()
             
             nodes = response.json()
@@ -109,11 +146,22 @@ class NodeSyncMonitor:
             logger.error(f"获取本地节点失败: {e}")
             return []
     
+    def _fetch_local_nodes(self) -> Optional[List[Dict[str, Any]]]:
+        """从本地API获取节点列表，失败时返回None"""
+        try:
+            url = f"http://{self.local_api_url}/api/nodes"
+            response = self.http.get(url)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.debug(f"获取本地节点失败: {e}")
+            return None
+    
     def create_node(self, node_data: Dict[str, Any]) -> bool:
         """创建新节点"""
         try:
             url = f"http://{self.local_api_url}/api/nodes"
-            response = requests.post(url, json=node_data, timeout=30)
+            response = self.http.post(url, json_data=node_data)
             response.raise_for_status()
             logger.info(f"成功创建节点: {node_data.get('id', 'unknown')}")
             return True
@@ -125,7 +173,7 @@ class NodeSyncMonitor:
         """更新节点"""
         try:
             url = f"http://{self.local_api_url}/api/nodes/{node_id}"
-            response = requests.put(url, json=node_data, timeout=30)
+            response = self.http.put(url, json_data=node_data)
             response.raise_for_status()
             logger.info(f"成功更新节点: {node_id}")
             return True
@@ -137,7 +185,7 @@ class NodeSyncMonitor:
         """删除节点"""
         try:
             url = f"http://{self.local_api_url}/api/nodes/{node_id}"
-            response = requests.delete(url, timeout=30)
+            response = self.http.delete(url)
             response.raise_for_status()
             logger.info(f"成功删除节点: {node_id}")
             return True
@@ -145,37 +193,40 @@ class NodeSyncMonitor:
             logger.error(f"删除节点失败: {e}")
             return False
     
-    def sync_nodes(self, remote_nodes: List[Dict[str, Any]], local_nodes: List[Dict[str, Any]]):
+    def sync_nodes(self, remote_nodes: List[Dict[str, Any]], local_nodes: List[Dict[str, Any]]) -> Dict[Any, Any]:
         """
         同步节点：以远程节点（源A）为准，对本地节点（源B）进行增删改操作
         
         Args:
             remote_nodes: 远程节点列表（源A）
             local_nodes: 本地节点列表（源B）
+            
+        Returns:
+            本次同步创建或更新的节点ID到同步前last_check的映射，用于等待这些节点的新一轮健康检查
         """
         logger.info("开始同步节点...")
         
-        # 创建节点映射，便于查找
-        remote_map = {node.get('id'): node for node in remote_nodes if node.get('id')}
-        local_map = {node.get('id'): node for node in local_nodes if node.get('id')}
+        plan = plan_sync(remote_nodes, local_nodes)
+        for node_id, _, changes in plan.updates:
+            logger.debug(f"节点 {node_id} 字段变化: {', '.join(sorted(changes))}")
         
-        # 远程存在但本地不存在的节点，需要创建
-        for node_id, remote_node in remote_map.items():
-            if node_id not in local_map:
-                self.create_node(remote_node)
-        
-        # 远程和本地都存在的节点，需要更新（以远程为准）
-        for node_id, remote_node in remote_map.items():
-            if node_id in local_map:
-                # 这里可以根据需要比较节点内容，简化起见直接更新
-                self.update_node(node_id, remote_node)
-        
-        # 本地存在但远程不存在的节点，需要删除
-        for node_id in local_map:
-            if node_id not in remote_map:
-                self.delete_node(node_id)
-        
-        logger.info("节点同步完成")
+        # 并发执行：远程新增的节点创建，字段有变化的节点更新（以远程为准），远程已删除的节点删除
+        result = execute_plan(
+            plan,
+            create=self.create_node,
+            update=self.update_node,
+            delete=lambda node: self.delete_node(node.get('id')),
+            workers=self.sync_workers
+        )
+        self.last_sync_result = result
+        self.last_sync_failures = len(result.failures)
+        self.last_sync_counts = plan.counts()
+        counts = self.last_sync_counts
+        logger.info(f"节点同步完成: 创建 {counts['creates']}, 更新 {counts['updates']}, "
+                    f"删除 {counts['deletes']}, 无变化 {counts['unchanged']}, 失败 {self.last_sync_failures}")
+        logger.info(f"同步操作统计: {result.summary()}")
+        # 未变化的节点由本地服务按原周期检查，不需要等待
+        return snapshot_last_checks(local_nodes, result.changed_ids)
     
     def report_status(self, nodes: List[Dict[str, Any]]):
         """
@@ -195,7 +246,7 @@ class NodeSyncMonitor:
                 'total_count': len(nodes)
             }
             
-            response = requests.post(url, json=report_data, timeout=30)
+            response = self.http.post(url, json_data=report_data)
             response.raise_for_status()
             
             logger.info(f"状态上报成功，上报了 {len(nodes)} 个节点")
@@ -207,29 +258,43 @@ class NodeSyncMonitor:
         """执行一次完整的同步周期"""
         logger.info("开始执行同步周期...")
         
-        # 步骤2：从远程API查询节点（源A）
-        remote_nodes = self.get_remote_nodes()
-        if not remote_nodes:
+        # 步骤2：从远程API查询节点（源A），摘要未变化时不下载节点列表
+        update = self.remote_mirror.refresh(self.get_remote_digest, self.get_remote_nodes)
+        if update is None or not update.nodes:
             logger.warning("未能获取远程节点，跳过本次同步")
             return
         
-        # 步骤3：从本地API获取数据库节点（源B）
-        local_nodes = self.get_local_nodes()
-        
-        # 步骤4：对比A和B，以A为准进行同步
-        self.sync_nodes(remote_nodes, local_nodes)
-        
-        # 步骤5：等待30秒以上
-        logger.info("等待30秒...")
-        time.sleep(30)
+        if update.unchanged:
+            logger.info(f"远程节点摘要未变化 ({update.digest[:12]})，跳过同步")
+            baseline = {}
+        else:
+            # 步骤3：从本地API获取数据库节点（源B）
+            local_nodes = self.get_local_nodes()
+            
+            # 步骤4：对比A和B，以A为准进行同步（只比较摘要变化的分桶）
+            if update.changed_buckets is not None:
+                logger.info(f"{len(update.changed_buckets)} 个分桶的节点有变化")
+            remote_scope, local_scope = update.scope(local_nodes)
+            baseline = self.sync_nodes(remote_scope, local_scope)
+            if self.last_sync_failures == 0:
+                self.remote_mirror.mark_applied(update)
         
-        # 步骤6：从本地API获取数据库节点（源C）
-        updated_nodes = self.get_local_nodes()
+        # 步骤5-6：等待健康检查结果就绪，并从本地API获取数据库节点（源C）
+        logger.info(f"等待 {len(baseline)} 个节点完成健康检查 (最长 {self.ready_timeout} 秒)...")
+        updated_nodes, ready, elapsed = wait_until_fresh(
+            self._fetch_local_nodes, baseline, timeout=self.ready_timeout
+        )
+        self.last_readiness_seconds = elapsed
+        if ready:
+            logger.info(f"健康检查结果就绪，耗时 {elapsed:.2f} 秒")
+        else:
+            logger.warning(f"等待 {elapsed:.2f} 秒后仍有节点未完成健康检查，上报当前数据")
         
         # 步骤7：汇总C的数据，提交到远程API
         if updated_nodes:
             self.report_status(updated_nodes)
         
+        logger.info(f"HTTP请求统计: {self.http.metrics.summary()}")
         logger.info("同步周期完成")
     
     def start_monitoring(self):
@@ -258,6 +323,7 @@ class NodeSyncMonitor:
         finally:
             # 清理资源
             self.stop_easytier_uptime()
+            self.http.close()
     
     def stop(self):
         """停止监控"""
@@ -284,6 +350,12 @@ def main():
                         help='本地API地址，默认为127.0.0.1:8080')
     parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
                         default='INFO', help='日志级别，默认为INFO')
+    parser.add_argument('--ready-timeout', type=int, default=60,
+                        help='同步后等待健康检查结果的最长时间（秒），默认60')
+    parser.add_argument('--sync-workers', type=int, default=8,
+                        help='并发执行本地增删改请求的线程数，默认8')
+    parser.add_argument('--cache-file', default='remote_nodes_cache.json',
+                        help='远程节点列表的缓存文件，传入空字符串表示不写入磁盘')
     
     args = parser.parse_args()
     
@@ -300,7 +372,8 @@ def main():
     logger.info(f"本地API地址: {args.local_api}")
     
     global monitor
-    monitor = NodeSyncMonitor(args.api_domain, args.local_api)
+    monitor = NodeSyncMonitor(args.api_domain, args.local_api, args.ready_timeout, args.cache_file or None,
+                              args.sync_workers)
     
     try:
         monitor.start_monitoring()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+easytier-uptime子进程管理
+
+子进程的stdout和stderr由后台线程持续读取并写入日志（Python日志或滚动日志文件），
+避免管道缓冲区写满后子进程阻塞；子进程异常退出时按指数退避自动重启
+"""
+
+import logging
+import logging.handlers
+import subprocess
+import threading
+import time
+from typing import Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class SupervisedProcess:
+    """
+    受监管的子进程
+
+    start启动子进程和监管线程；子进程退出后（非stop导致）等待退避时间后重启，
+    连续运行超过stable_seconds后退避时间重置
+    """
+
+    def __init__(self, args: Sequence[str], cwd: Optional[str] = None, name: str = "easytier-uptime",
+                 log_file: Optional[str] = None, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 3,
+                 restart: bool = True, backoff_base: float = 1.0, max_backoff: float = 60.0,
+                 stable_seconds: float = 60.0):
+        """
+        Args:
+            args: 命令行
+            cwd: 工作目录
+            name: 子进程名称，同时作为输出日志的logger名称
+            log_file: 子进程输出写入的滚动日志文件，None表示写入Python日志
+            max_bytes: 单个日志文件的最大字节数
+            backup_count: 保留的历史日志文件数
+            restart: 子进程退出后是否自动重启
+            backoff_base: 首次重启前的等待时间（秒），之后逐次翻倍
+            max_backoff: 最长重启等待时间（秒）
+            stable_seconds: 运行超过此时间后重启退避重置
+        """
+        self.args = list(args)
+        self.cwd = cwd
+        self.name = name
+        self.restart = restart
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.stable_seconds = stable_seconds
+        self.restart_count = 0
+        self.returncode: Optional[int] = None
+
+        self.output_logger = logging.getLogger(name)
+        if log_file:
+            # 输出只写入文件，不再传递到上层日志
+            handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self.output_logger = logging.getLogger(f"{name}.file")
+            self.output_logger.handlers = [handler]
+            self.output_logger.setLevel(logging.INFO)
+            self.output_logger.propagate = False
+
+        self._process: Optional[subprocess.Popen] = None
+        self._started_at: Optional[float] = None
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        process = self._process
+        return process.pid if process is not None else None
+
+    @property
+    def running(self) -> bool:
+        process = self._process
+        return process is not None and process.poll() is None
+
+    @property
+    def uptime(self) -> float:
+        """当前子进程已运行的时间（秒），未运行时为0"""
+        if not self.running or self._started_at is None:
+            return 0.0
+        return time.monotonic() - self._started_at
+
+    @property
+    def started_at(self) -> Optional[float]:
+        """当前子进程的启动时间（time.monotonic）"""
+        return self._started_at
+
+    def poll(self) -> Optional[int]:
+        """与subprocess.Popen.poll相同：运行中返回None，否则返回退出码"""
+        return None if self.running else self.returncode
+
+    def add_line_listener(self, callback: Callable[[str], None]):
+        """注册子进程输出行的回调，在读取线程中调用"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_line_listener(self, callback: Callable[[str], None]):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _spawn(self) -> subprocess.Popen:
+        process = subprocess.Popen(
+            self.args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            cwd=self.cwd
+        )
+        self._process = process
+        self._started_at = time.monotonic()
+        self.returncode = None
+        threading.Thread(
+            target=self._drain, args=(process,), name=f"{self.name}-output", daemon=True
+        ).start()
+        logger.info(f"{self.name} 已启动 (PID {process.pid})")
+        return process
+
+    def _drain(self, process: subprocess.Popen):
+        """持续读取子进程输出，直到管道关闭"""
+        for raw in iter(process.stdout.readline, b''):
+            line = raw.decode('utf-8', errors='replace').rstrip()
+            if not line:
+                continue
+            self.output_logger.info(line)
+            with self._lock:
+                listeners = list(self._listeners)
+            for callback in listeners:
+                try:
+                    callback(line)
+                except Exception as e:
+                    logger.debug(f"输出回调异常: {str(e)}")
+        process.stdout.close()
+
+    def start(self) -> bool:
+        """
+        启动子进程和监管线程
+
+        Returns:
+            首次启动是否成功
+        """
+        self._stop_event.clear()
+        try:
+            process = self._spawn()
+        except OSError as e:
+            logger.error(f"启动 {self.name} 失败: {str(e)}")
+            return False
+        self._supervisor = threading.Thread(
+            target=self._supervise, args=(process,), name=f"{self.name}-supervisor", daemon=True
+        )
+        self._supervisor.start()
+        return True
+
+    def _supervise(self, process: subprocess.Popen):
+        """等待子进程退出并按退避策略重启"""
+        failures = 0
+        while True:
+            self.returncode = process.wait()
+            if self._stop_event.is_set():
+                return
+            ran = time.monotonic() - (self._started_at or time.monotonic())
+            logger.warning(f"{self.name} 已退出，退出码 {self.returncode}，运行了 {ran:.1f} 秒")
+            if not self.restart:
+                return
+
+            failures = 1 if ran >= self.stable_seconds else failures + 1
+            delay = min(self.max_backoff, self.backoff_base * 2 ** (failures - 1))
+            logger.info(f"{delay:.1f}秒后重启 {self.name}")
+            if self._stop_event.wait(delay):
+                return
+            try:
+                process = self._spawn()
+            except OSError as e:
+                logger.error(f"重启 {self.name} 失败: {str(e)}")
+                self._started_at = time.monotonic()
+                continue
+            self.restart_count += 1
+
+    def stop(self, timeout: float = 10):
+        """停止子进程，不再重启"""
+        self._stop_event.set()
+        process = self._process
+        if process is not None and process.poll() is None:
+            logger.info(f"正在停止 {self.name}...")
+            try:
+                process.terminate()
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                logger.warning(f"{self.name} 未能正常停止，强制终止")
+                process.kill()
+                process.wait()
+            self.returncode = process.returncode
+        if self._supervisor is not None and self._supervisor is not threading.current_thread():
+            self._supervisor.join(timeout)
+            self._supervisor = None
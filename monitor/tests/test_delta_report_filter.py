@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""DeltaReportFilter 增量上报测试"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NodeReporter import DeltaReportFilter
+
+
+def _report(node_id: int, status: str, latency: int = 10) -> dict:
+    return {"node_id": node_id, "status": status, "latency": latency, "health_stats": {}}
+
+
+class DeltaReportFilterTest(unittest.TestCase):
+
+    def test_unchanged_nodes_are_suppressed_after_commit(self):
+        delta = DeltaReportFilter(keyframe_interval=300)
+        selected = delta.select([_report(1, "online"), _report(2, "online")], now=0)
+        delta.commit(report["node_id"] for report in selected)
+
+        self.assertEqual(delta.select([_report(1, "online"), _report(2, "online", 15)], now=10), [])
+        self.assertEqual(len(delta.select([_report(1, "online"), _report(2, "online")], now=300)), 2)
+
+    def test_failed_nodes_are_reported_again(self):
+        delta = DeltaReportFilter(keyframe_interval=300)
+        delta.commit(report["node_id"] for report in delta.select([_report(1, "online"), _report(2, "online")], now=0))
+
+        changed = delta.select([_report(1, "offline"), _report(2, "offline")], now=10)
+        self.assertEqual(len(changed), 2)
+        # 只有节点1上报成功
+        delta.commit([1])
+
+        again = delta.select([_report(1, "offline"), _report(2, "offline")], now=20)
+        self.assertEqual([report["node_id"] for report in again], [2])
+
+    def test_uncommitted_new_node_is_reported_again(self):
+        delta = DeltaReportFilter()
+        delta.select([_report(1, "online")], now=0)
+        self.assertEqual(len(delta.select([_report(1, "online")], now=10)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
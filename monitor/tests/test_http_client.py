@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""HttpClient 状态码、重定向和代理测试"""
+
+import json
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NodeHttp import HttpClient, HttpResponse, RetryPolicy
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """/moved 301到/final，/post-moved 307到/final，/loop 重定向到自身；请求行原样记录"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.seen.append((self.command, self.path, body))
+        path = self.path.split('://', 1)[-1]
+        path = path[path.index('/'):] if '://' in self.path else self.path
+        if path == '/moved':
+            self._reply(301, location='/final')
+        elif path == '/post-moved':
+            self._reply(307, location='/final')
+        elif path == '/loop':
+            self._reply(302, location='/loop')
+        else:
+            self._reply(200, {"method": self.command, "body": body.decode()})
+
+    do_GET = do_POST = _handle
+
+    def _reply(self, status: int, data=None, location: str = None):
+        payload = json.dumps(data or {}).encode()
+        self.send_response(status)
+        if location:
+            self.send_header('Location', location)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.seen = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def client(self, **kwargs) -> HttpClient:
+        kwargs.setdefault('proxies', {})
+        return HttpClient(retry=RetryPolicy(max_retries=0), **kwargs)
+
+    def test_only_2xx_is_ok(self):
+        self.assertTrue(HttpResponse('GET', '/', 204, {}, b'').ok)
+        self.assertFalse(HttpResponse('GET', '/', 302, {}, b'').ok)
+        self.assertFalse(HttpResponse('GET', '/', 304, {}, b'').ok)
+
+    def test_redirects_are_followed(self):
+        client = self.client()
+        response = client.get(f"{self.base}/moved")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.url, f"{self.base}/final")
+
+        # 307保持方法和请求体
+        response = client.post(f"{self.base}/post-moved", json_data={"a": 1})
+        self.assertEqual(response.json(), {"method": "POST", "body": '{"a": 1}'})
+        client.close()
+
+    def test_redirect_limit(self):
+        client = self.client(max_redirects=2)
+        response = client.get(f"{self.base}/loop")
+        self.assertEqual(response.status, 302)
+        self.assertFalse(response.ok)
+        self.assertEqual(len(self.server.seen), 3)
+        client.close()
+
+    def test_http_proxy_from_settings(self):
+        # 本地服务器充当代理：请求行应为完整URL
+        client = self.client(proxies={"http": self.base})
+        response = client.get("http://example.invalid/final")
+        self.assertTrue(response.ok)
+        self.assertEqual(self.server.seen[-1][1], "http://example.invalid/final")
+
+        bypass = self.client(proxies={"http": "http://127.0.0.1:9", "no": "127.0.0.1"})
+        self.assertTrue(bypass.get(f"{self.base}/final").ok)
+        client.close()
+        bypass.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""JsonFrameReader 分帧测试"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NodeChecker import EasyTierFrameError, JsonFrameReader
+
+
+class JsonFrameReaderTest(unittest.TestCase):
+
+    def test_complete_frame_followed_by_partial_frame(self):
+        reader = JsonFrameReader()
+        self.assertEqual(reader.feed(b'{"a":"}{"}{"b":'), [{"a": "}{"}])
+        self.assertEqual(reader.pending(), b'{"b":')
+        self.assertEqual(reader.feed(b'[1, "]"]}'), [{"b": [1, "]"]}])
+
+    def test_frames_split_across_chunks(self):
+        reader = JsonFrameReader()
+        data = b'{"id": 1, "s": "a\\"}"}\n  {"id": 2}{"id": 3, "r": [{"x": "["}]}'
+        frames = []
+        for i in range(len(data)):
+            frames.extend(reader.feed(data[i:i + 1]))
+        self.assertEqual([frame["id"] for frame in frames], [1, 2, 3])
+        self.assertEqual(reader.pending(), b'')
+
+    def test_oversized_partial_frame_raises(self):
+        reader = JsonFrameReader(max_frame_bytes=16)
+        with self.assertRaises(EasyTierFrameError):
+            reader.feed(b'{"a": "' + b'x' * 32)
+
+
+if __name__ == '__main__':
+    unittest.main()
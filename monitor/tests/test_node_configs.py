@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""NodeMonitorConfig 延迟写入测试"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+MONITOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MONITOR_DIR)
+
+from NodeConfigs import NodeMonitorConfig
+
+
+class NodeMonitorConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.workdir, "config.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def read_tokens(self):
+        with open(self.config_file, encoding="utf-8") as f:
+            return json.load(f)["report_tokens"]
+
+    def test_debounced_save_persists_when_process_exits(self):
+        # 单次运行模式：设置token后进程在延迟写入之前退出，不调用close
+        script = (
+            "import sys\n"
+            "from NodeConfigs import NodeMonitorConfig\n"
+            "config = NodeMonitorConfig(sys.argv[1], save_delay=60)\n"
+            "config.set_report_token('node-a', 'token-a')\n"
+        )
+        subprocess.run([sys.executable, "-c", script, self.config_file], cwd=MONITOR_DIR, check=True, timeout=30)
+        self.assertEqual(self.read_tokens(), {"node-a": "token-a"})
+
+    def test_close_writes_pending_changes(self):
+        config = NodeMonitorConfig(self.config_file, save_delay=60)
+        config.set_report_token("node-b", "token-b")
+        self.assertFalse(os.path.exists(self.config_file))
+        config.close()
+        self.assertEqual(self.read_tokens(), {"node-b": "token-b"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""节点摘要测试：只有同步字段参与摘要，字段列表与服务端一致"""
+
+import os
+import re
+import sys
+import unittest
+
+MONITOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MONITOR_DIR)
+
+from NodeSync import DIGEST_FIELDS, node_digest, node_set_digest
+
+
+class NodeDigestTest(unittest.TestCase):
+
+    def make_node(self, **fields):
+        node = {"id": 7, "node_name": "hk-1", "connections": [{"type": "tcp", "ip": "1.2.3.4", "port": 11010}],
+                "allow_relay": 1, "tier_bandwidth": 100, "reset_date": "2024-01-01", "report_token": "secret",
+                "status": "online", "used_traffic": 10}
+        node.update(fields)
+        return node
+
+    def test_only_synced_fields_change_digest(self):
+        base = node_digest(self.make_node())
+        for name, value in (("tier_bandwidth", 200), ("reset_date", "2024-02-01"),
+                            ("report_token", "rotated"), ("status", "offline"), ("used_traffic", 99)):
+            self.assertEqual(node_digest(self.make_node(**{name: value})), base, name)
+        self.assertNotEqual(node_digest(self.make_node(node_name="hk-2")), base)
+        self.assertNotEqual(node_digest(self.make_node(connections=[])), base)
+
+        digest, _ = node_set_digest([self.make_node()], 64)
+        self.assertEqual(node_set_digest([self.make_node(report_token="rotated")], 64)[0], digest)
+
+    def test_field_list_matches_worker(self):
+        path = os.path.join(os.path.dirname(MONITOR_DIR), "src", "utils.ts")
+        if not os.path.exists(path):
+            self.skipTest("src/utils.ts不存在")
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        block = re.search(r"const NODE_DIGEST_FIELDS = \[(.*?)\];", source, re.S).group(1)
+        self.assertEqual(tuple(re.findall(r"'([a-z_]+)'", block)), DIGEST_FIELDS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""HealthHistoryStore 持久化测试：读取不修改文件，容量变化时保留历史"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NodeChecker import HealthCheckResult
+from NodeHistory import HealthHistoryStore
+
+
+def _result(online: bool, latency: int) -> HealthCheckResult:
+    return HealthCheckResult(node_id=1, is_online=online, connection_count=0, version="2.4.5",
+                             response_time_ms=latency)
+
+
+class HealthHistoryStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "1.ring")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, capacity: int, records):
+        store = HealthHistoryStore(self.directory, capacity)
+        for timestamp, online, latency in records:
+            store.append(1, _result(online, latency), timestamp)
+        store.close()
+
+    def read_file(self) -> bytes:
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_reading_with_other_capacity_keeps_history(self):
+        self.write(5, [(1, True, 10), (2, False, 0), (3, True, 30)])
+        before = self.read_file()
+
+        store = HealthHistoryStore(self.directory, capacity=10)
+        self.assertAlmostEqual(store.uptime(1), 200 / 3)
+        self.assertEqual(store.latency_percentiles(1, (50,)), {50: 20.0})
+        store.close()
+        self.assertEqual(self.read_file(), before)
+
+    def test_capacity_change_migrates_on_write(self):
+        self.write(5, [(1, True, 10), (2, False, 0), (3, True, 30)])
+
+        self.write(10, [(4, True, 40)])
+        store = HealthHistoryStore(self.directory, capacity=10)
+        self.assertEqual(store.uptime(1), 75.0)
+        store.close()
+
+        # 缩小容量时保留最新的记录
+        self.write(2, [(5, True, 50)])
+        store = HealthHistoryStore(self.directory, capacity=2)
+        self.assertEqual(store.latency_percentiles(1, (0, 100)), {0: 40.0, 100: 50.0})
+        self.assertEqual(store.uptime(1, since=4), 100.0)
+        self.assertEqual(store.uptime(1, until=4), None)
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""AdaptiveProbeScheduler 调度测试"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NodeScheduler import AdaptiveProbeScheduler
+
+
+class AdaptiveProbeSchedulerTest(unittest.TestCase):
+
+    def make_scheduler(self):
+        return AdaptiveProbeScheduler(base_interval=30, min_interval=10, jitter=0)
+
+    def test_popped_node_without_record_is_rescheduled(self):
+        scheduler = self.make_scheduler()
+        scheduler.add("a", now=0)
+        self.assertEqual(scheduler.pop_due(now=0), ["a"])
+
+        # 探测失败或被取消，没有调用record
+        self.assertEqual(scheduler.pop_due(now=1), [])
+        self.assertAlmostEqual(scheduler.next_due_in(now=0), 30)
+        self.assertEqual(scheduler.pop_due(now=30), ["a"])
+
+    def test_record_replaces_provisional_entry(self):
+        scheduler = self.make_scheduler()
+        scheduler.add("a", now=0)
+        scheduler.pop_due(now=0)
+        scheduler.record("a", False, now=0)
+        scheduler.record("a", False, now=0)
+
+        # 只有最后一次record安排的时间有效
+        self.assertEqual(scheduler.pop_due(now=30), [])
+        self.assertEqual(scheduler.pop_due(now=60), ["a"])
+        self.assertEqual(scheduler.pop_due(now=60), [])
+
+    def test_removed_node_is_not_returned(self):
+        scheduler = self.make_scheduler()
+        scheduler.sync(["a", "b"], now=0)
+        scheduler.sync(["b"], now=0)
+        self.assertEqual(scheduler.pop_due(now=0), ["b"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""流水线RPC探测回退测试：只有响应证明不支持流水线时才停止尝试"""
+
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NodeChecker import EasyTierHealthChecker
+
+
+def _reply(request: dict, with_id: bool = True) -> bytes:
+    response = {"jsonrpc": "2.0", "result": {"version": "2.4.5-abc"}}
+    if with_id:
+        response["id"] = request["id"]
+    return json.dumps(response).encode() + b"\n"
+
+
+async def _serve(mode: str):
+    """
+    模拟节点：
+    first-only 只回复第一个请求后关闭连接（可能是临时故障）
+    no-id      回复中缺少id（无法按id匹配流水线响应）
+    """
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(_reply(json.loads(line), with_id=mode != "no-id"))
+                await writer.drain()
+                if mode == "first-only":
+                    break
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+class PipelineFallbackTest(unittest.TestCase):
+
+    def probe_twice(self, mode: str):
+        async def run():
+            server, port = await _serve(mode)
+            try:
+                async with EasyTierHealthChecker(timeout=1, pipeline_retry_probes=2) as checker:
+                    first = await checker.check_node_health("tcp", "127.0.0.1", port, node_id=1)
+                    rejected = dict(checker._pipeline_rejected)
+                    second = await checker.check_node_health("tcp", "127.0.0.1", port, node_id=1)
+                    return first, second, rejected, dict(checker._pipeline_rejected)
+            finally:
+                server.close()
+
+        return asyncio.run(run())
+
+    def test_incomplete_responses_do_not_reject_pipelining(self):
+        first, second, rejected, _ = self.probe_twice("first-only")
+        self.assertTrue(first.is_online)
+        self.assertTrue(second.is_online)
+        self.assertEqual(rejected, {})
+
+    def test_unmatched_ids_reject_pipelining_temporarily(self):
+        first, _, rejected, after_second = self.probe_twice("no-id")
+        self.assertTrue(first.is_online)
+        self.assertEqual(list(rejected.values()), [2])
+        # 每次逐方法探测减少一次，归零后重新尝试流水线
+        self.assertEqual(list(after_second.values()), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""NodeMonitor批量上报测试：只统计本次调用的上报结果"""
+
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NodeMonitor import NodeMonitor
+
+
+class _ReportHandler(BaseHTTPRequestHandler):
+    """批量端点拒绝node_id为2（403，不可重试）和3（503，可重试）的上报，单节点端点只接受3"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        data = json.loads(body)
+        self.server.requests.append((self.path, data))
+        if self.path == '/api/report/batch':
+            results = []
+            for report in data['reports']:
+                status = {2: 403, 3: 503}.get(report['node_id'], 200)
+                results.append({"node_id": report['node_id'], "success": status == 200, "status": status})
+            self._reply(200, {"results": results})
+        elif data.get('node_id') == 3:
+            self._reply(200, {"message": "ok"})
+        else:
+            self._reply(403, {"error": "Token验证失败"})
+
+    def _reply(self, status: int, data: dict):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReportBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _ReportHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.workdir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.workdir)
+        url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.monitor = NodeMonitor(url, "token", os.path.join(self.workdir, "config.json"))
+
+    def tearDown(self):
+        self.monitor._cleanup_all_processes()
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_only_this_calls_reports_are_counted(self):
+        reports = [{"node_id": i, "status": "online"} for i in (1, 2, 3)]
+        delivered = self.monitor._deliver_reports(reports)
+
+        self.assertEqual(sorted(report['node_id'] for report in delivered), [1, 3])
+        self.assertEqual(self.monitor.report_batch([{"node_id": 2, "status": "online"}]), 0)
+        # 403被拒绝的节点不逐个重发，503的节点逐个重发一次
+        single = [data['node_id'] for path, data in self.server.requests if path == '/api/report']
+        self.assertEqual(single, [3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""RpcConnectionPool 空闲连接上限和过期清理测试"""
+
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NodeChecker import EasyTierHealthChecker, RpcConnectionPool
+
+
+async def _fill_pool(pool: RpcConnectionPool, count: int):
+    server = await asyncio.start_server(lambda reader, writer: None, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    for i in range(count):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        pool.release(pool.wrap(f"host-{i}", port, reader, writer))
+    return server, port
+
+
+async def _serve_half_open():
+    """第一个连接只回复第一轮请求，之后不再回复也不关闭（模拟被NAT丢弃的空闲连接）"""
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        first = len(connections) == 1
+        answered = 0
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if first and answered >= len(EasyTierHealthChecker.RPC_METHODS):
+                continue
+            request = json.loads(line)
+            writer.write(json.dumps({"jsonrpc": "2.0", "id": request["id"],
+                                     "result": {"version": "2.4.5-abc"}}).encode() + b"\n")
+            await writer.drain()
+            answered += 1
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1], connections
+
+
+class RpcConnectionPoolTest(unittest.TestCase):
+
+    def test_total_idle_connections_are_capped_lru(self):
+        async def run():
+            pool = RpcConnectionPool(max_idle_total=3)
+            server, port = await _fill_pool(pool, 5)
+            hosts = [host for host, _ in pool._idle]
+            await pool.close()
+            server.close()
+            return hosts, pool.evicted
+
+        hosts, evicted = asyncio.run(run())
+        self.assertEqual(hosts, ["host-2", "host-3", "host-4"])
+        self.assertEqual(evicted, 2)
+
+    def test_idle_connections_expire_without_acquire(self):
+        async def run():
+            pool = RpcConnectionPool(max_idle_seconds=0.1)
+            server, _ = await _fill_pool(pool, 2)
+            await asyncio.sleep(0.3)
+            remaining = len(pool)
+            await pool.close()
+            server.close()
+            return remaining
+
+        self.assertEqual(asyncio.run(run()), 0)
+
+    def test_half_open_pooled_connection_retries_on_fresh_connection(self):
+        async def run():
+            server, port, connections = await _serve_half_open()
+            try:
+                async with EasyTierHealthChecker(timeout=0.5, keep_alive=True) as checker:
+                    first = await checker.check_node_health("tcp", "127.0.0.1", port, node_id=1)
+                    second = await checker.check_node_health("tcp", "127.0.0.1", port, node_id=1)
+                    return first, second, len(connections)
+            finally:
+                server.close()
+
+        first, second, connection_count = asyncio.run(run())
+        self.assertTrue(first.is_online)
+        self.assertTrue(second.is_online, second.error_message)
+        self.assertEqual(connection_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
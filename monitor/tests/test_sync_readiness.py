@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""同步后的就绪基线测试：只等待本次同步创建或更新的节点"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NodeSyncMonitor import NodeSyncMonitor
+
+
+class SyncReadinessTest(unittest.TestCase):
+
+    def setUp(self):
+        self.monitor = NodeSyncMonitor("example.invalid", cache_file=None, sync_workers=2)
+        self.monitor.create_node = lambda node: node['id'] != 4
+        self.monitor.update_node = lambda node_id, node: True
+        self.monitor.delete_node = lambda node_id: True
+
+    def tearDown(self):
+        self.monitor.http.close()
+
+    def test_baseline_only_contains_changed_nodes(self):
+        remote = [
+            {"id": 1, "name": "same", "port": 11010},
+            {"id": 2, "name": "renamed", "port": 11010},
+            {"id": 3, "name": "new", "port": 11010},
+            {"id": 4, "name": "create-fails", "port": 11010},
+        ]
+        local = [
+            {"id": 1, "name": "same", "port": 11010, "last_check": "t1"},
+            {"id": 2, "name": "old", "port": 11010, "last_check": "t2"},
+            {"id": 5, "name": "removed", "port": 11010, "last_check": "t5"},
+        ]
+        baseline = self.monitor.sync_nodes(remote, local)
+        self.assertEqual(baseline, {2: "t2", 3: None})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,120 +8,179 @@ import {
 
 const api = new Hono<{ Bindings: Env }>();
 
-// 节点上报
-api.post('/report', async (c) => {
-    try {
-        const data: NodeReportRequest = await c.req.json();
-
-        // 验证必填字段
-        if (!data.node_name || !data.email || !data.token ||
-            data.current_bandwidth === undefined ||
-            data.reported_traffic === undefined ||
-            data.connection_count === undefined) {
-            return c.json({error: '缺少必填字段'}, 400);
-        }
+// 单个节点上报的处理结果
+interface ReportOutcome {
+    status: 200 | 400 | 403 | 404 | 500;
+    body: Record<string, any>;
+}
 
-        // 获取节点信息（通过节点名称和用户邮箱）
-        const node = await c.env.DB.prepare(
-            'SELECT * FROM nodes WHERE node_name = ? AND user_email = ?'
-        ).bind(data.node_name, data.email).first();
+// 批量上报单次请求的最大条数
+const MAX_BATCH_REPORTS = 500;
 
-        if (!node) {
-            return c.json({error: '节点不存在'}, 404);
-        }
+// 读取JSON请求体，支持gzip压缩（Content-Encoding: gzip）
+async function readJsonBody<T>(req: Request): Promise<T> {
+    if (req.headers.get('Content-Encoding')?.toLowerCase() === 'gzip' && req.body) {
+        return await new Response(req.body.pipeThrough(new DecompressionStream('gzip'))).json() as T;
+    }
+    return await req.json() as T;
+}
 
-        // 验证token
-        if (node.report_token !== data.token) {
-            return c.json({error: 'Token验证失败'}, 403);
-        }
+// 处理单个节点上报：验证并更新节点状态
+async function applyNodeReport(db: any, data: NodeReportRequest): Promise<ReportOutcome> {
+    // 验证必填字段
+    if (!data.node_name || !data.email || !data.token ||
+        data.current_bandwidth === undefined ||
+        data.reported_traffic === undefined ||
+        data.connection_count === undefined) {
+        return {status: 400, body: {error: '缺少必填字段'}};
+    }
 
-        // 检查节点是否过期
-        const now = new Date();
-        const validUntil = new Date(node.valid_until);
-        if (now > validUntil) {
-            return c.json({error: '节点已过期'}, 403);
-        }
+    // 获取节点信息（通过节点名称和用户邮箱）
+    const node = await db.prepare(
+        'SELECT * FROM nodes WHERE node_name = ? AND user_email = ?'
+    ).bind(data.node_name, data.email).first();
 
-        // 检查是否需要重置流量（按每月重置日期 0-31）
-        const resetDate = new Date(node.reset_date);
-        // 改为覆盖模式：直接使用上报的流量值作为当前流量
-        let newUsedTraffic = data.reported_traffic;
-        let newResetDate = node.reset_date;
-
-        const computeNextMonthlyReset = (from: Date, day: number): string => {
-            const y = from.getUTCFullYear();
-            const m = from.getUTCMonth();
-            // move to next month
-            const nextMonth = new Date(Date.UTC(y, m + 1, 1));
-            // last day of next month
-            const lastDayNextMonth = new Date(Date.UTC(nextMonth.getUTCFullYear(), nextMonth.getUTCMonth() + 1, 0)).getUTCDate();
-            const targetDay = day === 0 ? lastDayNextMonth : Math.min(day, lastDayNextMonth);
-            const result = new Date(Date.UTC(nextMonth.getUTCFullYear(), nextMonth.getUTCMonth(), targetDay, 0, 0, 0));
-            return result.toISOString();
-        };
+    if (!node) {
+        return {status: 404, body: {error: '节点不存在'}};
+    }
 
-        if (now >= resetDate) {
-            // 重置流量并计算下次重置日期（按月）
-            newUsedTraffic = data.reported_traffic;
-            const nextReset = computeNextMonthlyReset(now, node.reset_cycle);
-            newResetDate = nextReset;
-        }
+    // 验证token
+    if (node.report_token !== data.token) {
+        return {status: 403, body: {error: 'Token验证失败'}};
+    }
 
-        // 计算负荷（0-9）
-        let load = 0;
-        if (data.status === 'offline') {
-            load = 1;
-        } else {
-            // 根据带宽、流量、连接数计算负荷
-            const bandwidthLoad = node.tier_bandwidth > 0 ? (data.current_bandwidth / node.tier_bandwidth) * 3 : 0;
-            const trafficLoad = node.max_traffic > 0 ? (newUsedTraffic / node.max_traffic) * 3 : 0;
-            const connectionLoad = node.max_connections > 0 ? (data.connection_count / node.max_connections) * 3 : 0;
-            load = Math.min(9, Math.max(2, Math.ceil(bandwidthLoad + trafficLoad + connectionLoad)));
-        }
+    // 检查节点是否过期
+    const now = new Date();
+    const validUntil = new Date(node.valid_until);
+    if (now > validUntil) {
+        return {status: 403, body: {error: '节点已过期'}};
+    }
 
-        // 更新近期状态
-        const newRecentStatus = updateRecentStatus(node.recent_status, load);
-
-        // 更新节点信息
-        // 可选更新阶梯带宽（由API上报）
-        const updateTierBandwidth = data.tier_bandwidth !== undefined;
-        const updateSql = `
-            UPDATE nodes
-            SET current_bandwidth = ?,
-                used_traffic      = ?,
-                reset_date        = ?,
-                connection_count  = ?,
-                status            = ?,
-                recent_status     = ?,
-                last_report_at    = ?${updateTierBandwidth ? ',\n        tier_bandwidth = ?' : ''}
-            WHERE id = ?
-        `;
-        const bindings = [
-            data.current_bandwidth,
-            newUsedTraffic,
-            newResetDate,
-            data.connection_count,
-            data.status,
-            newRecentStatus,
-            now.toISOString(),
-        ];
-        if (updateTierBandwidth) bindings.push(data.tier_bandwidth);
-        bindings.push(node.id);
+    // 检查是否需要重置流量（按每月重置日期 0-31）
+    const resetDate = new Date(node.reset_date);
+    // 改为覆盖模式：直接使用上报的流量值作为当前流量
+    let newUsedTraffic = data.reported_traffic;
+    let newResetDate = node.reset_date;
+
+    const computeNextMonthlyReset = (from: Date, day: number): string => {
+        const y = from.getUTCFullYear();
+        const m = from.getUTCMonth();
+        // move to next month
+        const nextMonth = new Date(Date.UTC(y, m + 1, 1));
+        // last day of next month
+        const lastDayNextMonth = new Date(Date.UTC(nextMonth.getUTCFullYear(), nextMonth.getUTCMonth() + 1, 0)).getUTCDate();
+        const targetDay = day === 0 ? lastDayNextMonth : Math.min(day, lastDayNextMonth);
+        const result = new Date(Date.UTC(nextMonth.getUTCFullYear(), nextMonth.getUTCMonth(), targetDay, 0, 0, 0));
+        return result.toISOString();
+    };
+
+    if (now >= resetDate) {
+        // 重置流量并计算下次重置日期（按月）
+        newUsedTraffic = data.reported_traffic;
+        const nextReset = computeNextMonthlyReset(now, node.reset_cycle);
+        newResetDate = nextReset;
+    }
 
-        await c.env.DB.prepare(updateSql).bind(...bindings).run();
+    // 计算负荷（0-9）
+    let load = 0;
+    if (data.status === 'offline') {
+        load = 1;
+    } else {
+        // 根据带宽、流量、连接数计算负荷
+        const bandwidthLoad = node.tier_bandwidth > 0 ? (data.current_bandwidth / node.tier_bandwidth) * 3 : 0;
+        const trafficLoad = node.max_traffic > 0 ? (newUsedTraffic / node.max_traffic) * 3 : 0;
+        const connectionLoad = node.max_connections > 0 ? (data.connection_count / node.max_connections) * 3 : 0;
+        load = Math.min(9, Math.max(2, Math.ceil(bandwidthLoad + trafficLoad + connectionLoad)));
+    }
 
-        return c.json({
+    // 更新近期状态
+    const newRecentStatus = updateRecentStatus(node.recent_status, load);
+
+    // 更新节点信息
+    // 可选更新阶梯带宽（由API上报）
+    const updateTierBandwidth = data.tier_bandwidth !== undefined;
+    const updateSql = `
+        UPDATE nodes
+        SET current_bandwidth = ?,
+            used_traffic      = ?,
+            reset_date        = ?,
+            connection_count  = ?,
+            status            = ?,
+            recent_status     = ?,
+            last_report_at    = ?${updateTierBandwidth ? ',\n        tier_bandwidth = ?' : ''}
+        WHERE id = ?
+    `;
+    const bindings = [
+        data.current_bandwidth,
+        newUsedTraffic,
+        newResetDate,
+        data.connection_count,
+        data.status,
+        newRecentStatus,
+        now.toISOString(),
+    ];
+    if (updateTierBandwidth) bindings.push(data.tier_bandwidth);
+    bindings.push(node.id);
+
+    await db.prepare(updateSql).bind(...bindings).run();
+
+    return {
+        status: 200,
+        body: {
             message: '上报成功',
             used_traffic: newUsedTraffic,
             max_traffic: node.max_traffic,
             reset_date: newResetDate
-        });
+        }
+    };
+}
+
+// 节点上报
+api.post('/report', async (c) => {
+    try {
+        const data = await readJsonBody<NodeReportRequest>(c.req.raw);
+        const result = await applyNodeReport(c.env.DB, data);
+        return c.json(result.body, result.status);
     } catch (error) {
         console.error('节点上报错误:', error);
         return c.json({error: '上报失败'}, 500);
     }
 });
 
+// 批量节点上报：{"reports": [...]}，逐项返回结果，单项失败不影响其他节点
+api.post('/report/batch', async (c) => {
+    try {
+        const payload = await readJsonBody<{ reports?: NodeReportRequest[] }>(c.req.raw);
+        const reports = payload?.reports;
+        if (!Array.isArray(reports)) {
+            return c.json({error: '缺少reports数组'}, 400);
+        }
+        if (reports.length > MAX_BATCH_REPORTS) {
+            return c.json({error: `单次最多上报${MAX_BATCH_REPORTS}个节点`}, 413);
+        }
+
+        const results = [];
+        for (const data of reports) {
+            const identity = {node_id: (data as any)?.node_id, node_name: data?.node_name};
+            try {
+                const result = await applyNodeReport(c.env.DB, data ?? ({} as NodeReportRequest));
+                results.push(result.status === 200
+                    ? {...identity, success: true, status: 200}
+                    : {...identity, success: false, status: result.status, error: result.body.error});
+            } catch (error) {
+                console.error('批量上报单项错误:', error);
+                results.push({...identity, success: false, status: 500, error: '上报失败'});
+            }
+        }
+
+        const succeeded = results.filter((result) => result.success).length;
+        return c.json({message: `上报完成: ${succeeded}/${results.length}`, results});
+    } catch (error) {
+        console.error('批量上报错误:', error);
+        return c.json({error: '上报失败'}, 500);
+    }
+});
+
 // 客户端查询节点
 api.use('/query', async (c) => {
     try {
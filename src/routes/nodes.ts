@@ -1,6 +1,6 @@
 import { Hono } from 'hono';
 import type { Env, Node, NodeDB, NodeCreateRequest, NodeUpdateRequest, JWTPayload } from '../types';
-import { authMiddleware, adminMiddleware } from '../utils';
+import { authMiddleware, adminMiddleware, jsonWithETag, nodeSetDigest } from '../utils';
 
 const nodes = new Hono<{ Bindings: Env }>();
 
@@ -26,18 +26,48 @@ const { results } = await c.env.DB.prepare(
   }
 });
 
-// 获取所有节点（管理员）
+const DEFAULT_BUCKET_COUNT = 64;
+
+// 解析分桶参数，bucket_count默认为64
+function parseBucketCount(value: string | undefined): number | null {
+  const bucketCount = value ? parseInt(value, 10) : DEFAULT_BUCKET_COUNT;
+  return Number.isInteger(bucketCount) && bucketCount >= 1 && bucketCount <= 4096 ? bucketCount : null;
+}
+
+// 获取所有节点（管理员），可通过buckets参数只获取指定分桶的节点，view=sync时支持ETag条件请求
 nodes.get('/all', authMiddleware, adminMiddleware, async (c) => {
   try {
-    const { results } = await c.env.DB.prepare(
-      'SELECT * FROM nodes ORDER BY created_at DESC'
-).all();
+    const bucketsParam = c.req.query('buckets');
+    let statement;
+    if (bucketsParam !== undefined) {
+      const bucketCount = parseBucketCount(c.req.query('bucket_count'));
+      const buckets = bucketsParam.split(',').filter(Boolean).map(b => parseInt(b, 10));
+      if (bucketCount === null || buckets.some(b => !Number.isInteger(b) || b < 0 || b >= bucketCount)) {
+        return c.json({ error: '分桶参数无效' }, 400);
+      }
+      if (buckets.length === 0) {
+        return c.json({ nodes: [] });
+      }
+      statement = c.env.DB.prepare(
+        `SELECT * FROM nodes WHERE (id % ?) IN (${buckets.map(() => '?').join(',')}) ORDER BY created_at DESC`
+      ).bind(bucketCount, ...buckets);
+    } else {
+      statement = c.env.DB.prepare(
+        'SELECT * FROM nodes ORDER BY created_at DESC'
+      );
+    }
+    const { results } = await statement.all();
     
     const nodesWithParsedConnections = results.map(node => ({
       ...node,
       connections: JSON.parse(node.connections)
     }));
     
+    // 同步视图：ETag为同步字段的节点摘要，状态类字段变化不影响ETag
+    if (c.req.query('view') === 'sync') {
+      const { digest } = await nodeSetDigest(nodesWithParsedConnections, 1);
+      return jsonWithETag(c, { nodes: nodesWithParsedConnections }, digest);
+    }
     return c.json({ nodes: nodesWithParsedConnections });
   } catch (error) {
     console.error('获取所有节点错误:', error);
@@ -45,6 +75,30 @@ nodes.get('/all', authMiddleware, adminMiddleware, async (c) => {
   }
 });
 
+// 获取所有节点的内容摘要（管理员），监控脚本据此跳过未变化的同步或只获取变化的分桶
+nodes.get('/digest', authMiddleware, adminMiddleware, async (c) => {
+  try {
+    const bucketCount = parseBucketCount(c.req.query('bucket_count'));
+    if (bucketCount === null) {
+      return c.json({ error: '分桶参数无效' }, 400);
+    }
+    const { results } = await c.env.DB.prepare(
+      'SELECT * FROM nodes'
+    ).all();
+    
+    const nodesWithParsedConnections = results.map(node => ({
+      ...node,
+      connections: JSON.parse(node.connections)
+    }));
+    const { digest, buckets } = await nodeSetDigest(nodesWithParsedConnections, bucketCount);
+    
+    return c.json({ digest, buckets, bucket_count: bucketCount, count: results.length });
+  } catch (error) {
+    console.error('获取节点摘要错误:', error);
+    return c.json({ error: '获取节点摘要失败' }, 500);
+  }
+});
+
 // 获取单个节点详情
 nodes.get('/:id', authMiddleware, async (c) => {
   try {
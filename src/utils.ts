@@ -260,3 +260,80 @@ export function formatDateShort(dateStr?: string): string {
     if (!dateStr) return '-';
     return new Date(dateStr).toLocaleDateString('zh-CN');
 }
+
+// 参与节点摘要的字段：只包含同步到本地服务的节点配置，上报状态、流量和上报令牌等不参与
+// 与监控脚本 NodeSync.DIGEST_FIELDS 保持一致
+const NODE_DIGEST_FIELDS = [
+    'id', 'node_name', 'name', 'host', 'ip_address', 'port', 'protocol', 'connections',
+    'is_public', 'allow_relay', 'network_name', 'network_token', 'max_connections',
+    'region_type', 'region_detail', 'location', 'description',
+];
+
+// 规范化JSON：对象键排序、无空白，保证同一内容得到同一字符串
+export function canonicalJson(value: unknown): string {
+    if (Array.isArray(value)) {
+        return `[${value.map(canonicalJson).join(',')}]`;
+    }
+    if (value !== null && typeof value === 'object') {
+        const record = value as Record<string, unknown>;
+        return `{${Object.keys(record).sort().map(key => `${JSON.stringify(key)}:${canonicalJson(record[key])}`).join(',')}}`;
+    }
+    return JSON.stringify(value) ?? 'null';
+}
+
+async function sha256Hex(text: string): Promise<string> {
+    const hash = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(text));
+    return Array.from(new Uint8Array(hash), byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+// 返回带ETag的JSON响应，客户端的If-None-Match匹配时返回304，不再传输响应体
+// digest由调用方只根据响应中稳定的内容计算，不随状态类字段变化
+export function jsonWithETag(c: Context, data: unknown, digest: string): Response {
+    const etag = `"${digest}"`;
+    const headers = {ETag: etag, 'Cache-Control': 'private, no-cache'};
+    const ifNoneMatch = c.req.header('If-None-Match');
+    if (ifNoneMatch && ifNoneMatch.split(',').some(tag => tag.trim().replace(/^W\//, '') === etag)) {
+        return new Response(null, {status: 304, headers});
+    }
+    return new Response(JSON.stringify(data), {headers: {...headers, 'Content-Type': 'application/json; charset=UTF-8'}});
+}
+
+// 单个节点配置的内容哈希
+export async function nodeDigest(node: Record<string, unknown>): Promise<string> {
+    const stable: Record<string, unknown> = {};
+    for (const key of NODE_DIGEST_FIELDS) {
+        if (node[key] !== undefined) {
+            stable[key] = node[key];
+        }
+    }
+    return sha256Hex(canonicalJson(stable));
+}
+
+// 节点所在的分桶
+export function nodeBucket(id: number, bucketCount: number): number {
+    return ((Number(id) % bucketCount) + bucketCount) % bucketCount;
+}
+
+// 两级摘要：每个分桶为桶内节点哈希（按ID排序）的哈希，整体摘要为各分桶摘要的哈希
+export async function nodeSetDigest(nodes: Record<string, unknown>[], bucketCount: number): Promise<{
+    digest: string;
+    buckets: Record<string, string>;
+}> {
+    const grouped = new Map<number, [number, string][]>();
+    for (const node of nodes) {
+        const id = Number(node.id);
+        const bucket = nodeBucket(id, bucketCount);
+        if (!grouped.has(bucket)) {
+            grouped.set(bucket, []);
+        }
+        grouped.get(bucket)!.push([id, await nodeDigest(node)]);
+    }
+
+    const buckets: Record<string, string> = {};
+    for (const bucket of [...grouped.keys()].sort((a, b) => a - b)) {
+        const hashes = grouped.get(bucket)!.sort((a, b) => a[0] - b[0]).map(([, hash]) => hash);
+        buckets[String(bucket)] = await sha256Hex(hashes.join(''));
+    }
+    const digest = await sha256Hex(Object.entries(buckets).map(([bucket, hash]) => `${bucket}:${hash}`).join(','));
+    return {digest, buckets};
+}